@@ -0,0 +1,234 @@
+"""Controle de admissão das rotas que chamam o modelo.
+
+Duas camadas:
+
+- `vagas_llm`: semáforo global (por worker) das chamadas ao modelo. Quem não consegue vaga em
+  LLM_QUEUE_TIMEOUT_S recebe 429 em vez de enfileirar indefinidamente atrás do limite da OpenAI.
+- `get_limitador()`: token bucket por cliente (subject do JWT, ou o IP para anônimos), com
+  RATE_LIMIT_BURST fichas e reposição de RATE_LIMIT_PER_MINUTE por minuto. O estado fica num
+  SQLite em modo WAL, então todos os workers do uvicorn enxergam o mesmo balde; cada consulta é
+  um único UPSERT atômico.
+
+Um cliente abusivo esgota só o próprio balde e recebe 429 rápido (com Retry-After), sem ocupar
+as vagas de quem está dentro do limite.
+"""
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Optional
+
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.engine import make_url
+
+from .auth import decodificar_subject, oauth2_scheme_opcional
+from .config import get_settings
+from .database import SQLALCHEMY_DATABASE_URL, _is_memory, _is_sqlite
+from .metrics import medir, recusas_admissao
+
+logger = logging.getLogger(__name__)
+
+# Limpeza dos baldes cheios (equivalem a um balde inexistente) a cada N consultas
+_LIMPEZA_A_CADA = 1000
+
+# Um único comando: repõe as fichas pelo tempo decorrido, desconta o custo se houver saldo e
+# devolve o saldo. No UPDATE, `tokens` e `atualizado_em` ainda são os valores anteriores.
+_CONSUMIR = """
+INSERT INTO rate_limit (chave, tokens, atualizado_em, permitido)
+VALUES (:chave, :capacidade - :custo, :agora, 1)
+ON CONFLICT (chave) DO UPDATE SET
+    tokens = CASE
+        WHEN min(:capacidade, tokens + max(0, :agora - atualizado_em) * :taxa) >= :custo
+        THEN min(:capacidade, tokens + max(0, :agora - atualizado_em) * :taxa) - :custo
+        ELSE min(:capacidade, tokens + max(0, :agora - atualizado_em) * :taxa)
+    END,
+    permitido = min(:capacidade, tokens + max(0, :agora - atualizado_em) * :taxa) >= :custo,
+    atualizado_em = :agora
+RETURNING tokens, permitido
+"""
+
+
+def _recusar(motivo: str, retry_after: float, detalhe: str) -> HTTPException:
+    recusas_admissao.inc(motivo)
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detalhe,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class VagasLLM:
+    """Semáforo das chamadas ao modelo, com espera limitada por uma vaga."""
+
+    def __init__(self, limite: int, espera_max_s: float) -> None:
+        self.limite = max(1, limite)
+        self.espera_max_s = espera_max_s
+        self._semaforo = asyncio.Semaphore(self.limite)
+        self.em_uso = 0
+        self.na_espera = 0
+
+    async def adquirir(self, operacao: str) -> None:
+        """Ocupa uma vaga ou levanta 429 se nenhuma abrir em `espera_max_s`."""
+        self.na_espera += 1
+        try:
+            with medir(operacao, "fila_llm"):
+                await asyncio.wait_for(self._semaforo.acquire(), self.espera_max_s)
+        except asyncio.TimeoutError:
+            raise _recusar(
+                "concorrencia", self.espera_max_s, "Muitas gerações em andamento. Tente novamente em instantes."
+            ) from None
+        finally:
+            self.na_espera -= 1
+        self.em_uso += 1
+
+    def liberar(self) -> None:
+        self.em_uso -= 1
+        self._semaforo.release()
+
+    @asynccontextmanager
+    async def vaga(self, operacao: str) -> AsyncIterator[None]:
+        await self.adquirir(operacao)
+        try:
+            yield
+        finally:
+            self.liberar()
+
+    def stats(self) -> dict:
+        return {"limite": self.limite, "em_uso": self.em_uso, "na_espera": self.na_espera}
+
+
+vagas_llm = VagasLLM(get_settings().llm_max_concurrency, get_settings().llm_queue_timeout_s)
+
+
+class RespostaComVaga(StreamingResponse):
+    """StreamingResponse que devolve a vaga de `vagas_llm` ao terminar (ou ser cancelada).
+
+    A rota ocupa a vaga antes de retornar a resposta: sem vaga, o cliente recebe um 429 de
+    verdade em vez de um 200 com o erro no meio do stream.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            vagas_llm.liberar()
+
+
+class LimitadorTaxa:
+    """Token buckets por chave num SQLite compartilhado entre workers (ou em memória, sem arquivo)."""
+
+    def __init__(self, capacidade: float, por_minuto: float, sqlite_path: str = "") -> None:
+        self.capacidade = max(1.0, capacidade)
+        self.taxa = max(por_minuto, 1e-6) / 60.0
+        # Uma conexão por processo: cada consulta é um único comando curto, serializado pela trava
+        self._conn = sqlite3.connect(sqlite_path or ":memory:", timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._trava = threading.Lock()
+        self._consultas = 0
+        with self._conn as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit ("
+                "chave TEXT PRIMARY KEY, tokens REAL NOT NULL, atualizado_em REAL NOT NULL, permitido INTEGER NOT NULL)"
+            )
+
+    def _consumir(self, chave: str, custo: float) -> float:
+        agora = time.time()
+        with self._trava, self._conn as conn:
+            tokens, permitido = conn.execute(
+                _CONSUMIR,
+                {"chave": chave, "custo": custo, "capacidade": self.capacidade, "taxa": self.taxa, "agora": agora},
+            ).fetchone()
+            self._consultas += 1
+            if self._consultas % _LIMPEZA_A_CADA == 0:
+                conn.execute("DELETE FROM rate_limit WHERE atualizado_em < ?", (agora - self.capacidade / self.taxa,))
+        return 0.0 if permitido else (custo - tokens) / self.taxa
+
+    async def consumir(self, chave: str, custo: float = 1) -> float:
+        """Desconta `custo` fichas do balde de `chave`.
+
+        Retorna 0 se havia saldo, ou os segundos até haver (nada é descontado nesse caso).
+        Falhas do SQLite liberam a requisição: o limitador não pode derrubar a API.
+        """
+        custo = min(custo, self.capacidade)
+        try:
+            return await asyncio.to_thread(self._consumir, chave, custo)
+        except sqlite3.Error:
+            logger.exception("Falha no rate limit; requisição liberada sem limite")
+            return 0.0
+
+    async def exigir(self, chave: str, custo: float = 1) -> None:
+        """Como `consumir`, levantando 429 com Retry-After quando não há saldo."""
+        espera = await self.consumir(chave, custo)
+        if espera > 0:
+            raise _recusar(
+                "taxa", espera, f"Limite de gerações atingido. Tente novamente em {max(1, math.ceil(espera))} s."
+            )
+
+    async def aguardar(self, chave: str, custo: float = 1) -> None:
+        """Como `consumir`, esperando o saldo em vez de recusar (geração em lote)."""
+        while (espera := await self.consumir(chave, custo)) > 0:
+            await asyncio.sleep(espera)
+
+
+def caminho_limitador() -> str:
+    """Arquivo do limitador: RATE_LIMIT_SQLITE_PATH, ou ao lado do banco SQLite principal.
+
+    Sem banco SQLite em arquivo (Postgres, SQLite em memória), o limitador fica em memória e
+    cada worker tem os próprios baldes; configure RATE_LIMIT_SQLITE_PATH para compartilhá-los.
+    """
+    configurado = get_settings().rate_limit_sqlite_path
+    if configurado:
+        return "" if configurado == ":memory:" else configurado
+    url = SQLALCHEMY_DATABASE_URL
+    if not _is_sqlite(url) or _is_memory(url):
+        return ""
+    base, _ = os.path.splitext(os.path.abspath(make_url(url).database))
+    return f"{base}_rate_limit.db"
+
+
+@lru_cache
+def get_limitador() -> Optional[LimitadorTaxa]:
+    """Limitador do processo, ou None com RATE_LIMIT_ENABLED=false."""
+    settings = get_settings()
+    if not settings.rate_limit_enabled:
+        return None
+    return LimitadorTaxa(settings.rate_limit_burst, settings.rate_limit_per_minute, caminho_limitador())
+
+
+def limitador_ativo() -> Optional[LimitadorTaxa]:
+    """O limitador, ou None se desligado ou no modo demonstração (que nunca chama o modelo)."""
+    from .openai_client import modelo_configurado  # openai_client importa este módulo
+
+    if modelo_configurado() == "demonstracao":
+        return None
+    return get_limitador()
+
+
+async def chave_cliente(request: Request, token: Optional[str] = Depends(oauth2_scheme_opcional)) -> str:
+    """Chave do balde: o usuário do token (se válido) ou o IP de origem.
+
+    Atrás de um proxy, rode o uvicorn com --proxy-headers/--forwarded-allow-ips para que
+    `request.client` seja o IP do cliente, não o do proxy.
+    """
+    username = decodificar_subject(token) if token else None
+    if username is not None:
+        return f"usuario:{username}"
+    return f"ip:{request.client.host if request.client else 'desconhecido'}"
+
+
+async def exigir_taxa(chave: str, custo: float = 1) -> None:
+    limitador = limitador_ativo()
+    if limitador is not None:
+        await limitador.exigir(chave, custo)
+
+
+async def limitar_geracao(chave: str = Depends(chave_cliente)) -> None:
+    """Dependency das rotas que geram com o modelo: uma ficha por requisição."""
+    await exigir_taxa(chave)
@@ -1,51 +1,131 @@
+import asyncio
 import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from functools import lru_cache
+import time
+from typing import TYPE_CHECKING, Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event, inspect, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from .config import get_settings
-from .database import get_db
+from .database import get_async_db
+from .lru import LRUCache
+from .metrics import medir, registro
 from .models import User
 
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
 settings = get_settings()
 
-# Configuração de hash de senhas (bcrypt aceita no máximo 72 bytes)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes no formato atual, bcrypt(sha256(senha)), são gravados com este marcador.
+# Hashes sem marcador são anteriores a ele e podem estar em qualquer um dos dois formatos.
+HASH_PREFIX = "sha256$"
+
+# bcrypt é CPU puro (~100–300 ms): roda em um pool dimensionado pelos núcleos, fora do event loop
+_password_executor: Optional[ThreadPoolExecutor] = None
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+# Mesma origem do token, sem 401 automático quando ele não vem (rotas abertas a anônimos)
+oauth2_scheme_opcional = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
 # Configuração JWT
 SECRET_KEY = settings.secret_key
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 dias
 
+# Caches de get_current_user: tokens já verificados (por assinatura) e usuários (por subject).
+# A invalidação por eventos do ORM (por objeto e UPDATE/DELETE em massa pelo Session) vale para
+# este processo; o TTL (USER_CACHE_TTL_S) limita a defasagem entre workers e a de escritas feitas
+# fora do Session (SQL direto na conexão ou outro serviço).
+_token_cache: LRUCache[str, Tuple[str, str]] = LRUCache(settings.auth_cache_max_entries)
+_user_cache: LRUCache[str, dict] = LRUCache(settings.auth_cache_max_entries, settings.user_cache_ttl_s)
+_USER_CACHE_CAMPOS = ("id", "email", "username", "hashed_password", "created_at", "updated_at")
+
+
+@lru_cache
+def get_pwd_context() -> "CryptContext":
+    """Configuração de hash de senhas (bcrypt aceita no máximo 72 bytes).
+
+    passlib e jose só são importados no primeiro uso: ~140 ms a menos no import da aplicação.
+    """
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def aquecer_criptografia() -> None:
+    """Carrega passlib/bcrypt e jose antes da primeira requisição (aquecimento do startup)."""
+    get_pwd_context()
+    import jose.jwt  # noqa: F401
+
 
 def _password_for_bcrypt(password: str) -> str:
     """Reduz a senha a um valor fixo de 64 caracteres para evitar o limite de 72 bytes do bcrypt."""
     return hashlib.sha256(password.encode("utf-8")).hexdigest()
 
 
+def _verificar_senha(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verifica a senha e indica o hash migrado para o formato atual, quando necessário.
+
+    Retorna (senha_correta, novo_hash). Hashes com marcador custam um único bcrypt;
+    hashes antigos custam até dois, apenas até o próximo login bem-sucedido.
+    """
+    pwd_context = get_pwd_context()
+    if hashed_password.startswith(HASH_PREFIX):
+        ok = pwd_context.verify(_password_for_bcrypt(plain_password), hashed_password[len(HASH_PREFIX):])
+        return ok, None
+    # Sem marcador, formato novo: bcrypt(sha256(senha)) — basta acrescentar o marcador
+    if pwd_context.verify(_password_for_bcrypt(plain_password), hashed_password):
+        return True, HASH_PREFIX + hashed_password
+    # Sem marcador, formato antigo: bcrypt(senha) — refaz o hash no formato atual
+    if pwd_context.verify(plain_password, hashed_password):
+        return True, get_password_hash(plain_password)
+    return False, None
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica se a senha está correta (aceita formato novo SHA256+bcrypt e antigo bcrypt)."""
-    # Formato novo: bcrypt(sha256(senha)) — suporta senhas longas
-    if pwd_context.verify(_password_for_bcrypt(plain_password), hashed_password):
-        return True
-    # Formato antigo: bcrypt(senha) — compatibilidade com usuários já cadastrados
-    return pwd_context.verify(plain_password, hashed_password)
+    return _verificar_senha(plain_password, hashed_password)[0]
 
 
 def get_password_hash(password: str) -> str:
     """Gera hash da senha (SHA256 + bcrypt para suportar senhas longas)"""
-    return pwd_context.hash(_password_for_bcrypt(password))
+    return HASH_PREFIX + get_pwd_context().hash(_password_for_bcrypt(password))
+
+
+def _get_password_executor() -> ThreadPoolExecutor:
+    global _password_executor
+    if _password_executor is None:
+        workers = settings.password_hash_workers or os.cpu_count() or 1
+        _password_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+    return _password_executor
+
+
+def shutdown_password_executor() -> None:
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=False, cancel_futures=True)
+        _password_executor = None
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Versão de get_password_hash que não bloqueia o event loop."""
+    loop = asyncio.get_running_loop()
+    with medir("registro", "bcrypt"):
+        return await loop.run_in_executor(_get_password_executor(), get_password_hash, password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Cria token JWT"""
+    from jose import jwt
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -63,19 +143,126 @@ def get_user_by_username(db: Session, username: str) -> Optional[User]:
     ).first()
 
 
+async def get_user_by_username_async(db: AsyncSession, username: str) -> Optional[User]:
+    """Busca usuário por username ou email (sessão assíncrona)"""
+    resultado = await db.execute(
+        select(User).where(or_(User.username == username, User.email == username)).limit(1)
+    )
+    return resultado.scalars().first()
+
+
+def _migrar_hash(db: Session, user: User, novo_hash: Optional[str]) -> None:
+    if novo_hash is not None:
+        user.hashed_password = novo_hash
+        db.commit()
+
+
 def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
     """Autentica usuário e retorna o objeto User se válido"""
     user = get_user_by_username(db, username)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    ok, novo_hash = _verificar_senha(password, user.hashed_password)
+    if not ok:
+        return None
+    _migrar_hash(db, user, novo_hash)
+    return user
+
+
+async def authenticate_user_async(db: AsyncSession, username: str, password: str) -> Optional[User]:
+    """Como authenticate_user, com sessão assíncrona e o bcrypt executado no pool de hashing."""
+    with medir("login", "db"):
+        user = await get_user_by_username_async(db, username)
+    if not user:
+        return None
+    loop = asyncio.get_running_loop()
+    with medir("login", "bcrypt"):
+        ok, novo_hash = await loop.run_in_executor(
+            _get_password_executor(), _verificar_senha, password, user.hashed_password
+        )
+    if not ok:
         return None
+    if novo_hash is not None:
+        user.hashed_password = novo_hash
+        with medir("login", "db"):
+            await db.commit()
     return user
 
 
+def invalidate_user_cache(username: str) -> None:
+    """Remove o usuário do cache (chamado automaticamente quando o User é alterado ou removido)."""
+    _user_cache.invalidate(username)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidar_usuario_alterado(_mapper, _connection, target: User) -> None:
+    historico = inspect(target).attrs.username.history
+    for username in (target.username, *(historico.deleted or ())):
+        if username:
+            invalidate_user_cache(username)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidar_usuarios_em_massa(estado) -> None:
+    """UPDATE/DELETE em massa (`session.execute(update(User)...)`) não dispara os eventos por
+    objeto acima e não informa quais usuários mudaram: esvazia o cache de usuários inteiro.
+    Vale também para o AsyncSession, que executa por um Session síncrono."""
+    if not (estado.is_update or estado.is_delete):
+        return
+    tabela = getattr(estado.statement, "table", None)
+    if any(m.class_ is User for m in estado.all_mappers) or getattr(tabela, "name", None) == User.__tablename__:
+        _user_cache.clear()
+
+
+def auth_cache_stats() -> dict:
+    return {"tokens": _token_cache.stats(), "usuarios": _user_cache.stats()}
+
+
+def _coletar_caches() -> list:
+    """Acertos e faltas dos caches de get_current_user (taxa de acerto = hit / (hit + miss))."""
+    return [
+        (
+            "mynutri_auth_cache_total",
+            "counter",
+            "Consultas aos caches de autenticação por resultado",
+            [
+                ({"cache": nome, "resultado": resultado}, valor)
+                for nome, cache in (("tokens", _token_cache), ("usuarios", _user_cache))
+                for resultado, valor in (("hit", cache.hits), ("miss", cache.misses))
+            ],
+        )
+    ]
+
+
+registro.registrar_coletor(_coletar_caches)
+
+
+def decodificar_subject(token: str) -> Optional[str]:
+    """Retorna o `sub` do token, reaproveitando a verificação de tokens já vistos."""
+    assinatura = token.rsplit(".", 1)[-1]
+    em_cache = _token_cache.get(assinatura)
+    if em_cache is not None and em_cache[0] == token:
+        return em_cache[1]
+    from jose import JWTError, jwt
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    username = payload.get("sub")
+    if username is None:
+        return None
+    # Nunca mantém o token em cache além da própria expiração
+    restante = payload.get("exp", 0) - time.time()
+    if restante > 0:
+        _token_cache.set(assinatura, (token, username), ttl_seconds=min(restante, settings.user_cache_ttl_s))
+    return username
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
     """Dependency para obter usuário atual a partir do token JWT"""
     credentials_exception = HTTPException(
@@ -83,14 +270,29 @@ async def get_current_user(
         detail="Não foi possível validar as credenciais",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
+    username = decodificar_subject(token)
+    if username is None:
         raise credentials_exception
-    user = get_user_by_username(db, username=username)
+    # Cópia transitória a partir do cache: nenhuma consulta ao banco no caminho quente
+    dados = _user_cache.get(username)
+    if dados is not None:
+        return User(**dados)
+    with medir("usuario_atual", "db"):
+        user = await get_user_by_username_async(db, username)
     if user is None:
         raise credentials_exception
+    _user_cache.set(username, {campo: getattr(user, campo) for campo in _USER_CACHE_CAMPOS})
     return user
+
+
+async def get_current_user_optional(
+    token: Optional[str] = Depends(oauth2_scheme_opcional),
+    db: AsyncSession = Depends(get_async_db)
+) -> Optional[User]:
+    """Como get_current_user, mas retorna None para requisições anônimas ou com token inválido."""
+    if not token:
+        return None
+    try:
+        return await get_current_user(token, db)
+    except HTTPException:
+        return None
@@ -0,0 +1,202 @@
+"""Geração de planos em lote (importações de clínicas): POST /api/gerar-plano/lote.
+
+Entrada: array JSON de anamneses ou NDJSON (uma por linha, lido à medida que chega).
+Saída: NDJSON, uma linha por item assim que ele termina (fora de ordem), e um resumo no fim:
+
+    {"indice": 0, "resultado": {...PlanoResponse...}}
+    {"indice": 3, "duplicado_de": 0}
+    {"indice": 5, "erro": "..."}
+    {"resumo": {"total": 6, "gerados": 4, "duplicados": 1, "erros": 1}}
+
+Anamneses idênticas (após normalização) são geradas uma vez só; as repetições apontam para o
+primeiro índice. No máximo BATCH_CONCURRENCY gerações rodam ao mesmo tempo e a leitura da
+entrada para enquanto não houver vaga, então o lote inteiro nunca fica em memória. Cada
+geração também consome uma ficha do limite do cliente (app/admission.py); sem saldo, a
+leitura espera a reposição.
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, Optional, Tuple, Union
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from starlette.requests import ClientDisconnect
+
+from .admission import limitador_ativo
+from .cancellation import aguardar_desconexao
+from .config import get_settings
+from .plan_cache import hash_anamnese
+from .plan_service import obter_plano
+from .schemas import Anamnese
+
+MEDIA_TYPE_NDJSON = "application/x-ndjson"
+
+# Uma anamnese ocupa poucos KB; protege a memória contra uma "linha" sem fim
+MAX_BYTES_LINHA = 256 * 1024
+
+# Item lido da entrada: anamnese válida ou a mensagem de erro da validação
+Item = Tuple[int, Union[Anamnese, str]]
+
+
+class RespostaNDJSON(StreamingResponse):
+    """StreamingResponse que não consome `receive`.
+
+    O StreamingResponse padrão escuta a desconexão lendo `receive` em paralelo e descartaria
+    as mensagens do corpo NDJSON que ainda está chegando; aqui a desconexão é vigiada pelo
+    próprio gerador, depois que a entrada termina.
+    """
+
+    def __init__(self, conteudo: AsyncIterator[bytes]) -> None:
+        super().__init__(conteudo, media_type=MEDIA_TYPE_NDJSON, headers={"X-Accel-Buffering": "no"})
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+
+
+def _linha(dados: Dict[str, Any]) -> bytes:
+    return json.dumps(dados, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def _validar(bruto: Any) -> Union[Anamnese, str]:
+    try:
+        return Anamnese.model_validate(bruto)
+    except ValidationError as exc:
+        detalhes = "; ".join(f"{'.'.join(map(str, e['loc'])) or 'anamnese'}: {e['msg']}" for e in exc.errors()[:5])
+        return f"Anamnese inválida ({exc.error_count()} erro(s)): {detalhes}"
+
+
+async def _itens_ndjson(request: Request) -> AsyncIterator[Item]:
+    buffer = b""
+    indice = 0
+    async for pedaco in request.stream():
+        buffer += pedaco
+        *linhas, buffer = buffer.split(b"\n")
+        if len(buffer) > MAX_BYTES_LINHA:
+            raise ValueError(f"Linha {indice + len(linhas) + 1} excede {MAX_BYTES_LINHA} bytes.")
+        for linha in linhas:
+            if linha.strip():
+                yield indice, _decodificar_linha(linha)
+                indice += 1
+    if buffer.strip():
+        yield indice, _decodificar_linha(buffer)
+
+
+def _decodificar_linha(linha: bytes) -> Union[Anamnese, str]:
+    try:
+        return _validar(json.loads(linha))
+    except ValueError as exc:
+        return f"JSON inválido: {exc}"
+
+
+async def _itens_lista(lista: list) -> AsyncIterator[Item]:
+    for indice, bruto in enumerate(lista):
+        yield indice, _validar(bruto)
+
+
+async def ler_entrada(request: Request) -> AsyncIterator[Item]:
+    """Itens do corpo: NDJSON em fluxo ou, para application/json, um array lido de uma vez."""
+    if request.headers.get("content-type", "").split(";")[0].strip() == MEDIA_TYPE_NDJSON:
+        return _itens_ndjson(request)
+    try:
+        lista = json.loads(await request.body())
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=f"JSON inválido: {exc}")
+    if not isinstance(lista, list):
+        raise HTTPException(status_code=422, detail="Envie um array JSON de anamneses ou NDJSON.")
+    return _itens_lista(lista)
+
+
+async def gerar_planos_em_lote(
+    request: Request, itens: AsyncIterator[Item], *, usar_cache: bool = True, chave_limite: Optional[str] = None
+) -> AsyncIterator[bytes]:
+    """Gera os planos de `itens` com concorrência limitada, emitindo linhas NDJSON ao terminar cada um."""
+    settings = get_settings()
+    limitador = limitador_ativo() if chave_limite is not None else None
+    vagas = asyncio.Semaphore(max(1, settings.batch_concurrency))
+    # Sem limite de tamanho: gerações não podem travar esperando o cliente ler (ele pode só
+    # ler a resposta depois de enviar o corpo inteiro); quem limita a produção são as vagas.
+    saida: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue()
+    tarefas: set["asyncio.Task[None]"] = set()
+    contagem = {"total": 0, "gerados": 0, "duplicados": 0, "erros": 0}
+    entrada_lida = asyncio.Event()
+
+    def emitir(indice: int, chave: str, valor: Any) -> None:
+        contagem[{"resultado": "gerados", "duplicado_de": "duplicados", "erro": "erros"}[chave]] += 1
+        saida.put_nowait(_linha({"indice": indice, chave: valor}))
+
+    async def gerar(indice: int, anamnese: Anamnese) -> None:
+        try:
+            resposta = await obter_plano(anamnese, usar_cache=usar_cache)
+        except HTTPException as exc:
+            emitir(indice, "erro", str(exc.detail))
+        except Exception as exc:  # noqa: BLE001
+            emitir(indice, "erro", f"Erro ao gerar o plano: {exc}")
+        else:
+            # Plano serializado uma vez, direto para a linha (sem json.loads/dumps de volta)
+            contagem["gerados"] += 1
+            saida.put_nowait(b'{"indice":%d,"resultado":%s}\n' % (indice, resposta.model_dump_json().encode("utf-8")))
+        finally:
+            vagas.release()
+
+    async def ler() -> None:
+        primeiro_indice: Dict[str, int] = {}
+        async for indice, item in itens:
+            if indice >= settings.batch_max_items:
+                saida.put_nowait(_linha({"erro": f"Lote limitado a {settings.batch_max_items} itens; o restante foi ignorado."}))
+                return
+            contagem["total"] += 1
+            if isinstance(item, str):
+                emitir(indice, "erro", item)
+                continue
+            chave = hash_anamnese(item)
+            if chave in primeiro_indice:
+                emitir(indice, "duplicado_de", primeiro_indice[chave])
+                continue
+            primeiro_indice[chave] = indice
+            if limitador is not None:
+                await limitador.aguardar(chave_limite)
+            # Sem vaga, a leitura da entrada espera (contrapressão até o cliente)
+            await vagas.acquire()
+            tarefa = asyncio.create_task(gerar(indice, item))
+            tarefas.add(tarefa)
+            tarefa.add_done_callback(tarefas.discard)
+
+    async def distribuir() -> None:
+        try:
+            try:
+                await ler()
+            except ValueError as exc:
+                saida.put_nowait(_linha({"erro": str(exc)}))
+            finally:
+                entrada_lida.set()
+            if tarefas:
+                await asyncio.gather(*tarefas)
+            saida.put_nowait(_linha({"resumo": contagem}))
+        except ClientDisconnect:
+            pass
+        finally:
+            saida.put_nowait(None)
+
+    async def vigiar() -> None:
+        # Só depois da entrada lida `receive` passa a devolver apenas a desconexão do cliente
+        await entrada_lida.wait()
+        await aguardar_desconexao(request)
+
+    distribuidor = asyncio.create_task(distribuir())
+    vigia = asyncio.create_task(vigiar())
+    try:
+        while True:
+            proxima = asyncio.ensure_future(saida.get())
+            await asyncio.wait({proxima, vigia}, return_when=asyncio.FIRST_COMPLETED)
+            if not proxima.done():
+                proxima.cancel()
+                return  # cliente desconectou: cancela o que falta
+            linha = proxima.result()
+            if linha is None:
+                return
+            yield linha
+    finally:
+        for tarefa in (distribuidor, vigia, *tarefas):
+            if not tarefa.done():
+                tarefa.cancel()
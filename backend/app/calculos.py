@@ -0,0 +1,214 @@
+"""Cálculos nutricionais determinísticos (IMC, TMB, gasto energético e meta calórica).
+
+Feitos no backend antes da chamada ao modelo: os valores entram no prompt como dados fixos e
+preenchem `explicacao_geracao.calculos` diretamente, sem depender da aritmética da IA.
+"""
+from dataclasses import dataclass
+from typing import List, Optional
+
+from .schemas import Anamnese, CalculoNutricional, DadosBasicos, Objetivos, Rotina
+
+# Fatores de atividade (multiplicam a TMB para estimar o gasto energético total)
+FATOR_SEDENTARIO = 1.2
+FATOR_LEVE = 1.375
+FATOR_MODERADO = 1.55
+
+# Ajuste da meta calórica conforme o objetivo principal (fração do gasto total)
+AJUSTE_DEFICIT = -0.20
+AJUSTE_SUPERAVIT = 0.10
+# Piso educativo: metas abaixo disso não são sugeridas sem acompanhamento profissional
+CALORIAS_MINIMAS = 1200
+
+# Textos de `como_calculos` por idioma do plano: "en*" em inglês; os demais em pt-BR
+_TEXTOS = {
+    "pt": {
+        "classes_imc": {
+            "abaixo do peso": "abaixo do peso",
+            "peso adequado": "peso adequado",
+            "sobrepeso": "sobrepeso",
+            "obesidade": "obesidade",
+        },
+        "imc": "IMC",
+        "imc_descricao": "Índice de massa corporal: peso dividido pela altura ao quadrado ({classe}).",
+        "imc_sem_dados": "Não foi possível calcular: peso e altura não foram informados.",
+        "tmb": "TMB",
+        "tmb_descricao": "Taxa metabólica basal pela fórmula de Mifflin-St Jeor (peso, altura, idade e sexo).",
+        "tmb_sem_dados": "Não foi possível calcular: são necessários peso, altura e idade.",
+        "gasto": "Gasto energético total",
+        "gasto_descricao": "TMB multiplicada pelo fator de atividade {fator} conforme a rotina informada.",
+        "deficit": "déficit de {ajuste:.0%} para o objetivo de emagrecimento",
+        "superavit": "superávit de {ajuste:.0%} para o objetivo de ganho de massa",
+        "manutencao": "sem ajuste (manutenção do peso)",
+        "meta": "Calorias diárias estimadas",
+        "meta_descricao": "Gasto energético total com {ajuste}, respeitando o mínimo de {minimo} kcal.",
+        "meta_sem_dados": "Não foi possível estimar sem peso, altura e idade; o plano usa porções moderadas.",
+    },
+    "en": {
+        "classes_imc": {
+            "abaixo do peso": "underweight",
+            "peso adequado": "healthy weight",
+            "sobrepeso": "overweight",
+            "obesidade": "obesity",
+        },
+        "imc": "BMI",
+        "imc_descricao": "Body mass index: weight divided by height squared ({classe}).",
+        "imc_sem_dados": "Could not be calculated: weight and height were not provided.",
+        "tmb": "BMR",
+        "tmb_descricao": "Basal metabolic rate using the Mifflin-St Jeor equation (weight, height, age and sex).",
+        "tmb_sem_dados": "Could not be calculated: weight, height and age are required.",
+        "gasto": "Total energy expenditure",
+        "gasto_descricao": "BMR multiplied by an activity factor of {fator} based on the reported routine.",
+        "deficit": "a {ajuste:.0%} deficit for the weight-loss goal",
+        "superavit": "a {ajuste:.0%} surplus for the muscle-gain goal",
+        "manutencao": "no adjustment (weight maintenance)",
+        "meta": "Estimated daily calories",
+        "meta_descricao": "Total energy expenditure with {ajuste}, never below {minimo} kcal.",
+        "meta_sem_dados": "Could not be estimated without weight, height and age; the plan uses moderate portions.",
+    },
+}
+
+_PALAVRAS_DEFICIT = ("emagrec", "perder peso", "perda de peso", "perda de gordura", "definição", "secar")
+_PALAVRAS_SUPERAVIT = ("ganho de massa", "ganhar massa", "hipertrofia", "ganhar peso", "ganho de peso", "bulking")
+
+
+def calcular_imc(dados: DadosBasicos) -> Optional[float]:
+    if not dados.peso_kg or not dados.altura_cm:
+        return None
+    altura_m = dados.altura_cm / 100
+    return dados.peso_kg / (altura_m * altura_m)
+
+
+def classificar_imc(imc: float) -> str:
+    if imc < 18.5:
+        return "abaixo do peso"
+    if imc < 25:
+        return "peso adequado"
+    if imc < 30:
+        return "sobrepeso"
+    return "obesidade"
+
+
+def calcular_tmb(dados: DadosBasicos) -> Optional[float]:
+    """Mifflin-St Jeor; sem sexo informado, usa a média das constantes masculina e feminina."""
+    if not dados.peso_kg or not dados.altura_cm or not dados.idade:
+        return None
+    base = 10 * dados.peso_kg + 6.25 * dados.altura_cm - 5 * dados.idade
+    sexo = (dados.sexo or "").strip().lower()
+    if sexo.startswith("m"):
+        return base + 5
+    if sexo.startswith("f"):
+        return base - 161
+    return base - 78
+
+
+def fator_atividade(rotina: Rotina) -> float:
+    if rotina.pratica_atividade_fisica:
+        return FATOR_MODERADO
+    if rotina.pratica_atividade_fisica is False:
+        return FATOR_LEVE if rotina.trabalha_fora else FATOR_SEDENTARIO
+    return FATOR_LEVE
+
+
+def ajuste_objetivo(objetivos: Objetivos) -> float:
+    objetivo = objetivos.objetivo_principal.lower()
+    if any(p in objetivo for p in _PALAVRAS_DEFICIT):
+        return AJUSTE_DEFICIT
+    if any(p in objetivo for p in _PALAVRAS_SUPERAVIT):
+        return AJUSTE_SUPERAVIT
+    return 0.0
+
+
+@dataclass(frozen=True)
+class ResultadoCalculos:
+    imc: Optional[float]
+    tmb_kcal: Optional[float]
+    fator_atividade: float
+    gasto_total_kcal: Optional[float]
+    ajuste_objetivo: float
+    meta_calorias_kcal: Optional[float]
+
+    def para_prompt(self) -> dict:
+        """Valores fixos enviados ao modelo (só os disponíveis)."""
+        valores = {
+            "imc": round(self.imc, 1) if self.imc is not None else None,
+            "tmb_kcal": round(self.tmb_kcal) if self.tmb_kcal is not None else None,
+            "gasto_total_kcal": round(self.gasto_total_kcal) if self.gasto_total_kcal is not None else None,
+            "meta_calorias_kcal": round(self.meta_calorias_kcal) if self.meta_calorias_kcal is not None else None,
+        }
+        return {k: v for k, v in valores.items() if v is not None}
+
+    def como_calculos(self, idioma: str = "pt-BR") -> List[CalculoNutricional]:
+        """Cálculos para `explicacao_geracao`, com textos em inglês para idiomas "en*" e em
+        pt-BR para os demais."""
+        ingles = idioma.lower().startswith("en")
+        textos = _TEXTOS["en" if ingles else "pt"]
+
+        def fmt(valor: Optional[float], casas: int = 0) -> Optional[str]:
+            if valor is None:
+                return None
+            texto = f"{valor:.{casas}f}"
+            return texto.replace(".", ",") if idioma.lower().startswith("pt") else texto
+
+        calculos = [
+            CalculoNutricional(
+                nome=textos["imc"],
+                valor=fmt(self.imc, 1),
+                unidade="kg/m²",
+                descricao=(
+                    textos["imc_descricao"].format(classe=textos["classes_imc"][classificar_imc(self.imc)])
+                    if self.imc is not None
+                    else textos["imc_sem_dados"]
+                ),
+            ),
+            CalculoNutricional(
+                nome=textos["tmb"],
+                valor=fmt(self.tmb_kcal),
+                unidade="kcal",
+                descricao=textos["tmb_descricao"] if self.tmb_kcal is not None else textos["tmb_sem_dados"],
+            ),
+        ]
+        if self.gasto_total_kcal is not None:
+            calculos.append(
+                CalculoNutricional(
+                    nome=textos["gasto"],
+                    valor=fmt(self.gasto_total_kcal),
+                    unidade="kcal",
+                    descricao=textos["gasto_descricao"].format(fator=fmt(self.fator_atividade, 2)),
+                )
+            )
+        if self.ajuste_objetivo < 0:
+            ajuste = textos["deficit"].format(ajuste=abs(self.ajuste_objetivo))
+        elif self.ajuste_objetivo > 0:
+            ajuste = textos["superavit"].format(ajuste=self.ajuste_objetivo)
+        else:
+            ajuste = textos["manutencao"]
+        calculos.append(
+            CalculoNutricional(
+                nome=textos["meta"],
+                valor=fmt(self.meta_calorias_kcal),
+                unidade="kcal",
+                descricao=(
+                    textos["meta_descricao"].format(ajuste=ajuste, minimo=CALORIAS_MINIMAS)
+                    if self.meta_calorias_kcal is not None
+                    else textos["meta_sem_dados"]
+                ),
+            )
+        )
+        return calculos
+
+
+def calcular(anamnese: Anamnese) -> ResultadoCalculos:
+    imc = calcular_imc(anamnese.dados_basicos)
+    tmb = calcular_tmb(anamnese.dados_basicos)
+    fator = fator_atividade(anamnese.rotina)
+    ajuste = ajuste_objetivo(anamnese.objetivos)
+    gasto = tmb * fator if tmb is not None else None
+    meta = max(CALORIAS_MINIMAS, gasto * (1 + ajuste)) if gasto is not None else None
+    return ResultadoCalculos(
+        imc=imc,
+        tmb_kcal=tmb,
+        fator_atividade=fator,
+        gasto_total_kcal=gasto,
+        ajuste_objetivo=ajuste,
+        meta_calorias_kcal=meta,
+    )
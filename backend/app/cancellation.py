@@ -0,0 +1,37 @@
+import asyncio
+from typing import Awaitable, TypeVar
+
+from fastapi import HTTPException, Request
+
+T = TypeVar("T")
+
+# Código não padronizado (nginx) para "cliente fechou a conexão"
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def aguardar_desconexao(request: Request) -> None:
+    """Retorna quando o cliente HTTP fecha a conexão (o corpo já foi lido pelo FastAPI)."""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def run_until_disconnected(request: Request, awaitable: Awaitable[T]) -> T:
+    """Executa `awaitable` e o cancela se o cliente desconectar antes do fim.
+
+    Evita que gerações longas continuem consumindo tokens e conexões com o modelo
+    depois que ninguém mais está esperando pela resposta.
+    """
+    tarefa = asyncio.ensure_future(awaitable)
+    vigia = asyncio.ensure_future(aguardar_desconexao(request))
+    try:
+        await asyncio.wait({tarefa, vigia}, return_when=asyncio.FIRST_COMPLETED)
+        if tarefa.done():
+            return tarefa.result()
+        tarefa.cancel()
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Cliente desconectou antes do fim da geração.")
+    finally:
+        for pendente in (tarefa, vigia):
+            if not pendente.done():
+                pendente.cancel()
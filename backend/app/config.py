@@ -5,9 +5,102 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     openai_api_key: str = ""
     openai_model: str = "gpt-4o-mini"
+    # API compatível com a OpenAI em outro endereço (ex.: servidor falso do benchmark em bench/)
+    openai_base_url: str = ""
+    # Template de prompt (app/prompts.py::TEMPLATES)
+    prompt_version: str = "3"
     frontend_origin: str = "http://localhost:5173"
     secret_key: str = "sua-chave-secreta-super-segura-mude-em-producao-123456789"
 
+    # Aquecimento após o startup (cliente OpenAI, passlib/jose) antes de /ready responder 200;
+    # com false (ex.: --reload em desenvolvimento) tudo é carregado no primeiro uso
+    startup_warmup: bool = True
+
+    # Banco de dados (qualquer URL SQLAlchemy; o engine assíncrono deriva o driver da URL)
+    database_url: str = "sqlite:///./mynutri.db"
+    database_async_url: str = ""
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout_s: float = 30.0
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_cache_size_kib: int = 20_000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+
+    # Pool HTTP do cliente OpenAI (um por processo, criado no aquecimento ou no primeiro uso)
+    openai_max_connections: int = 50
+    openai_max_keepalive_connections: int = 20
+    openai_keepalive_expiry_s: float = 30.0
+    openai_connect_timeout_s: float = 5.0
+    openai_read_timeout_s: float = 120.0
+    openai_write_timeout_s: float = 10.0
+    openai_pool_timeout_s: float = 10.0
+
+    # Resiliência (app/resilience.py): timeout por tentativa, retentativas e hedge para o fallback
+    openai_fallback_model: str = ""
+    openai_attempt_timeout_s: float = 60.0
+    openai_max_retries: int = 2
+    openai_retry_base_delay_s: float = 0.5
+    openai_retry_max_delay_s: float = 8.0
+    openai_hedge_after_s: float = 20.0
+
+    # Formato da saída: "json_schema" (estrito, derivado de schemas.py), "json_object" ou "texto"
+    openai_response_format: str = "json_schema"
+    # Modelo da chamada de reparo de JSON (vazio = o mesmo que respondeu)
+    openai_repair_model: str = ""
+
+    # Cache de planos por anamnese normalizada (memória LRU + SQLite opcional entre workers)
+    plan_cache_enabled: bool = True
+    plan_cache_max_entries: int = 512
+    plan_cache_ttl_s: float = 6 * 60 * 60
+    plan_cache_sqlite_path: str = ""
+    # Respostas prontas do modo demonstração (uma por objetivo distinto)
+    demo_cache_max_entries: int = 256
+
+    # Threads para bcrypt (0 = número de núcleos)
+    password_hash_workers: int = 0
+    # Cache de tokens/usuários em get_current_user
+    user_cache_ttl_s: float = 60.0
+    auth_cache_max_entries: int = 10_000
+
+    # Fila de gerações assíncronas (/api/jobs)
+    job_workers: int = 4
+    job_queue_max_size: int = 100
+    # Lease dos jobs de um processo (pendentes e em processamento): sem heartbeat por este tempo,
+    # outro processo os retoma
+    job_lease_s: float = 60.0
+
+    # Cardápio semanal: dias gerados em paralelo (chamadas simultâneas ao modelo por requisição)
+    weekly_plan_concurrency: int = 7
+    # Geração em lote (/api/gerar-plano/lote): gerações simultâneas e itens por requisição
+    batch_concurrency: int = 8
+    batch_max_items: int = 1000
+
+    # Controle de admissão (app/admission.py): chamadas simultâneas ao modelo por worker, com
+    # espera máxima por uma vaga, e token bucket por usuário (subject do JWT) ou IP, compartilhado
+    # entre os workers por um arquivo SQLite. Vazio = ao lado do banco SQLite principal
+    # (<banco>_rate_limit.db), ou só em memória se o banco não for um arquivo SQLite;
+    # ":memory:" = sempre em memória, por processo
+    llm_max_concurrency: int = 32
+    llm_queue_timeout_s: float = 5.0
+    rate_limit_enabled: bool = True
+    rate_limit_burst: int = 20
+    rate_limit_per_minute: float = 30.0
+    rate_limit_sqlite_path: str = ""
+
+    # Compressão das respostas JSON dos planos (brotli só com o pacote `brotli` instalado)
+    compress_min_bytes: int = 1024
+    gzip_level: int = 6
+    brotli_quality: int = 5
+
+    # Exportação em PDF: PDFs renderizados em memória e processos para exportações em lote
+    pdf_cache_max_entries: int = 128
+    pdf_process_workers: int = 2
+
+    # Cabeçalho Server-Timing com a latência de cada etapa (útil no DevTools; expõe detalhes internos)
+    server_timing: bool = False
+
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8"}
 
 
@@ -1,18 +1,134 @@
-from sqlalchemy import create_engine
+import hashlib
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import Column, MetaData, String, Table, create_engine, delete, event, insert, inspect, select, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool, StaticPool
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from .config import get_settings
+
+settings = get_settings()
+
+# Driver assíncrono correspondente a cada backend síncrono
+_DRIVERS_ASYNC = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _is_memory(url: str) -> bool:
+    database = make_url(url).database or ""
+    return database in ("", ":memory:") or "mode=memory" in url
+
+
+def _url_compartilhada(url: str) -> str:
+    """SQLite em memória vira um banco nomeado com cache compartilhado.
+
+    Um `sqlite://` comum existiria só na conexão que o criou: o engine assíncrono (aiosqlite,
+    outra conexão) abriria um banco vazio, sem as tabelas do init_db. Serve para testes e
+    desenvolvimento; em memória não há WAL nem concorrência de verdade entre as conexões.
+    """
+    if _is_sqlite(url) and _is_memory(url) and "cache=shared" not in url:
+        return "sqlite:///file:mynutri?mode=memory&cache=shared&uri=true"
+    return url
+
+
+# Padrão: SQLite em ./mynutri.db (DATABASE_URL aceita arquivo, memória ou outro backend SQLAlchemy)
+SQLALCHEMY_DATABASE_URL = _url_compartilhada(settings.database_url)
+
+
+def _engine_kwargs(url: str, queue_pool: type[Pool] = QueuePool) -> dict:
+    if _is_sqlite(url):
+        connect_args = {"check_same_thread": False, "timeout": settings.sqlite_busy_timeout_ms / 1000}
+        if _is_memory(url):
+            # Uma conexão por engine, sempre aberta: o banco em memória vive enquanto houver conexão
+            return {"connect_args": connect_args, "poolclass": StaticPool}
+        return {
+            "connect_args": connect_args,
+            "poolclass": queue_pool,
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout_s,
+        }
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout_s,
+        "pool_pre_ping": True,
+    }
+
+
+def _aplicar_pragmas_sqlite(dbapi_connection, _connection_record) -> None:
+    """Ajustes por conexão: WAL permite leitores concorrentes a um escritor; busy_timeout
+    espera o lock em vez de falhar com "database is locked"."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA cache_size={-int(settings.sqlite_cache_size_kib)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _configurar(engine: Engine, url: str) -> Engine:
+    if _is_sqlite(url):
+        event.listen(engine, "connect", _aplicar_pragmas_sqlite)
+    return engine
 
-# SQLite database
-SQLALCHEMY_DATABASE_URL = "sqlite:///./mynutri.db"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+engine = _configurar(
+    create_engine(SQLALCHEMY_DATABASE_URL, **_engine_kwargs(SQLALCHEMY_DATABASE_URL)),
+    SQLALCHEMY_DATABASE_URL,
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Versão do schema gravada no banco (fora de Base para não entrar no próprio hash)
+_controle = MetaData()
+_schema_versao = Table("schema_versao", _controle, Column("versao", String(64), primary_key=True))
+
+_async_engine: Optional[AsyncEngine] = None
+_AsyncSessionLocal: Optional[async_sessionmaker[AsyncSession]] = None
+
+
+def async_database_url() -> str:
+    """URL do engine assíncrono: DATABASE_ASYNC_URL ou a DATABASE_URL com o driver assíncrono."""
+    if settings.database_async_url:
+        return settings.database_async_url
+    url = make_url(SQLALCHEMY_DATABASE_URL)
+    driver = _DRIVERS_ASYNC.get(url.get_backend_name())
+    if driver is None:
+        raise RuntimeError(f"Sem driver assíncrono conhecido para {url.get_backend_name()}; defina DATABASE_ASYNC_URL.")
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def get_async_engine() -> AsyncEngine:
+    """Engine assíncrono (aiosqlite para SQLite), criado no primeiro uso.
+
+    Com SQLite em memória, aponta para o mesmo banco nomeado do engine síncrono.
+    """
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        url = async_database_url()
+        # aiosqlite usaria NullPool (uma conexão nova por sessão); mantém o pool em fila
+        _async_engine = create_async_engine(url, **_engine_kwargs(url, AsyncAdaptedQueuePool))
+        _configurar(_async_engine.sync_engine, url)
+        _AsyncSessionLocal = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
 
 def get_db():
     """Dependency para obter sessão do banco de dados"""
@@ -23,6 +139,68 @@ def get_db():
         db.close()
 
 
-def init_db():
-    """Cria todas as tabelas no banco de dados"""
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Dependency para obter sessão assíncrona do banco de dados"""
+    get_async_engine()
+    async with _AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose_engines() -> None:
+    """Fecha os pools de conexão (chamado no shutdown)."""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _AsyncSessionLocal = None
+    engine.dispose()
+
+
+def versao_schema() -> str:
+    """Hash do DDL de todas as tabelas e índices de Base: muda sempre que um modelo muda."""
+    ddl = []
+    for tabela in Base.metadata.sorted_tables:
+        ddl.append(str(CreateTable(tabela).compile(dialect=engine.dialect)))
+        for indice in sorted(tabela.indexes, key=lambda i: i.name or ""):
+            ddl.append(str(CreateIndex(indice).compile(dialect=engine.dialect)))
+    return hashlib.sha256("\n".join(ddl).encode("utf-8")).hexdigest()
+
+
+def _adicionar_colunas_novas(conn) -> None:
+    """O `create_all` não altera tabelas existentes: acrescenta as colunas que faltam.
+
+    Só serve para colunas anuláveis (sem default no banco), como as que os modelos ganham.
+    """
+    inspetor = inspect(conn)
+    for tabela in Base.metadata.sorted_tables:
+        if not inspetor.has_table(tabela.name):
+            continue
+        existentes = {coluna["name"] for coluna in inspetor.get_columns(tabela.name)}
+        for coluna in tabela.columns:
+            if coluna.name not in existentes:
+                tipo = coluna.type.compile(dialect=conn.dialect)
+                conn.execute(text(f"ALTER TABLE {tabela.name} ADD COLUMN {coluna.name} {tipo}"))
+
+
+def init_db() -> bool:
+    """Cria as tabelas e colunas que faltam, exceto se o banco já estiver na versão atual do schema.
+
+    Uma consulta no caminho comum, em vez da inspeção de cada tabela do `create_all`.
+    Retorna se o `create_all` rodou.
+    """
+    versao = versao_schema()
+    with engine.connect() as conn:
+        try:
+            atual = conn.execute(select(_schema_versao.c.versao)).scalar()
+        except (OperationalError, ProgrammingError):  # banco novo, sem a tabela de controle
+            atual = None
+    if atual == versao:
+        return False
+    with engine.begin() as conn:
+        _adicionar_colunas_novas(conn)
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        _controle.create_all(conn)
+        conn.execute(delete(_schema_versao))
+        conn.execute(insert(_schema_versao).values(versao=versao))
+    return True
@@ -0,0 +1,343 @@
+import asyncio
+import logging
+import math
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_, select
+
+from .config import get_settings
+from .database import SessionLocal
+from .models import JobWorker, PlanJob
+from .plan_service import obter_plano
+from .schemas import Anamnese, FilaStats, JobStatus, PlanoResponse
+
+logger = logging.getLogger(__name__)
+
+STATUS_FINAIS = ("concluido", "erro")
+STATUS_ABERTOS = ("pendente", "processando")
+
+
+class FilaCheia(Exception):
+    """A fila atingiu a capacidade; o cliente deve tentar de novo após `retry_after` segundos."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("Fila de gerações cheia")
+        self.retry_after = retry_after
+
+
+class EstadoFila(NamedTuple):
+    """Fila de todo o deployment (todos os processos que usam o banco)."""
+
+    na_fila: int = 0
+    em_processamento: int = 0
+    workers: int = 0
+    duracao_media_s: float = 20.0
+    posicao: Optional[int] = None
+
+    def espera_estimada(self, posicao: int) -> float:
+        """Tempo estimado até o fim de um job com `posicao` jobs à frente."""
+        rodadas = posicao // max(1, self.workers) + 1
+        return round(rodadas * self.duracao_media_s, 1)
+
+
+def _agora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# Operações de banco (síncronas; executadas via asyncio.to_thread)
+#
+# Cada job aberto tem um dono (worker_id = id de uma JobQueue). O lease é o heartbeat do dono em
+# job_workers, renovado a cada lease_s / 3: um heartbeat por processo cobre todos os seus jobs.
+# Jobs de um dono sem heartbeat recente (processo morto, parado ou travado) são órfãos e passam
+# para quem os encontrar primeiro.
+
+def _vivos(lease_s: float):
+    return select(JobWorker.id).where(JobWorker.heartbeat_at >= _agora() - timedelta(seconds=lease_s))
+
+
+def _estado_fila(db, lease_s: float, job: Optional[PlanJob] = None) -> EstadoFila:
+    contagens = dict(
+        db.query(PlanJob.status, func.count())
+        .filter(PlanJob.status.in_(STATUS_ABERTOS))
+        .group_by(PlanJob.status)
+        .all()
+    )
+    workers, duracao = db.query(func.sum(JobWorker.workers), func.avg(JobWorker.duracao_media_s)).filter(
+        JobWorker.id.in_(_vivos(lease_s))
+    ).one()
+    posicao = None
+    if job is not None and job.status == "pendente":
+        posicao = (
+            db.query(func.count())
+            .select_from(PlanJob)
+            .filter(
+                PlanJob.status == "pendente",
+                or_(
+                    PlanJob.created_at < job.created_at,
+                    and_(PlanJob.created_at == job.created_at, PlanJob.id < job.id),
+                ),
+            )
+            .scalar()
+        )
+    return EstadoFila(
+        na_fila=contagens.get("pendente", 0),
+        em_processamento=contagens.get("processando", 0),
+        workers=workers or 0,
+        duracao_media_s=duracao if duracao is not None else EstadoFila().duracao_media_s,
+        posicao=posicao,
+    )
+
+
+def _registrar_worker(worker_id: str, workers: int, duracao_media_s: float) -> None:
+    """Cria ou renova o heartbeat do processo (e com ele o lease de todos os seus jobs)."""
+    with SessionLocal() as db:
+        db.merge(JobWorker(id=worker_id, workers=workers, duracao_media_s=duracao_media_s, heartbeat_at=_agora()))
+        db.commit()
+
+
+def _remover_worker(worker_id: str) -> None:
+    """Parada limpa: os jobs abertos deste processo viram órfãos na hora, sem esperar o lease."""
+    with SessionLocal() as db:
+        db.query(JobWorker).filter(JobWorker.id == worker_id).delete()
+        db.commit()
+
+
+def _inserir_job(
+    job_id: str, anamnese_json: str, usar_cache: bool, worker_id: str, max_size: int, lease_s: float
+) -> Tuple[bool, EstadoFila]:
+    """Insere o job se a fila (de todo o deployment) tiver espaço; retorna (inserido, estado antes)."""
+    with SessionLocal() as db:
+        estado = _estado_fila(db, lease_s)
+        if estado.na_fila >= max_size:
+            return False, estado
+        db.add(
+            PlanJob(
+                id=job_id,
+                status="pendente",
+                anamnese_json=anamnese_json,
+                usar_cache=usar_cache,
+                worker_id=worker_id,
+                # No Python (microssegundos): a posição na fila ordena por created_at
+                created_at=_agora(),
+            )
+        )
+        db.commit()
+        return True, estado
+
+
+def _carregar_job(job_id: str, lease_s: float) -> Tuple[Optional[PlanJob], EstadoFila]:
+    with SessionLocal() as db:
+        job = db.get(PlanJob, job_id)
+        return job, _estado_fila(db, lease_s, job)
+
+
+def _consultar_estado(lease_s: float) -> EstadoFila:
+    with SessionLocal() as db:
+        return _estado_fila(db, lease_s)
+
+
+def _reivindicar_job(job_id: str, worker_id: str) -> Optional[PlanJob]:
+    """Marca o job como em processamento se ainda estiver pendente e for deste processo
+    (evita processar duas vezes, inclusive depois de outro processo adotá-lo)."""
+    with SessionLocal() as db:
+        atualizados = (
+            db.query(PlanJob)
+            .filter(PlanJob.id == job_id, PlanJob.status == "pendente", PlanJob.worker_id == worker_id)
+            .update({"status": "processando", "started_at": _agora()})
+        )
+        db.commit()
+        return db.get(PlanJob, job_id) if atualizados else None
+
+
+def _finalizar_job(job_id: str, resultado_json: Optional[str], erro: Optional[str]) -> None:
+    with SessionLocal() as db:
+        db.query(PlanJob).filter(PlanJob.id == job_id).update(
+            {
+                "status": "erro" if erro is not None else "concluido",
+                "resultado_json": resultado_json,
+                "erro": erro,
+                "finished_at": _agora(),
+            }
+        )
+        db.commit()
+
+
+def _adotar_orfaos(worker_id: str, lease_s: float) -> List[str]:
+    """Assume os jobs abertos cujo dono parou de renovar o heartbeat, na ordem de chegada.
+
+    Jobs em processamento voltam a pendente (a geração é refeita). Jobs de processos vivos,
+    pendentes ou não, continuam com eles. O UPDATE repete a condição de órfão: de dois
+    processos que encontrem o mesmo job, só um o adota.
+    """
+    orfao = and_(
+        PlanJob.status.in_(STATUS_ABERTOS),
+        or_(PlanJob.worker_id.is_(None), PlanJob.worker_id.not_in(_vivos(lease_s))),
+    )
+    with SessionLocal() as db:
+        ids = [linha.id for linha in db.query(PlanJob.id).filter(orfao)]
+        if not ids:
+            return []
+        db.query(PlanJob).filter(PlanJob.id.in_(ids), orfao).update(
+            {"status": "pendente", "worker_id": worker_id}, synchronize_session=False
+        )
+        db.commit()
+        linhas = (
+            db.query(PlanJob.id)
+            .filter(PlanJob.id.in_(ids), PlanJob.status == "pendente", PlanJob.worker_id == worker_id)
+            .order_by(PlanJob.created_at, PlanJob.id)
+        )
+        return [linha.id for linha in linhas]
+
+
+class JobQueue:
+    """Fila de gerações de plano com pool limitado de workers e backpressure.
+
+    O estado de cada job fica no banco (tabela plan_jobs), compartilhado por todos os processos:
+    profundidade, posição, espera estimada e o limite de capacidade valem para o deployment
+    inteiro. A ordem de execução dos jobs deste processo fica em memória; jobs de processos que
+    pararam são adotados no startup e a cada renovação do lease.
+    """
+
+    def __init__(self, workers: int, max_size: int, lease_s: float = 60.0) -> None:
+        self.workers = max(1, workers)
+        self.max_size = max(1, max_size)
+        self.lease_s = lease_s
+        self.worker_id = uuid.uuid4().hex
+        self._fila: "asyncio.Queue[str]" = asyncio.Queue()
+        self._tarefas: List[asyncio.Task] = []
+        # Um evento por assinante: quem desiste por timeout não afeta os demais
+        self._eventos: Dict[str, Set[asyncio.Event]] = {}
+        # Média móvel exponencial da duração de uma geração (semente conservadora)
+        self.duracao_media_s = 20.0
+        # Último estado lido do banco (para as métricas, coletadas sem await)
+        self.ultimo_estado = EstadoFila()
+
+    async def start(self) -> None:
+        await asyncio.to_thread(_registrar_worker, self.worker_id, self.workers, self.duracao_media_s)
+        for job_id in await asyncio.to_thread(_adotar_orfaos, self.worker_id, self.lease_s):
+            self._fila.put_nowait(job_id)
+        self._tarefas = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tarefas.append(asyncio.create_task(self._manter_leases()))
+
+    async def stop(self) -> None:
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        self._tarefas = []
+        try:
+            await asyncio.to_thread(_remover_worker, self.worker_id)
+        except Exception:  # noqa: BLE001
+            logger.exception("Falha ao liberar os jobs deste processo; serão retomados quando o lease vencer")
+
+    async def estado(self) -> EstadoFila:
+        self.ultimo_estado = await asyncio.to_thread(_consultar_estado, self.lease_s)
+        return self.ultimo_estado
+
+    async def submit(self, anamnese: Anamnese, usar_cache: bool = True) -> JobStatus:
+        job_id = uuid.uuid4().hex
+        inserido, estado = await asyncio.to_thread(
+            _inserir_job, job_id, anamnese.model_dump_json(), usar_cache, self.worker_id, self.max_size, self.lease_s
+        )
+        if not inserido:
+            raise FilaCheia(retry_after=max(1, math.ceil(estado.espera_estimada(0))))
+        self._fila.put_nowait(job_id)
+        return JobStatus(
+            job_id=job_id,
+            status="pendente",
+            posicao_na_fila=estado.na_fila,
+            espera_estimada_s=estado.espera_estimada(estado.na_fila),
+        )
+
+    async def status(self, job_id: str) -> Optional[JobStatus]:
+        job, estado = await asyncio.to_thread(_carregar_job, job_id, self.lease_s)
+        if job is None:
+            return None
+        resposta = JobStatus(job_id=job.id, status=job.status, erro=job.erro)
+        if job.status == "pendente":
+            resposta.posicao_na_fila = estado.posicao
+            resposta.espera_estimada_s = estado.espera_estimada(estado.posicao)
+        elif job.status == "processando":
+            resposta.espera_estimada_s = estado.espera_estimada(0)
+        elif job.status == "concluido" and job.resultado_json:
+            resposta.resultado = PlanoResponse.model_validate_json(job.resultado_json)
+        return resposta
+
+    async def aguardar(self, job_id: str, timeout: float) -> None:
+        """Espera o job terminar neste processo (retorna após `timeout` de qualquer forma)."""
+        evento = asyncio.Event()
+        assinantes = self._eventos.setdefault(job_id, set())
+        assinantes.add(evento)
+        try:
+            await asyncio.wait_for(evento.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass  # o job pode ter terminado em outro processo; quem assina volta a consultar o banco
+        finally:
+            assinantes.discard(evento)
+            if not assinantes and self._eventos.get(job_id) is assinantes:
+                del self._eventos[job_id]
+
+    async def stats(self) -> FilaStats:
+        estado = await self.estado()
+        return FilaStats(
+            na_fila=estado.na_fila,
+            em_processamento=estado.em_processamento,
+            workers=estado.workers,
+            capacidade=self.max_size,
+            duracao_media_s=round(estado.duracao_media_s, 1),
+            espera_estimada_s=estado.espera_estimada(estado.na_fila),
+        )
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._fila.get()
+            try:
+                await self._processar(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa: BLE001
+                logger.exception("Falha inesperada ao processar o job %s", job_id)
+            finally:
+                self._fila.task_done()
+                for evento in self._eventos.pop(job_id, ()):
+                    evento.set()
+
+    async def _manter_leases(self) -> None:
+        """Renova o heartbeat deste processo e adota os jobs de processos que pararam de renovar."""
+        while True:
+            await asyncio.sleep(self.lease_s / 3)
+            try:
+                await asyncio.to_thread(_registrar_worker, self.worker_id, self.workers, self.duracao_media_s)
+                for job_id in await asyncio.to_thread(_adotar_orfaos, self.worker_id, self.lease_s):
+                    self._fila.put_nowait(job_id)
+            except Exception:  # noqa: BLE001
+                logger.exception("Falha ao renovar o lease dos jobs")
+
+    async def _processar(self, job_id: str) -> None:
+        job = await asyncio.to_thread(_reivindicar_job, job_id, self.worker_id)
+        if job is None:
+            return
+        inicio = time.monotonic()
+        resultado_json: Optional[str] = None
+        erro: Optional[str] = None
+        try:
+            anamnese = Anamnese.model_validate_json(job.anamnese_json)
+            resposta = await obter_plano(anamnese, usar_cache=job.usar_cache)
+            resultado_json = resposta.model_dump_json()
+        except HTTPException as exc:
+            erro = str(exc.detail)
+        except Exception as exc:  # noqa: BLE001
+            erro = f"Erro ao gerar o plano: {exc}"
+        duracao = time.monotonic() - inicio
+        self.duracao_media_s = 0.8 * self.duracao_media_s + 0.2 * duracao
+        await asyncio.to_thread(_finalizar_job, job_id, resultado_json, erro)
+
+
+@lru_cache
+def get_job_queue() -> JobQueue:
+    settings = get_settings()
+    return JobQueue(workers=settings.job_workers, max_size=settings.job_queue_max_size, lease_s=settings.job_lease_s)
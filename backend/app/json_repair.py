@@ -0,0 +1,117 @@
+"""Reparo local e tolerante do JSON devolvido pelo modelo (sem nova chamada à IA).
+
+Cobre as falhas mais comuns: cercas de código (```json), texto antes ou depois do objeto,
+vírgulas finais e respostas truncadas (strings, listas e objetos não fechados).
+"""
+import json
+import re
+from typing import Any, Callable, Iterator, List, Optional, Tuple, TypeVar
+
+from .metrics import medir
+
+T = TypeVar("T")
+
+_CERCA = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+
+# Quantos pontos de corte (vírgulas) testar, do fim para o início, num JSON truncado
+MAX_CORTES = 64
+
+
+class RespostaInvalida(ValueError):
+    """Nem o JSON original nem os reparos locais passaram na validação."""
+
+    def __init__(self, erro: str) -> None:
+        super().__init__(erro)
+        self.erro = erro
+
+
+def _varrer(texto: str) -> Tuple[str, List[str], bool, List[Tuple[int, Tuple[str, ...]]], bool]:
+    """Percorre o JSON fora das strings, descartando vírgulas finais.
+
+    Retorna (texto normalizado, fechamentos pendentes, terminou dentro de string,
+    pontos de corte em vírgulas com os fechamentos pendentes em cada um, objeto raiz completo).
+    """
+    saida: List[str] = []
+    pilha: List[str] = []
+    cortes: List[Tuple[int, Tuple[str, ...]]] = []
+    em_string = escape = False
+    for c in texto:
+        if em_string:
+            saida.append(c)
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                em_string = False
+            continue
+        if c == '"':
+            em_string = True
+        elif c in "{[":
+            pilha.append("}" if c == "{" else "]")
+        elif c in "}]":
+            while saida and saida[-1].isspace():
+                saida.pop()
+            if saida and saida[-1] == ",":
+                saida.pop()
+            if pilha:
+                pilha.pop()
+            if not pilha:
+                saida.append(c)
+                return "".join(saida), [], False, cortes, True
+        elif c == ",":
+            cortes.append((len(saida), tuple(pilha)))
+        saida.append(c)
+    return "".join(saida), pilha, em_string, cortes, False
+
+
+def reparos(texto: str) -> Iterator[Any]:
+    """Candidatos reparados (já decodificados), do mais fiel ao mais agressivo."""
+    m = _CERCA.search(texto)
+    if m:
+        texto = m.group(1)
+    inicio = texto.find("{")
+    if inicio < 0:
+        return
+    normalizado, pilha, em_string, cortes, completo = _varrer(texto[inicio:])
+
+    tentativas = [normalizado]
+    if not completo:
+        # Truncado: fecha o que ficou aberto; se não bastar, recua até vírgulas anteriores
+        tentativas = [normalizado + ('"' if em_string else "") + "".join(reversed(pilha))]
+        for posicao, pendentes in reversed(cortes[-MAX_CORTES:]):
+            tentativas.append(normalizado[:posicao] + "".join(reversed(pendentes)))
+
+    for tentativa in tentativas:
+        try:
+            yield json.loads(tentativa)
+        except ValueError:
+            continue
+
+
+def carregar_validado(texto: str, validar: Callable[[Any], T], operacao: str = "llm") -> Tuple[Any, T, bool]:
+    """Decodifica e valida `texto`, tentando reparos locais se preciso.
+
+    Retorna (dados, resultado de `validar`, se houve reparo). Levanta RespostaInvalida
+    com a primeira mensagem de erro quando nada passa.
+    """
+    erro: Optional[str] = None
+    try:
+        with medir(operacao, "json"):
+            dados = json.loads(texto)
+    except ValueError as exc:
+        erro = f"JSON inválido: {exc}"
+    else:
+        try:
+            with medir(operacao, "pydantic"):
+                return dados, validar(dados), False
+        except Exception as exc:  # noqa: BLE001
+            erro = f"JSON fora do formato esperado: {exc}"
+
+    with medir(operacao, "reparo_local"):
+        for candidato in reparos(texto):
+            try:
+                return candidato, validar(candidato), True
+            except Exception:  # noqa: BLE001, S112
+                continue
+    raise RespostaInvalida(erro)
@@ -0,0 +1,68 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """Cache em memória com limite de entradas (LRU), TTL opcional e contadores de acerto.
+
+    Seguro para uso entre threads (a API usa tanto o event loop quanto `asyncio.to_thread`).
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float] = None) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self._dados: "OrderedDict[K, tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: K) -> Optional[V]:
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._dados.get(key)
+            if entrada is None:
+                self.misses += 1
+                return None
+            expira_em, valor = entrada
+            if expira_em < agora:
+                del self._dados[key]
+                self.misses += 1
+                return None
+            self._dados.move_to_end(key)
+            self.hits += 1
+            return valor
+
+    def set(self, key: K, value: V, ttl_seconds: Optional[float] = None) -> None:
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expira_em = time.monotonic() + ttl if ttl else float("inf")
+        with self._lock:
+            self._dados[key] = (expira_em, value)
+            self._dados.move_to_end(key)
+            while len(self._dados) > self.max_entries:
+                self._dados.popitem(last=False)
+
+    def invalidate(self, key: K) -> None:
+        with self._lock:
+            self._dados.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._dados.clear()
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entradas": len(self._dados),
+            "max_entradas": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -1,11 +1,130 @@
-from fastapi import FastAPI
+import asyncio
+import io
+import logging
+import time
+import zipfile
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from fastapi import Body, Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from .admission import RespostaComVaga, chave_cliente, exigir_taxa, limitar_geracao, vagas_llm
+from .auth import aquecer_criptografia, auth_cache_stats, get_current_user_optional, shutdown_password_executor
+from .batch import RespostaNDJSON, gerar_planos_em_lote, ler_entrada
+from .cancellation import run_until_disconnected
 from .config import get_settings
-from .openai_client import gerar_plano
-from .schemas import Anamnese, PlanoResponse
-from .database import init_db
-from .models import User  # Importa antes de init_db() para registrar tabelas (auth pode ser reativada depois)
+from .openai_client import close_client, gerar_plano_stream, init_client, modelo_configurado
+from .plan_cache import get_plan_cache
+from .plan_service import (
+    gerar_plano_semanal,
+    geracoes_em_voo,
+    obter_plano_com_uso,
+    resposta_demonstracao,
+    respostas_demonstracao,
+    substituir_refeicao,
+)
+from .schemas import Anamnese, PlanoResponse, PlanoSemanalResponse, RegenerarRefeicaoRequest
+from .resilience import resiliencia_stats
+from .routes import auth as auth_routes
+from .routes import jobs as jobs_routes
+from .routes import planos as planos_routes
+from .streaming import sse
+from .usage import UsoTokens, usage_tracker
+from .database import dispose_engines, get_async_db, get_async_engine, init_db
+from .jobs import get_job_queue
+from .pdf import pdfs_renderizados, renderizar_lote, resposta_pdf, shutdown_pdf_pool
+from .metrics import MetricsMiddleware, medir_cpu, medir_validacao, registro
+from .models import User  # Importa antes de init_db() (no lifespan) para registrar tabelas
+from .plan_store import salvar_plano
+from .responses import resposta_json
+
+logger = logging.getLogger(__name__)
+
+
+def _coletar_estado() -> list:
+    """Métricas lidas no momento do scrape (resiliência, fila de jobs e vagas de chamadas ao modelo).
+
+    A fila de jobs vem do último estado lido do banco, atualizado pela rota /metrics antes de exportar.
+    """
+    fila = get_job_queue().ultimo_estado
+    vagas = vagas_llm.stats()
+    return [
+        (
+            "mynutri_resiliencia_total",
+            "counter",
+            "Retentativas, hedges e caminhos da saída JSON",
+            [({"evento": evento}, valor) for evento, valor in resiliencia_stats().items()],
+        ),
+        (
+            "mynutri_fila_jobs",
+            "gauge",
+            "Jobs de geração por estado (todos os processos)",
+            [({"estado": "na_fila"}, fila.na_fila), ({"estado": "em_processamento"}, fila.em_processamento)],
+        ),
+        (
+            "mynutri_llm_vagas",
+            "gauge",
+            "Vagas de chamadas simultâneas ao modelo (por worker)",
+            [({"estado": estado}, vagas[estado]) for estado in ("limite", "em_uso", "na_espera")],
+        ),
+    ]
+
+
+registro.registrar_coletor(_coletar_estado)
+
+
+def _ms_desde(inicio: float) -> float:
+    return round((time.perf_counter() - inicio) * 1000, 1)
+
+
+async def _aquecer(app: FastAPI) -> None:
+    """Carrega em segundo plano o que só seria importado no primeiro uso; /ready espera por isto."""
+    estado = app.state.inicializacao
+    inicio = time.perf_counter()
+    try:
+        # Um único cliente OpenAI (e pool HTTP keep-alive) por processo
+        await init_client()
+        await asyncio.to_thread(aquecer_criptografia)
+    except Exception:  # noqa: BLE001
+        logger.exception("Falha no aquecimento; os recursos serão carregados no primeiro uso")
+    estado["etapas_ms"]["aquecimento"] = _ms_desde(inicio)
+    estado["pronto"] = True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    inicio = time.perf_counter()
+    etapas: dict = {}
+    app.state.inicializacao = {"pronto": False, "etapas_ms": etapas}
+    etapa = time.perf_counter()
+    # DDL, ALTER TABLE e o hash do schema numa thread: o event loop segue livre durante o startup
+    schema_criado = await asyncio.to_thread(init_db)
+    etapas["banco"] = _ms_desde(etapa)
+    etapa = time.perf_counter()
+    await get_job_queue().start()
+    etapas["fila_jobs"] = _ms_desde(etapa)
+    aquecimento = asyncio.create_task(_aquecer(app)) if get_settings().startup_warmup else None
+    if aquecimento is None:
+        app.state.inicializacao["pronto"] = True
+    logger.info(
+        "Startup em %.1f ms (schema %s)",
+        _ms_desde(inicio),
+        "criado/atualizado" if schema_criado else "já na versão atual",
+    )
+    try:
+        yield
+    finally:
+        if aquecimento is not None and not aquecimento.done():
+            aquecimento.cancel()
+        await get_job_queue().stop()
+        await close_client()
+        shutdown_password_executor()
+        shutdown_pdf_pool()
+        await dispose_engines()
 
 
 def create_app() -> FastAPI:
@@ -15,6 +134,7 @@ def create_app() -> FastAPI:
         title="MyNutri AI - API",
         description="API para geração de planos alimentares educativos com IA.",
         version="0.1.0",
+        lifespan=lifespan,
     )
 
     # Permite frontend em localhost e 127.0.0.1 (evita "Failed to fetch" por CORS)
@@ -30,19 +150,165 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    app.add_middleware(MetricsMiddleware)
 
-    # Inicializa banco de dados (importa models primeiro para registrar as tabelas)
-    init_db()
+    app.include_router(auth_routes.router)
+    app.include_router(jobs_routes.router)
+    app.include_router(planos_routes.router)
 
     @app.get("/health")
     async def health() -> dict:
+        """Liveness: o processo está de pé (não depende do banco nem do aquecimento)."""
         return {"status": "ok"}
 
-    @app.post("/api/gerar-plano", response_model=PlanoResponse)
-    async def api_gerar_plano(anamnese: Anamnese) -> PlanoResponse:
-        """Gera plano alimentar (uso fictício, sem autenticação por enquanto)."""
-        plano, modelo, explicacao = gerar_plano(anamnese)
-        return PlanoResponse(plano=plano, modelo_utilizado=modelo, explicacao_geracao=explicacao)
+    @app.get("/ready")
+    async def ready() -> JSONResponse:
+        """Readiness: startup e aquecimento concluídos e banco respondendo; 503 até lá."""
+        estado = getattr(app.state, "inicializacao", None)
+        if estado is None or not estado["pronto"]:
+            return JSONResponse(status_code=503, content={"status": "iniciando"})
+        try:
+            async with get_async_engine().connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        except Exception as exc:  # noqa: BLE001
+            return JSONResponse(status_code=503, content={"status": "banco indisponível", "detail": str(exc)})
+        return JSONResponse({"status": "pronto", "inicializacao_ms": estado["etapas_ms"]})
+
+    @app.post("/api/gerar-plano", response_model=PlanoResponse, dependencies=[Depends(limitar_geracao)])
+    async def api_gerar_plano(
+        anamnese: Anamnese,
+        request: Request,
+        forcar_nova_geracao: bool = Query(False, description="Ignora o cache e gera um plano novo"),
+        usuario: Optional[User] = Depends(get_current_user_optional),
+        db: AsyncSession = Depends(get_async_db),
+    ) -> Response:
+        """Gera plano alimentar. Com token válido, o plano também vai para o histórico do usuário."""
+        medir_validacao("plano")
+        uso = UsoTokens()
+        if modelo_configurado() == "demonstracao":
+            # Bytes prontos: sem validar/serializar o PlanoResponse a cada requisição
+            with medir_cpu("plano", "serializacao"):
+                corpo = resposta_demonstracao(anamnese)
+            modelo = "demonstracao"
+        else:
+            resposta, uso = await run_until_disconnected(
+                request, obter_plano_com_uso(anamnese, usar_cache=not forcar_nova_geracao)
+            )
+            with medir_cpu("plano", "serializacao"):
+                corpo = resposta.model_dump_json().encode("utf-8")
+            modelo = resposta.modelo_utilizado
+        cabecalhos = {}
+        if usuario is not None:
+            plano_id = await salvar_plano(db, usuario.id, anamnese, modelo, corpo, uso)
+            cabecalhos["Content-Location"] = f"/api/planos/{plano_id}"
+        return resposta_json(request, corpo, cabecalhos=cabecalhos)
+
+    @app.post("/api/gerar-plano/refeicao", response_model=PlanoResponse, dependencies=[Depends(limitar_geracao)])
+    async def api_regenerar_refeicao(pedido: RegenerarRefeicaoRequest, request: Request) -> Response:
+        """Troca uma refeição do plano (as demais e a explicação são mantidas)."""
+        resposta = await run_until_disconnected(request, substituir_refeicao(pedido))
+        return resposta_json(request, resposta, "refeicao")
+
+    @app.post("/api/gerar-plano/semanal", response_model=PlanoSemanalResponse)
+    async def api_gerar_plano_semanal(
+        anamnese: Anamnese,
+        request: Request,
+        dias: int = Query(7, ge=1, le=7, description="Quantidade de dias do cardápio"),
+        chave: str = Depends(chave_cliente),
+    ) -> Response:
+        """Cardápio de vários dias gerado em paralelo; dias com falha vêm com `erro`."""
+        # Uma geração por dia: custa `dias` fichas do limite do cliente
+        await exigir_taxa(chave, dias)
+        resposta = await run_until_disconnected(request, gerar_plano_semanal(anamnese, dias))
+        return resposta_json(request, resposta, "semanal")
+
+    @app.post("/api/gerar-plano/lote")
+    async def api_gerar_planos_em_lote(
+        request: Request,
+        forcar_nova_geracao: bool = Query(False, description="Ignora o cache e gera planos novos"),
+        chave: str = Depends(chave_cliente),
+    ) -> RespostaNDJSON:
+        """Gera planos para um array JSON de anamneses ou NDJSON (uma por linha).
+
+        Responde em NDJSON, uma linha por item assim que ele fica pronto (ver app/batch.py);
+        falhas de um item não interrompem os demais. Cada item consome uma ficha do limite do
+        cliente; sem saldo, o lote espera em vez de recusar.
+        """
+        itens = await ler_entrada(request)
+        return RespostaNDJSON(
+            gerar_planos_em_lote(request, itens, usar_cache=not forcar_nova_geracao, chave_limite=chave)
+        )
+
+    @app.post("/api/gerar-plano/pdf", response_class=Response)
+    async def api_exportar_pdf(resposta: PlanoResponse, request: Request) -> Response:
+        """PDF do plano enviado (mesmo layout do PDF do frontend), com cache de renderização.
+
+        POST não é revalidável (nunca responde 304); para downloads repetidos com 304, use o
+        plano salvo em GET /api/planos/{plano_id}/pdf.
+        """
+        return resposta_pdf(request, resposta.plano)
+
+    @app.post("/api/gerar-plano/pdf/lote", response_class=Response)
+    async def api_exportar_pdf_lote(respostas: List[PlanoResponse] = Body(..., max_length=100)) -> Response:
+        """ZIP com um PDF por plano; a renderização roda num pool de processos."""
+        pdfs = await renderizar_lote([r.plano for r in respostas])
+        arquivo = io.BytesIO()
+        # PDFs já vêm comprimidos: ZIP sem compressão
+        with zipfile.ZipFile(arquivo, "w", zipfile.ZIP_STORED) as zip_:
+            for numero, pdf in enumerate(pdfs, start=1):
+                zip_.writestr(f"plano-{numero:03d}.pdf", pdf)
+        return Response(
+            content=arquivo.getvalue(),
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="planos-mynutri-ai.zip"'},
+        )
+
+    @app.post("/api/gerar-plano/stream", dependencies=[Depends(limitar_geracao)])
+    async def api_gerar_plano_stream(anamnese: Anamnese) -> StreamingResponse:
+        """Gera o plano via Server-Sent Events, enviando cada parte assim que fica pronta."""
+
+        async def eventos():
+            try:
+                async for evento, dados in gerar_plano_stream(anamnese):
+                    yield sse(evento, dados)
+            except HTTPException as exc:
+                yield sse("erro", {"detail": exc.detail})
+
+        cabecalhos = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        if modelo_configurado() == "demonstracao":
+            return StreamingResponse(eventos(), media_type="text/event-stream", headers=cabecalhos)
+        # A vaga é ocupada antes da resposta: sem vaga o cliente recebe 429, não um stream com erro
+        await vagas_llm.adquirir("plano_stream")
+        return RespostaComVaga(eventos(), media_type="text/event-stream", headers=cabecalhos)
+
+    @app.get("/api/cache/stats")
+    async def cache_stats() -> dict:
+        return {
+            "planos": get_plan_cache().stats(),
+            "geracoes_em_voo": geracoes_em_voo.stats(),
+            "demonstracao": respostas_demonstracao.stats(),
+            "pdf": pdfs_renderizados.stats(),
+            **auth_cache_stats(),
+        }
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics() -> Response:
+        """Métricas no formato de texto do Prometheus."""
+        try:
+            await get_job_queue().estado()
+        except Exception:  # noqa: BLE001
+            logger.exception("Falha ao ler a fila de jobs; métricas exportadas com o último estado")
+        return Response(content=registro.exportar(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    @app.get("/api/uso-tokens")
+    async def uso_tokens() -> dict:
+        """Tokens consumidos (prompt, em cache e de saída) agregados por modelo."""
+        return usage_tracker.stats()
+
+    @app.get("/api/resiliencia/stats")
+    async def stats_resiliencia() -> dict:
+        """Retentativas, hedges, vitórias do fallback e caminhos da saída JSON (válido, reparo local/IA, falha)."""
+        return resiliencia_stats()
 
     return app
 
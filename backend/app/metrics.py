@@ -0,0 +1,308 @@
+"""Métricas da API no formato de texto do Prometheus (GET /metrics) e cabeçalho Server-Timing.
+
+Implementação própria e mínima (contadores, gauges e histogramas com rótulos), sem dependência
+extra. `medir(operacao, etapa)` registra a latência de uma etapa no histograma e, se
+SERVER_TIMING estiver ativo, também no cabeçalho `Server-Timing` da requisição corrente.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from .config import get_settings
+
+# Segundos; as chamadas ao modelo chegam a dezenas de segundos
+BUCKETS_PADRAO = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# CPU de etapas síncronas curtas (serialização, compressão)
+BUCKETS_CPU = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+Rotulos = Tuple[str, ...]
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_rotulos(nomes: Sequence[str], valores: Sequence[str], extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()) -> None:
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._lock = threading.Lock()
+
+    def cabecalho(self) -> List[str]:
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+
+    def linhas(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()) -> None:
+        super().__init__(nome, ajuda, rotulos)
+        self._valores: Dict[Rotulos, float] = {}
+
+    def inc(self, *rotulos: str, valor: float = 1.0) -> None:
+        with self._lock:
+            self._valores[rotulos] = self._valores.get(rotulos, 0.0) + valor
+
+    def linhas(self) -> List[str]:
+        with self._lock:
+            itens = list(self._valores.items())
+        return [f"{self.nome}{_formatar_rotulos(self.rotulos, r)} {_numero(v)}" for r, v in itens]
+
+
+class Gauge(Contador):
+    tipo = "gauge"
+
+    def dec(self, *rotulos: str, valor: float = 1.0) -> None:
+        self.inc(*rotulos, valor=-valor)
+
+    @contextmanager
+    def em_andamento(self, *rotulos: str) -> Iterator[None]:
+        self.inc(*rotulos)
+        try:
+            yield
+        finally:
+            self.dec(*rotulos)
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(
+        self, nome: str, ajuda: str, rotulos: Sequence[str] = (), buckets: Sequence[float] = BUCKETS_PADRAO
+    ) -> None:
+        super().__init__(nome, ajuda, rotulos)
+        self.buckets = tuple(sorted(buckets))
+        # Por série: contagens por bucket (não cumulativas), soma e total
+        self._series: Dict[Rotulos, Tuple[List[int], List[float]]] = {}
+
+    def observar(self, valor: float, *rotulos: str) -> None:
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(rotulos)
+            if serie is None:
+                serie = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[rotulos] = serie
+            serie[0][indice] += 1
+            serie[1][0] += valor
+
+    def linhas(self) -> List[str]:
+        with self._lock:
+            series = [(r, list(c), s[0]) for r, (c, s) in self._series.items()]
+        linhas: List[str] = []
+        for rotulos, contagens, soma in series:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (float("inf"),), contagens):
+                acumulado += contagem
+                le = f'le="{_numero(limite)}"'
+                linhas.append(f"{self.nome}_bucket{_formatar_rotulos(self.rotulos, rotulos, le)} {acumulado}")
+            sufixo = _formatar_rotulos(self.rotulos, rotulos)
+            linhas.append(f"{self.nome}_sum{sufixo} {_numero(soma)}")
+            linhas.append(f"{self.nome}_count{sufixo} {acumulado}")
+        return linhas
+
+
+_M = TypeVar("_M", bound=_Metrica)
+
+# Coletores chamados no scrape: devolvem (nome, tipo, ajuda, [(rótulos, valor)])
+Coleta = Tuple[str, str, str, Iterable[Tuple[Dict[str, str], float]]]
+
+
+class Registro:
+    def __init__(self) -> None:
+        self._metricas: List[_Metrica] = []
+        self._coletores: List[Callable[[], Iterable[Coleta]]] = []
+
+    def registrar(self, metrica: _M) -> _M:
+        self._metricas.append(metrica)
+        return metrica
+
+    def registrar_coletor(self, coletor: Callable[[], Iterable[Coleta]]) -> None:
+        self._coletores.append(coletor)
+
+    def exportar(self) -> str:
+        linhas: List[str] = []
+        for metrica in self._metricas:
+            linhas.extend(metrica.cabecalho())
+            linhas.extend(metrica.linhas())
+        for coletor in self._coletores:
+            for nome, tipo, ajuda, amostras in coletor():
+                linhas.append(f"# HELP {nome} {ajuda}")
+                linhas.append(f"# TYPE {nome} {tipo}")
+                for rotulos, valor in amostras:
+                    linhas.append(f"{nome}{_formatar_rotulos(list(rotulos), list(rotulos.values()))} {_numero(valor)}")
+        return "\n".join(linhas) + "\n"
+
+
+registro = Registro()
+
+etapas = registro.registrar(
+    Histograma(
+        "mynutri_etapa_segundos",
+        "Latência por etapa (validacao, cliente, llm, json, pydantic, serializacao, bcrypt, db...)",
+        ("operacao", "etapa"),
+    )
+)
+cpu_etapas = registro.registrar(
+    Histograma(
+        "mynutri_etapa_cpu_segundos",
+        "Tempo de CPU da thread por etapa síncrona (serializacao, compressao)",
+        ("operacao", "etapa"),
+        BUCKETS_CPU,
+    )
+)
+requisicoes = registro.registrar(
+    Contador("mynutri_http_requisicoes_total", "Requisições HTTP por rota e status", ("metodo", "rota", "status"))
+)
+duracao_requisicoes = registro.registrar(
+    Histograma("mynutri_http_duracao_segundos", "Duração das requisições HTTP", ("metodo", "rota"))
+)
+bytes_resposta = registro.registrar(
+    Histograma(
+        "mynutri_http_resposta_bytes",
+        "Bytes do corpo enviados por rota e Content-Encoding",
+        ("rota", "codificacao"),
+        BUCKETS_BYTES,
+    )
+)
+requisicoes_em_andamento = registro.registrar(
+    Gauge("mynutri_http_em_andamento", "Requisições HTTP em andamento")
+)
+chamadas_llm_em_andamento = registro.registrar(
+    Gauge("mynutri_llm_em_andamento", "Chamadas ao modelo em andamento", ("modelo",))
+)
+recusas_admissao = registro.registrar(
+    Contador("mynutri_admissao_recusadas_total", "Requisições recusadas com 429 pelo controle de admissão", ("motivo",))
+)
+erros = registro.registrar(Contador("mynutri_erros_total", "Erros por origem e tipo", ("origem", "tipo")))
+tokens = registro.registrar(
+    Contador("mynutri_llm_tokens_total", "Tokens consumidos por modelo e tipo", ("modelo", "tipo"))
+)
+
+# Etapas da requisição corrente (para o Server-Timing); None fora de uma requisição HTTP
+_server_timing: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("server_timing", default=None)
+_inicio_requisicao: ContextVar[Optional[float]] = ContextVar("inicio_requisicao", default=None)
+
+
+def observar_etapa(operacao: str, etapa: str, segundos: float) -> None:
+    etapas.observar(segundos, operacao, etapa)
+    registros = _server_timing.get()
+    if registros is not None:
+        registros.append((etapa, segundos))
+
+
+@contextmanager
+def medir(operacao: str, etapa: str) -> Iterator[None]:
+    """Mede o bloco (síncrono ou com `await` dentro) como uma etapa da operação."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar_etapa(operacao, etapa, time.perf_counter() - inicio)
+
+
+@contextmanager
+def medir_cpu(operacao: str, etapa: str) -> Iterator[None]:
+    """Como `medir`, registrando também o tempo de CPU da thread (só para blocos sem `await`:
+    durante um `await` a thread executaria outras tarefas)."""
+    inicio_cpu = time.thread_time()
+    try:
+        with medir(operacao, etapa):
+            yield
+    finally:
+        cpu_etapas.observar(time.thread_time() - inicio_cpu, operacao, etapa)
+
+
+def medir_validacao(operacao: str) -> None:
+    """Chamado no início do endpoint: registra o tempo desde a chegada da requisição
+    (roteamento, leitura e validação do corpo)."""
+    inicio = _inicio_requisicao.get()
+    if inicio is not None:
+        observar_etapa(operacao, "validacao", time.perf_counter() - inicio)
+
+
+def _server_timing_header(registros: List[Tuple[str, float]], total: float) -> bytes:
+    somas: Dict[str, float] = {}
+    for etapa, segundos in registros:
+        somas[etapa] = somas.get(etapa, 0.0) + segundos
+    somas["total"] = total
+    return ", ".join(f"{etapa};dur={segundos * 1000:.1f}" for etapa, segundos in somas.items()).encode("latin-1")
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: contagem, duração e bytes enviados por rota, requisições em andamento e Server-Timing.
+
+    ASGI puro (não BaseHTTPMiddleware) para não interferir no streaming nem na detecção de
+    desconexão do cliente.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self.server_timing = get_settings().server_timing
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        registros: List[Tuple[str, float]] = []
+        token_timing = _server_timing.set(registros)
+        token_inicio = _inicio_requisicao.set(inicio)
+        status = 500
+        codificacao = "identity"
+        enviados = 0
+
+        async def send_com_metricas(message) -> None:
+            nonlocal status, codificacao, enviados
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                for nome, valor in message.get("headers", []):
+                    if nome.lower() == b"content-encoding":
+                        codificacao = valor.decode("latin-1")
+                if self.server_timing:
+                    cabecalhos = list(message.get("headers", []))
+                    cabecalhos.append(
+                        (b"server-timing", _server_timing_header(registros, time.perf_counter() - inicio))
+                    )
+                    message = {**message, "headers": cabecalhos}
+            elif message["type"] == "http.response.body":
+                enviados += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            with requisicoes_em_andamento.em_andamento():
+                await self.app(scope, receive, send_com_metricas)
+        except Exception as exc:
+            erros.inc("http", type(exc).__name__)
+            raise
+        finally:
+            _server_timing.reset(token_timing)
+            _inicio_requisicao.reset(token_inicio)
+            rota = getattr(scope.get("route"), "path", "desconhecida")
+            metodo = scope.get("method", "")
+            requisicoes.inc(metodo, rota, str(status))
+            duracao_requisicoes.observar(time.perf_counter() - inicio, metodo, rota)
+            bytes_resposta.observar(enviados, rota, codificacao)
@@ -1,8 +1,14 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from datetime import datetime, timezone
+
+from sqlalchemy import Boolean, Column, Float, ForeignKey, Index, Integer, LargeBinary, String, DateTime, Text
 from sqlalchemy.sql import func
 from .database import Base
 
 
+def _agora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -12,3 +18,50 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class PlanJob(Base):
+    """Geração de plano enfileirada (modo assíncrono); persiste entre reinícios do servidor."""
+    __tablename__ = "plan_jobs"
+
+    id = Column(String(32), primary_key=True)
+    status = Column(String(16), nullable=False, index=True, default="pendente")
+    anamnese_json = Column(Text, nullable=False)
+    usar_cache = Column(Boolean, nullable=False, default=True)
+    resultado_json = Column(Text, nullable=True)
+    erro = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # Processo dono do job (pendente ou em processamento); o lease é o heartbeat dele em job_workers
+    worker_id = Column(String(32), nullable=True)
+
+
+class JobWorker(Base):
+    """Processo com fila de jobs ativa: heartbeat (lease dos jobs dele), workers e duração média."""
+    __tablename__ = "job_workers"
+
+    id = Column(String(32), primary_key=True)
+    workers = Column(Integer, nullable=False)
+    duracao_media_s = Column(Float, nullable=False)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class PlanoSalvo(Base):
+    """Plano gerado para um usuário autenticado: JSON do PlanoResponse comprimido, como foi enviado."""
+    __tablename__ = "planos_salvos"
+    # Histórico paginado por (created_at, id) dentro de cada usuário
+    __table_args__ = (Index("ix_planos_salvos_user_criado", "user_id", "created_at", "id"),)
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    anamnese_hash = Column(String(64), nullable=False)
+    modelo = Column(String(64), nullable=False)
+    compressao = Column(String(8), nullable=False, default="gzip")
+    plano = Column(LargeBinary, nullable=False)
+    tamanho_json = Column(Integer, nullable=False)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    cached_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    # Definido no Python (microssegundos, mesmo formato dos parâmetros do cursor), não pelo banco
+    created_at = Column(DateTime(timezone=True), nullable=False, default=_agora)
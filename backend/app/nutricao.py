@@ -0,0 +1,235 @@
+"""Estimativa educativa de calorias e macros dos planos (porta de frontend/src/utils/estimativaNutricional.ts).
+
+A tabela de alimentos fica em colunas (`array`) e a busca por palavra-chave usa um autômato
+Aho-Corasick compilado uma vez: cada nome de item é percorrido uma única vez, qualquer que seja
+o tamanho da tabela. As conversões de unidade e as somas são feitas em lote sobre todos os itens
+do plano (ou de vários planos), sem objetos intermediários por item.
+"""
+import re
+from array import array
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .schemas import PlanoAlimentar, Refeicao, TotaisNutricionais
+
+# (palavras-chave, kcal, proteína, carboidrato, gordura) por 100 g — valores médios, mesma
+# ordem da tabela do frontend: em empate, vence a primeira linha que casar
+_TABELA: Tuple[Tuple[Tuple[str, ...], float, float, float, float], ...] = (
+    (("pão", "integral", "torrada"), 265, 9, 49, 3),
+    (("queijo", "branco", "ricota"), 260, 18, 3, 20),
+    (("geleia",), 260, 0, 65, 0),
+    (("café", "chá", "leite"), 45, 3, 5, 2),
+    (("banana", "maçã", "fruta", "laranja"), 60, 1, 15, 0),
+    (("iogurte", "natural"), 60, 4, 7, 2),
+    (("castanha", "castanhas", "amendoim", "nozes"), 600, 15, 20, 55),
+    (("salada", "legumes", "vegetais", "verdura"), 25, 2, 4, 0),
+    (("frango", "peixe", "peito", "grelhado", "proteína"), 165, 31, 0, 4),
+    (("ovo", "ovos"), 155, 13, 1, 11),
+    (("arroz", "integral"), 130, 3, 28, 1),
+    (("feijão", "leguminosa"), 130, 9, 24, 0),
+    (("batata", "mandioca"), 90, 2, 21, 0),
+    (("massa", "macarrão"), 130, 5, 25, 1),
+    (("peru", "peito de peru"), 110, 22, 2, 1),
+    (("suco", "vitamina", "smoothie"), 45, 1, 11, 0),
+    (("sopa",), 35, 2, 5, 1),
+)
+
+# Linha extra (última) para itens sem correspondência: valores genéricos
+_GENERICO = (120, 5, 15, 4)
+
+KCAL = array("f", [linha[1] for linha in _TABELA] + [_GENERICO[0]])
+PROTEINA = array("f", [linha[2] for linha in _TABELA] + [_GENERICO[1]])
+CARBOIDRATO = array("f", [linha[3] for linha in _TABELA] + [_GENERICO[2]])
+GORDURA = array("f", [linha[4] for linha in _TABELA] + [_GENERICO[3]])
+_LINHA_GENERICA = len(_TABELA)
+
+# Refeições sem itens: kcal típicas pelo nome da refeição (macros 25% P / 50% C / 25% G)
+_KCAL_POR_REFEICAO = (
+    ("café da manhã", 380),
+    ("lanche da manhã", 150),
+    ("almoço", 650),
+    ("lanche da tarde", 200),
+    ("jantar", 520),
+)
+_KCAL_REFEICAO_PADRAO = 400
+
+
+class _AhoCorasick:
+    """Autômato de múltiplas palavras-chave; `menor_linha` devolve a primeira linha da tabela
+    com alguma palavra contida no texto."""
+
+    def __init__(self, palavras: Dict[str, int]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._falha: List[int] = [0]
+        self._saida: List[int] = [_LINHA_GENERICA]
+        for palavra, linha in palavras.items():
+            estado = 0
+            for c in palavra:
+                proximo = self._goto[estado].get(c)
+                if proximo is None:
+                    proximo = len(self._goto)
+                    self._goto[estado][c] = proximo
+                    self._goto.append({})
+                    self._falha.append(0)
+                    self._saida.append(_LINHA_GENERICA)
+                estado = proximo
+            self._saida[estado] = min(self._saida[estado], linha)
+
+        # BFS: links de falha e saídas herdadas (menor linha entre os sufixos que são palavras)
+        fila = list(self._goto[0].values())
+        while fila:
+            estado = fila.pop(0)
+            for c, proximo in self._goto[estado].items():
+                fila.append(proximo)
+                f = self._falha[estado]
+                while f and c not in self._goto[f]:
+                    f = self._falha[f]
+                destino = self._goto[f].get(c, 0)
+                self._falha[proximo] = destino if destino != proximo else 0
+                self._saida[proximo] = min(self._saida[proximo], self._saida[self._falha[proximo]])
+
+    def menor_linha(self, texto: str) -> int:
+        goto, falha, saida = self._goto, self._falha, self._saida
+        estado = 0
+        melhor = _LINHA_GENERICA
+        for c in texto:
+            while estado and c not in goto[estado]:
+                estado = falha[estado]
+            estado = goto[estado].get(c, 0)
+            if saida[estado] < melhor:
+                melhor = saida[estado]
+                if melhor == 0:
+                    break
+        return melhor
+
+
+def _compilar() -> _AhoCorasick:
+    palavras: Dict[str, int] = {}
+    for linha, (chaves, *_macros) in enumerate(_TABELA):
+        for chave in chaves:
+            palavras.setdefault(chave, linha)
+    return _AhoCorasick(palavras)
+
+
+_INDICE = _compilar()
+_NUMERO = re.compile(r"^\s*[-+]?(\d+\.?\d*|\.\d+)")
+
+
+@lru_cache(maxsize=4096)
+def _linha_alimento(nome: str) -> int:
+    return _INDICE.menor_linha(nome.lower())
+
+
+@lru_cache(maxsize=1024)
+def _conversao_unidade(unidade: str) -> Tuple[float, Optional[float]]:
+    """(gramas por unidade, gramas fixos) — mesmas regras de gramasAproximados no frontend."""
+    u = unidade.lower()
+    if u.endswith("g"):
+        return 1.0, None
+    if u.endswith("ml"):
+        return 1.02, None  # líquidos ~densidade 1
+    if "colher de servir" in u or "concha" in u:
+        return 55.0, None
+    if "colher de sopa" in u:
+        return 15.0, None
+    if "fatia" in u:
+        return 30.0, None
+    if "xícara" in u:
+        return 150.0, None
+    if "unidade" in u:
+        return 100.0, None
+    if "pote" in u and "170" in u:
+        return 0.0, 170.0
+    return 50.0, None  # porção média
+
+
+def _quantidade(texto: Optional[str]) -> float:
+    """Como `Math.max(1, parseFloat(q) || 1)` no frontend."""
+    m = _NUMERO.match(texto or "")
+    valor = float(m.group(0)) if m else 0.0
+    return max(1.0, valor or 1.0)
+
+
+def _kcal_refeicao_sem_itens(nome: str) -> float:
+    nome = nome.lower()
+    for chave, kcal in _KCAL_POR_REFEICAO:
+        if chave in nome:
+            return kcal
+    return _KCAL_REFEICAO_PADRAO
+
+
+_Colunas = Tuple[List[float], List[float], List[float], List[float]]
+
+
+def _colunas_refeicoes(refeicoes: Sequence[Refeicao]) -> _Colunas:
+    """Estima cada refeição processando todos os itens de uma vez (colunas paralelas)."""
+    # 1) Achata os itens: refeição de origem, linha da tabela e gramas de cada item
+    origem: List[int] = []
+    linhas: List[int] = []
+    gramas: List[float] = []
+    for indice, refeicao in enumerate(refeicoes):
+        for item in refeicao.itens:
+            por_unidade, fixo = _conversao_unidade(item.unidade or "")
+            origem.append(indice)
+            linhas.append(_linha_alimento(item.nome))
+            gramas.append(fixo if fixo is not None else _quantidade(item.quantidade) * por_unidade)
+
+    # 2) Soma as colunas de macros ponderadas por (gramas / 100) em cada refeição
+    n = len(refeicoes)
+    kcal = [0.0] * n
+    prot = [0.0] * n
+    carb = [0.0] * n
+    gord = [0.0] * n
+    for indice, linha, g in zip(origem, linhas, gramas):
+        f = g / 100
+        kcal[indice] += f * KCAL[linha]
+        prot[indice] += f * PROTEINA[linha]
+        carb[indice] += f * CARBOIDRATO[linha]
+        gord[indice] += f * GORDURA[linha]
+
+    # 3) Refeições sem itens usam a estimativa pelo nome
+    for indice, refeicao in enumerate(refeicoes):
+        if not refeicao.itens:
+            k = _kcal_refeicao_sem_itens(refeicao.nome)
+            kcal[indice] = k
+            prot[indice] = k * 0.25 / 4
+            carb[indice] = k * 0.5 / 4
+            gord[indice] = k * 0.25 / 9
+
+    # Como no frontend, as kcal de cada refeição são arredondadas antes de somar
+    return [float(round(k)) for k in kcal], prot, carb, gord
+
+
+def _totais(colunas: _Colunas, inicio: int, fim: int) -> TotaisNutricionais:
+    kcal, prot, carb, gord = colunas
+    # Valores já são floats calculados aqui: dispensa a validação do Pydantic
+    return TotaisNutricionais.model_construct(
+        kcal=float(round(sum(kcal[inicio:fim]))),
+        proteina_g=round(sum(prot[inicio:fim]), 1),
+        carboidrato_g=round(sum(carb[inicio:fim]), 1),
+        gordura_g=round(sum(gord[inicio:fim]), 1),
+    )
+
+
+def estimar_refeicao(refeicao: Refeicao) -> TotaisNutricionais:
+    return _totais(_colunas_refeicoes([refeicao]), 0, 1)
+
+
+def anotar_totais(plano: PlanoAlimentar) -> PlanoAlimentar:
+    """Preenche `totais` de cada refeição e do plano (altera e devolve o próprio plano)."""
+    colunas = _colunas_refeicoes(plano.refeicoes)
+    for indice, refeicao in enumerate(plano.refeicoes):
+        refeicao.totais = _totais(colunas, indice, indice + 1)
+    plano.totais = _totais(colunas, 0, len(plano.refeicoes))
+    return plano
+
+
+def estimar_planos(planos: Sequence[PlanoAlimentar]) -> List[TotaisNutricionais]:
+    """Totais diários de muitos planos em um único lote (análises em massa, validação de planos)."""
+    refeicoes: List[Refeicao] = []
+    limites: List[int] = [0]
+    for plano in planos:
+        refeicoes.extend(plano.refeicoes)
+        limites.append(len(refeicoes))
+    colunas = _colunas_refeicoes(refeicoes)
+    return [_totais(colunas, limites[i], limites[i + 1]) for i in range(len(planos))]
@@ -1,99 +1,104 @@
+import asyncio
 import json
-from typing import Any, Dict
+import time
+from contextlib import nullcontext
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Tuple, TypeVar
 
 from fastapi import HTTPException
-from openai import OpenAI
 
+from .admission import vagas_llm
+from .calculos import calcular
 from .config import get_settings
-from .schemas import Anamnese, ExplicacaoGeracao, PlanoAlimentar
+from .nutricao import anotar_totais, estimar_refeicao
+from .json_repair import RespostaInvalida, carregar_validado
+from .metrics import chamadas_llm_em_andamento, erros, medir, observar_etapa
+from .prompts import get_prompt_template, mensagens_reparo, response_format
+from .resilience import com_retentativas, contadores, executar_com_fallback
+from .schemas import Anamnese, CalculoNutricional, ExplicacaoGeracao, PlanoAlimentar, PlanoResponse, Refeicao
+from .streaming import IncrementalPlanParser
+from .usage import UsoTokens, extrair_uso, usage_tracker
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
-def _get_client():
+T = TypeVar("T")
+
+_client: "AsyncOpenAI | None" = None
+
+
+def _criar_client() -> "AsyncOpenAI | None":
     settings = get_settings()
     if not settings.openai_api_key or not settings.openai_api_key.strip():
         return None
-    return OpenAI(api_key=settings.openai_api_key)
-
-
-SYSTEM_PROMPT = """
-Você é um assistente de nutrição que gera planos alimentares apenas para fins EDUCATIVOS.
-Você NÃO substitui um nutricionista ou médico e deve sempre recomendar acompanhamento profissional,
-especialmente em casos de doenças crônicas (diabetes, hipertensão, dislipidemias, doenças renais etc.).
-
-Regras importantes:
-- Não faça prescrição clínica (não fale em doses de medicamentos, não ajuste insulina, não defina restrições rígidas para doenças).
-- Use linguagem simples e acessível.
-- Use porções em medidas caseiras sempre que possível (colher de sopa, xícara, fatia, unidade média etc.).
-- Respeite as preferências, restrições alimentares e contexto cultural sempre que informado.
-- Se as informações forem insuficientes, assuma um contexto geral saudável e destaque que o plano é apenas um exemplo.
-
-FORMATO DA RESPOSTA:
-Você DEVE responder estritamente em um ÚNICO JSON válido com o plano E a explicação da geração ("explicacao_geracao"). Cada refeição pode incluir opcionalmente "itens" com alimentos e quantidades (gramatura ou porção caseira).
-
-Estrutura obrigatória:
-{
-  "resumo_geral": "texto",
-  "refeicoes": [
-    {
-      "nome": "Café da manhã",
-      "horario_sugerido": "07:00",
-      "descricao": "texto resumido",
-      "observacoes": "texto opcional",
-      "itens": [
-        { "nome": "Pão integral", "quantidade": "2", "unidade": "fatia" },
-        { "nome": "Queijo branco", "quantidade": "30", "unidade": "g" },
-        { "nome": "Banana", "quantidade": "1", "unidade": "unidade média" }
-      ]
-    }
-  ],
-  "avisos_importantes": ["texto 1", "texto 2"],
-  "explicacao_geracao": {
-    "resumo_raciocinio": "Um parágrafo explicando em linguagem simples como você montou o plano: que dados da anamnese usou, qual a lógica geral (ex.: déficit calórico leve para objetivo X, distribuição em 5 refeições para melhor adesão).",
-    "calculos": [
-      { "nome": "IMC", "valor": "22,5", "unidade": "kg/m²", "descricao": "Índice de massa corporal: peso dividido pela altura ao quadrado. Usado como referência de faixa de peso." },
-      { "nome": "TMB", "valor": "1500", "unidade": "kcal", "descricao": "Taxa metabólica basal: calorias que o corpo gasta em repouso. Fórmula de Harris-Benedict ou similar conforme sexo/idade." },
-      { "nome": "Calorias diárias estimadas", "valor": "1800", "unidade": "kcal", "descricao": "Necessidade energética considerando objetivo (manutenção, déficit ou superávit) e nível de atividade." }
-    ],
-    "criterios_escolhidos": [
-      "Número de refeições escolhido e por quê (ex.: 5 refeições para evitar fome prolongada).",
-      "Horários sugeridos com base na rotina informada.",
-      "Distribuição de macros (proteína/carboidrato/gordura) conforme objetivo."
-    ],
-    "adaptacoes_ao_perfil": [
-      "Como as preferências alimentares foram consideradas (gostos, desgostos).",
-      "Como restrições ou condições de saúde foram respeitadas (sem prescrição clínica).",
-      "Ajustes ao objetivo principal (emagrecimento, ganho de massa, etc.)."
-    ]
-  }
-}
+    # openai e httpx somam centenas de ms ao import: só entram quando o cliente é criado
+    import httpx
+    from openai import AsyncOpenAI
+
+    timeout = httpx.Timeout(
+        connect=settings.openai_connect_timeout_s,
+        read=settings.openai_read_timeout_s,
+        write=settings.openai_write_timeout_s,
+        pool=settings.openai_pool_timeout_s,
+    )
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.openai_max_connections,
+            max_keepalive_connections=settings.openai_max_keepalive_connections,
+            keepalive_expiry=settings.openai_keepalive_expiry_s,
+        ),
+        timeout=timeout,
+    )
+    # O SDK repassa o próprio timeout em cada requisição; precisa ser o mesmo do pool.
+    # Retentativas ficam em app/resilience.py (as do SDK se somariam às nossas).
+    return AsyncOpenAI(
+        api_key=settings.openai_api_key,
+        base_url=settings.openai_base_url or None,
+        http_client=http_client,
+        timeout=timeout,
+        max_retries=0,
+    )
+
 
-Regras para explicacao_geracao:
-- Se peso/altura não forem informados, omita IMC ou deixe valor null e explique na descrição que não foi possível calcular.
-- Faça os cálculos (TMB, calorias) quando houver dados suficientes; use estimativas conservadoras quando faltar informação.
-- resumo_raciocinio, calculos, criterios_escolhidos e adaptacoes_ao_perfil devem ser no mesmo idioma que o plano (idioma_plano).
-- O campo "itens" das refeições é opcional. Use "quantidade" como número ou texto (ex.: "1/2") e "unidade" como "g", "ml", "xícara", "colher de sopa", "fatia", "unidade", etc.
-"""
+async def init_client() -> None:
+    """Cria o cliente compartilhado do processo (aquecimento do startup, fora do event loop)."""
+    global _client
+    if _client is None:
+        criado = await asyncio.to_thread(_criar_client)
+        # Uma requisição pode ter criado o cliente sob demanda enquanto o import rodava
+        if _client is None:
+            _client = criado
+        elif criado is not None:
+            await criado.close()
 
 
-def build_user_prompt(anamnese: Anamnese) -> str:
-    return json.dumps(anamnese.model_dump(), ensure_ascii=False, indent=2)
+async def close_client() -> None:
+    """Fecha o pool de conexões do cliente compartilhado (chamado no shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
 
 
-def _explicacao_demonstracao(anamnese: Anamnese) -> ExplicacaoGeracao:
-    """Explicação de exemplo para o modo demonstração."""
+def _get_client() -> "AsyncOpenAI | None":
+    """Retorna o cliente compartilhado; cria sob demanda se o startup não rodou (ex.: scripts)."""
+    global _client
+    if _client is None:
+        _client = _criar_client()
+    return _client
+
+
+def explicacao_demonstracao(anamnese: Anamnese) -> ExplicacaoGeracao:
+    """Explicação de exemplo para o modo demonstração (os cálculos são reais, feitos no backend)."""
     objetivo = anamnese.objetivos.objetivo_principal or "saúde geral"
     return ExplicacaoGeracao(
         resumo_raciocinio=(
             f"Este é um plano de demonstração. Em produção, a IA usaria sua anamnese (objetivo: {objetivo}, "
-            "dados básicos, rotina e preferências) para calcular indicadores como IMC e TMB, "
-            "estimar necessidade calórica e montar refeições adaptadas ao seu perfil. "
+            "dados básicos, rotina e preferências) junto com os indicadores calculados abaixo (IMC, TMB e "
+            "necessidade calórica) para montar refeições adaptadas ao seu perfil. "
             "A aba 'Como a IA pensou' mostra como isso seria explicado após uma geração real."
         ),
-        calculos=[
-            {"nome": "IMC", "valor": "—", "unidade": "kg/m²", "descricao": "Com peso e altura informados, a IA calcularia o IMC (peso ÷ altura²) para contextualizar a faixa de peso."},
-            {"nome": "TMB", "valor": "—", "unidade": "kcal", "descricao": "Taxa metabólica basal seria estimada (ex.: Harris-Benedict) com idade, sexo, peso e altura."},
-            {"nome": "Calorias diárias", "valor": "—", "unidade": "kcal", "descricao": "A IA ajustaria as calorias conforme seu objetivo (déficit, manutenção ou superávit) e nível de atividade."},
-        ],
+        calculos=calcular(anamnese).como_calculos(anamnese.idioma_plano),
         criterios_escolhidos=[
             "5 refeições ao dia para melhor distribuição e saciedade.",
             "Horários compatíveis com rotina típica (acordar ~7h, dormir ~22h).",
@@ -107,15 +112,25 @@ def _explicacao_demonstracao(anamnese: Anamnese) -> ExplicacaoGeracao:
     )
 
 
-def _plano_demonstracao(_anamnese: Anamnese) -> PlanoAlimentar:
-    """Plano de exemplo quando não há chave da OpenAI (protótipo)."""
-    objetivo = _anamnese.objetivos.objetivo_principal or "saúde geral"
-    return PlanoAlimentar(
-        resumo_geral=(
-            f"Este é um plano alimentar de demonstração, pensado como apoio informativo "
-            f"para o objetivo de {objetivo.lower()}. Em produção, um plano personalizado "
-            "seria gerado com base na sua anamnese. Este conteúdo é apenas ilustrativo."
-        ),
+def plano_demonstracao(anamnese: Anamnese) -> PlanoAlimentar:
+    """Plano de exemplo quando não há chave da OpenAI (protótipo); só o resumo muda por objetivo."""
+    objetivo = anamnese.objetivos.objetivo_principal or "saúde geral"
+    return _modelo_plano_demonstracao().model_copy(
+        update={
+            "resumo_geral": (
+                f"Este é um plano alimentar de demonstração, pensado como apoio informativo "
+                f"para o objetivo de {objetivo.lower()}. Em produção, um plano personalizado "
+                "seria gerado com base na sua anamnese. Este conteúdo é apenas ilustrativo."
+            )
+        }
+    )
+
+
+@lru_cache(maxsize=1)
+def _modelo_plano_demonstracao() -> PlanoAlimentar:
+    """Plano de exemplo validado e com totais estimados uma única vez por processo."""
+    plano = PlanoAlimentar(
+        resumo_geral="",
         refeicoes=[
             {
                 "nome": "Café da manhã",
@@ -181,58 +196,282 @@ def _plano_demonstracao(_anamnese: Anamnese) -> PlanoAlimentar:
             "Para um plano personalizado de verdade, configure a chave da OpenAI ou consulte um profissional.",
         ],
     )
+    return anotar_totais(plano)
 
 
-def gerar_plano(anamnese: Anamnese) -> tuple[PlanoAlimentar, str, ExplicacaoGeracao | None]:
-    settings = get_settings()
-    client = _get_client()
-    if client is None:
-        return _plano_demonstracao(anamnese), "demonstracao", _explicacao_demonstracao(anamnese)
+class ResultadoGeracao(NamedTuple):
+    plano: PlanoAlimentar
+    modelo: str
+    explicacao: Optional[ExplicacaoGeracao]
+    uso: UsoTokens = UsoTokens()
 
-    try:
-        completion = client.chat.completions.create(
-            model=settings.openai_model or "gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {
-                    "role": "user",
-                    "content": (
-                        "Gere um plano alimentar educativo a partir da seguinte anamnese. "
-                        "Responda no idioma indicado em 'idioma_plano'. "
-                        "Lembre-se de retornar ESTRITAMENTE no formato JSON especificado.\n\n"
-                        f"{build_user_prompt(anamnese)}"
+
+def modelo_configurado() -> str:
+    """Nome do modelo que responderá a `gerar_plano` ("demonstracao" sem chave da OpenAI)."""
+    if _get_client() is None:
+        return "demonstracao"
+    return get_settings().openai_model or "gpt-4o-mini"
+
+
+def _erro_chamada(exc: Exception) -> HTTPException:
+    erros.inc("llm", type(exc).__name__)
+    if isinstance(exc, asyncio.TimeoutError):
+        return HTTPException(status_code=504, detail="O modelo de IA demorou demais para responder. Tente novamente.")
+    return HTTPException(status_code=500, detail=f"Erro ao chamar o modelo de IA: {exc}")
+
+
+async def _completar(
+    client: "AsyncOpenAI",
+    modelo: str,
+    mensagens: List[Dict[str, str]],
+    operacao: str,
+    *,
+    formato: Optional[Dict[str, Any]] = None,
+    temperatura: float = 0.7,
+    ocupar_vaga: bool = True,
+) -> tuple[str, UsoTokens]:
+    """Chamada não-streaming ao modelo; devolve o texto da resposta e o uso de tokens.
+
+    Com `ocupar_vaga=False` o chamador já ocupa uma vaga de `vagas_llm` (ex.: o stream) e a
+    chamada a reutiliza, em vez de esperar por uma segunda vaga contra si mesmo.
+    """
+    extras = {"response_format": formato} if formato else {}
+    # A vaga fica ocupada também durante as retentativas (ainda é a mesma chamada ao provedor)
+    async with vagas_llm.vaga(operacao) if ocupar_vaga else nullcontext():
+        try:
+            with chamadas_llm_em_andamento.em_andamento(modelo), medir(operacao, "llm"):
+                completion = await com_retentativas(
+                    lambda: client.chat.completions.create(
+                        model=modelo, messages=mensagens, temperature=temperatura, **extras
                     ),
-                },
-            ],
-            temperature=0.7,
-        )
-    except Exception as exc:  # noqa: BLE001
-        raise HTTPException(status_code=500, detail=f"Erro ao chamar o modelo de IA: {exc}") from exc
+                    operacao,
+                )
+        except Exception as exc:  # noqa: BLE001
+            raise _erro_chamada(exc) from exc
+
+    uso = extrair_uso(completion.usage)
+    usage_tracker.registrar(modelo, uso, operacao=operacao)
+    return completion.choices[0].message.content or "", uso
+
+
+_ERRO_FORMATO = {
+    "plano": "Não foi possível interpretar o plano alimentar retornado pela IA. Tente novamente em alguns instantes.",
+    "refeicao": "Não foi possível interpretar a refeição retornada pela IA. Tente novamente em alguns instantes.",
+}
+
+
+def _validar_plano(data: Any) -> PlanoAlimentar:
+    return anotar_totais(PlanoAlimentar.model_validate(data))
+
 
-    content = completion.choices[0].message.content or ""
+def _validar_refeicao(data: Any) -> Refeicao:
+    refeicao = Refeicao.model_validate(data["refeicao"])
+    refeicao.totais = estimar_refeicao(refeicao)
+    return refeicao
 
+
+async def _interpretar(
+    client: "AsyncOpenAI",
+    modelo: str,
+    content: str,
+    tipo: str,
+    validar: Callable[[Any], T],
+    ocupar_vaga: bool = True,
+) -> tuple[Any, T]:
+    """Texto do modelo → (dados, objeto validado): JSON direto, reparo local e, só então, uma
+    chamada curta de "corrija este JSON" (`ocupar_vaga` como em `_completar`). A validação
+    roda fora do event loop."""
     try:
-        data: Dict[str, Any] = json.loads(content)
-    except json.JSONDecodeError as exc:
-        raise HTTPException(
-            status_code=500,
-            detail="O modelo retornou uma resposta em formato inesperado. Tente novamente em alguns instantes.",
-        ) from exc
+        dados, resultado, reparado = await asyncio.to_thread(carregar_validado, content, validar, tipo)
+        contadores.incrementar("json_reparo_local" if reparado else "json_valido")
+        return dados, resultado
+    except RespostaInvalida as exc:
+        erro = exc.erro
 
+    contadores.incrementar("json_reparo_llm")
+    corrigido, _ = await _completar(
+        client,
+        get_settings().openai_repair_model or modelo,
+        mensagens_reparo(content, erro),
+        "reparo_json",
+        formato=response_format(tipo),
+        temperatura=0,
+        ocupar_vaga=ocupar_vaga,
+    )
     try:
-        plano = PlanoAlimentar.model_validate(data)
-    except Exception as exc:  # noqa: BLE001
-        raise HTTPException(
-            status_code=500,
-            detail="Não foi possível interpretar o plano alimentar retornado pela IA.",
-        ) from exc
+        dados, resultado, _ = await asyncio.to_thread(carregar_validado, corrigido, validar, tipo)
+    except RespostaInvalida as exc:
+        contadores.incrementar("json_falhas")
+        erros.inc("json", type(exc).__name__)
+        raise HTTPException(status_code=500, detail=_ERRO_FORMATO[tipo]) from exc
+    return dados, resultado
 
+
+def _explicacao(data: Any, calculos: List[CalculoNutricional]) -> ExplicacaoGeracao:
+    """Explicação do modelo (tolerante a falhas) com os `calculos` feitos no backend."""
     explicacao: ExplicacaoGeracao | None = None
-    if "explicacao_geracao" in data and data["explicacao_geracao"]:
+    if isinstance(data, dict) and data.get("explicacao_geracao"):
         try:
             explicacao = ExplicacaoGeracao.model_validate(data["explicacao_geracao"])
         except Exception:  # noqa: S110
             pass
+    if explicacao is None:
+        explicacao = ExplicacaoGeracao()
+    explicacao.calculos = calculos
+    return explicacao
+
+
+async def gerar_plano(anamnese: Anamnese, extras: Optional[str] = None) -> ResultadoGeracao:
+    """Gera o plano de um dia; `extras` complementa o prompt (ex.: contexto semanal)."""
+    settings = get_settings()
+    with medir("plano", "cliente"):
+        client = _get_client()
+    if client is None:
+        return ResultadoGeracao(
+            plano_demonstracao(anamnese), "demonstracao", explicacao_demonstracao(anamnese)
+        )
+
+    mensagens = get_prompt_template().mensagens(anamnese, extras)
+    calculos = calcular(anamnese).como_calculos(anamnese.idioma_plano)
 
-    return plano, settings.openai_model or "gpt-4o-mini", explicacao
+    async def tentar(modelo: str) -> ResultadoGeracao:
+        content, uso = await _completar(client, modelo, mensagens, "plano", formato=response_format("plano"))
+        dados, plano = await _interpretar(client, modelo, content, "plano", _validar_plano)
+        return ResultadoGeracao(plano, modelo, _explicacao(dados, calculos), uso)
+
+    return await executar_com_fallback(settings.openai_model or "gpt-4o-mini", tentar)
+
+
+class ResultadoRefeicao(NamedTuple):
+    refeicao: Refeicao
+    modelo: str
+    justificativa: Optional[str]
+    uso: UsoTokens = UsoTokens()
+
+
+async def gerar_refeicao(
+    anamnese: Anamnese, plano: PlanoAlimentar, indice: int, pedidos: List[str]
+) -> ResultadoRefeicao:
+    """Gera apenas a refeição `indice` do plano (saída ~1/N do plano completo)."""
+    settings = get_settings()
+    client = _get_client()
+    if client is None:
+        atual = plano.refeicoes[indice]
+        exemplo = next(
+            (r for r in plano_demonstracao(anamnese).refeicoes if r.nome.lower() == atual.nome.lower()), atual
+        )
+        refeicao = exemplo.model_copy(update={"totais": estimar_refeicao(exemplo)})
+        return ResultadoRefeicao(
+            refeicao, "demonstracao", "Modo demonstração: a refeição foi trocada por um exemplo fixo."
+        )
+
+    mensagens = get_prompt_template().mensagens_refeicao(anamnese, plano, indice, pedidos)
+
+    async def tentar(modelo: str) -> ResultadoRefeicao:
+        content, uso = await _completar(client, modelo, mensagens, "refeicao", formato=response_format("refeicao"))
+        dados, refeicao = await _interpretar(client, modelo, content, "refeicao", _validar_refeicao)
+        justificativa = dados.get("justificativa")
+        if not isinstance(justificativa, str) or not justificativa.strip():
+            justificativa = None
+        return ResultadoRefeicao(refeicao, modelo, justificativa, uso)
+
+    return await executar_com_fallback(settings.openai_model or "gpt-4o-mini", tentar)
+
+
+# Campos do plano repassados ao cliente assim que ficam completos no streaming
+_EVENTOS_STREAM = ("resumo_geral", "refeicao", "avisos_importantes", "explicacao_geracao")
+
+
+async def gerar_plano_stream(anamnese: Anamnese) -> AsyncIterator[Tuple[str, Any]]:
+    """Gera o plano em streaming, emitindo (evento, dados) conforme cada parte fica pronta.
+
+    Eventos: "resumo_geral", "refeicao" (uma por refeição, com índice), "avisos_importantes",
+    "explicacao_geracao" e, por fim, "concluido" com o PlanoResponse completo.
+
+    Fora do modo demonstração, o chamador ocupa uma vaga de `vagas_llm` durante todo o stream
+    (ver `RespostaComVaga`): aqui a vaga não é adquirida.
+    """
+    settings = get_settings()
+    client = _get_client()
+    if client is None:
+        plano = plano_demonstracao(anamnese)
+        explicacao = explicacao_demonstracao(anamnese)
+        yield "resumo_geral", plano.resumo_geral
+        for indice, refeicao in enumerate(plano.refeicoes):
+            yield "refeicao", {"indice": indice, "refeicao": refeicao.model_dump()}
+        yield "avisos_importantes", plano.avisos_importantes
+        yield "explicacao_geracao", explicacao.model_dump()
+        resposta = PlanoResponse(plano=plano, modelo_utilizado="demonstracao", explicacao_geracao=explicacao)
+        yield "concluido", resposta.model_dump()
+        return
+
+    modelo = settings.openai_model or "gpt-4o-mini"
+    mensagens = get_prompt_template().mensagens(anamnese)
+    formato = response_format("plano")
+    extras = {"response_format": formato} if formato else {}
+    try:
+        # Só a abertura do stream é repetida: depois do primeiro evento não há como recomeçar
+        with medir("plano_stream", "llm_primeiro_byte"):
+            stream = await com_retentativas(
+                lambda: client.chat.completions.create(
+                    model=modelo,
+                    messages=mensagens,
+                    temperature=0.7,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **extras,
+                ),
+                "plano_stream",
+            )
+    except Exception as exc:  # noqa: BLE001
+        raise _erro_chamada(exc) from exc
+
+    calculos = calcular(anamnese).como_calculos(anamnese.idioma_plano)
+    parser = IncrementalPlanParser()
+    indice = 0
+    uso = UsoTokens()
+    incremental = True
+    inicio = time.perf_counter()
+    chamadas_llm_em_andamento.inc(modelo)
+    try:
+        async for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                uso = extrair_uso(chunk.usage)
+            if not chunk.choices:
+                continue
+            pedaco = chunk.choices[0].delta.content
+            if not pedaco:
+                continue
+            if not incremental:
+                parser.texto += pedaco
+                continue
+            try:
+                eventos = parser.feed(pedaco)
+            except json.JSONDecodeError:
+                # JSON malformado: para os eventos parciais e deixa o reparo para o final
+                incremental = False
+                continue
+            for evento, dados in eventos:
+                if evento not in _EVENTOS_STREAM:
+                    continue
+                if evento == "refeicao":
+                    try:
+                        refeicao = Refeicao.model_validate(dados)
+                        refeicao.totais = estimar_refeicao(refeicao)
+                        dados = {"indice": indice, "refeicao": refeicao.model_dump()}
+                    except Exception:  # noqa: S112
+                        continue
+                    indice += 1
+                elif evento == "explicacao_geracao" and isinstance(dados, dict):
+                    dados = {**dados, "calculos": [c.model_dump() for c in calculos]}
+                yield evento, dados
+    finally:
+        chamadas_llm_em_andamento.dec(modelo)
+        observar_etapa("plano_stream", "llm", time.perf_counter() - inicio)
+        await stream.close()
+    usage_tracker.registrar(modelo, uso, operacao="plano_stream")
 
+    # A vaga do stream ainda está com o chamador: o reparo pela IA a reutiliza
+    dados, plano = await _interpretar(client, modelo, parser.texto, "plano", _validar_plano, ocupar_vaga=False)
+    resposta = PlanoResponse(plano=plano, modelo_utilizado=modelo, explicacao_geracao=_explicacao(dados, calculos))
+    yield "concluido", resposta.model_dump()
@@ -0,0 +1,398 @@
+"""Exportação do plano em PDF no servidor (mesmo layout de frontend/src/utils/gerarPdfPlano.ts).
+
+Gerador de PDF próprio e mínimo, em Python puro: fontes padrão Helvetica (sem embutir),
+WinAnsiEncoding para os acentos e conteúdo das páginas comprimido com zlib. `gerar_pdf` produz o
+arquivo em pedaços (cabeçalho, uma página por vez, xref), então a resposta começa a sair antes
+de o documento terminar. O resultado é determinístico (sem data de geração), o que permite
+cache por hash do plano e ETag forte.
+"""
+import asyncio
+import hashlib
+import multiprocessing
+import time
+import unicodedata
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+from .config import get_settings
+from .lru import LRUCache
+from .metrics import medir, observar_etapa
+from .responses import corresponde_etag
+from .schemas import PlanoAlimentar
+
+# Muda quando o layout muda: invalida caches e ETags de PDFs antigos
+VERSAO_LAYOUT = "1"
+
+LARGURA_PAGINA, ALTURA_PAGINA = 595.28, 841.89  # A4 em pontos
+MARGEM_ESQUERDA = 40
+MARGEM_SUPERIOR = 50
+MARGEM_INFERIOR = 40
+ESPACO_LINHA = 14
+LARGURA_UTIL = LARGURA_PAGINA - MARGEM_ESQUERDA * 2
+
+NOME_ARQUIVO = "plano-alimentar-mynutri-ai.pdf"
+
+# Larguras (1/1000 do tamanho da fonte) dos caracteres 32–126, das métricas AFM padrão
+_LARGURAS_REGULAR = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)
+_LARGURAS_NEGRITO = (
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+)
+_LARGURAS_ESPECIAIS = {"•": 350, "—": 1000, "–": 556, "“": 333, "”": 333, "‘": 222, "’": 222, "…": 1000}
+
+# Recursos de fonte da página: (nome, BaseFont, tabela de larguras)
+_FONTES = {
+    "normal": ("F1", "Helvetica", _LARGURAS_REGULAR),
+    "negrito": ("F2", "Helvetica-Bold", _LARGURAS_NEGRITO),
+    "italico": ("F3", "Helvetica-Oblique", _LARGURAS_REGULAR),
+}
+
+
+def _largura(texto: str, fonte: str, tamanho: float) -> float:
+    tabela = _FONTES[fonte][2]
+    total = 0
+    for c in texto:
+        codigo = ord(c)
+        if 32 <= codigo <= 126:
+            total += tabela[codigo - 32]
+        elif c in _LARGURAS_ESPECIAIS:
+            total += _LARGURAS_ESPECIAIS[c]
+        else:
+            # Acentuados: largura da letra base (á ≈ a)
+            base = unicodedata.normalize("NFD", c)[:1]
+            total += tabela[ord(base) - 32] if base and 32 <= ord(base) <= 126 else 556
+    return total * tamanho / 1000
+
+
+def _quebrar(texto: str, fonte: str, tamanho: float, largura: float) -> List[str]:
+    """Quebra o texto em linhas que cabem em `largura` (respeita as quebras de linha do texto)."""
+    linhas: List[str] = []
+    for paragrafo in texto.split("\n"):
+        atual = ""
+        for palavra in paragrafo.split():
+            candidata = f"{atual} {palavra}" if atual else palavra
+            if _largura(candidata, fonte, tamanho) <= largura:
+                atual = candidata
+                continue
+            if atual:
+                linhas.append(atual)
+            # Palavra maior que a linha inteira: corta por caracteres
+            while _largura(palavra, fonte, tamanho) > largura and len(palavra) > 1:
+                corte = len(palavra) - 1
+                while corte > 1 and _largura(palavra[:corte], fonte, tamanho) > largura:
+                    corte -= 1
+                linhas.append(palavra[:corte])
+                palavra = palavra[corte:]
+            atual = palavra
+        linhas.append(atual)
+    return linhas
+
+
+def _literal(texto: str) -> bytes:
+    dados = texto.encode("cp1252", errors="replace")
+    return b"(" + dados.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+class _Paginador:
+    """Posiciona o texto de cima para baixo e fecha páginas conforme enchem."""
+
+    def __init__(self) -> None:
+        self.y = MARGEM_SUPERIOR
+        self._operacoes: List[bytes] = []
+        self.prontas: List[bytes] = []
+
+    def garantir_espaco(self, altura: float) -> None:
+        if self.y + altura > ALTURA_PAGINA - MARGEM_INFERIOR:
+            self.fechar_pagina()
+
+    def fechar_pagina(self) -> None:
+        self.prontas.append(b"\n".join(self._operacoes))
+        self._operacoes = []
+        self.y = MARGEM_SUPERIOR
+
+    def texto(self, texto: str, fonte: str, tamanho: float, x: float = MARGEM_ESQUERDA, cinza: float = 0) -> None:
+        nome = _FONTES[fonte][0]
+        cor = f"{cinza:g} g " if cinza else ""
+        self._operacoes.append(
+            f"BT {cor}/{nome} {tamanho:g} Tf {x:.2f} {ALTURA_PAGINA - self.y:.2f} Td ".encode("ascii")
+            + _literal(texto)
+            + (b" Tj 0 g ET" if cinza else b" Tj ET")
+        )
+
+    def finalizar(self) -> List[bytes]:
+        if self._operacoes or not self.prontas:
+            self.fechar_pagina()
+        prontas, self.prontas = self.prontas, []
+        return prontas
+
+
+def _titulo(p: _Paginador, texto: str) -> None:
+    p.garantir_espaco(30)
+    p.texto(texto, "negrito", 18)
+    p.y += 28
+
+
+def _subtitulo(p: _Paginador, texto: str) -> None:
+    p.garantir_espaco(24)
+    p.texto(texto, "negrito", 13)
+    p.y += 20
+
+
+def _paragrafo(p: _Paginador, texto: str, fonte: str = "normal", tamanho: float = 11, cinza: float = 0) -> None:
+    if not texto.strip():
+        return
+    for linha in _quebrar(texto, fonte, tamanho, LARGURA_UTIL):
+        p.garantir_espaco(ESPACO_LINHA)
+        p.texto(linha, fonte, tamanho, cinza=cinza)
+        p.y += ESPACO_LINHA
+    p.y += 4
+
+
+def _lista(p: _Paginador, itens: Iterable[str]) -> None:
+    for item in itens:
+        if not item.strip():
+            continue
+        linhas = _quebrar(item, "normal", 10, LARGURA_UTIL - 14)
+        p.garantir_espaco(ESPACO_LINHA)
+        p.texto(f"• {linhas[0]}", "normal", 10)
+        p.y += ESPACO_LINHA
+        for linha in linhas[1:]:
+            p.garantir_espaco(ESPACO_LINHA)
+            p.texto(linha, "normal", 10, x=MARGEM_ESQUERDA + 14)
+            p.y += ESPACO_LINHA
+        p.y += 2
+
+
+def _paginas(plano: PlanoAlimentar) -> Iterator[bytes]:
+    """Conteúdo (operadores PDF) de cada página, entregue assim que a página fecha."""
+    p = _Paginador()
+    _titulo(p, "Plano alimentar educativo — MyNutri AI")
+    _paragrafo(
+        p,
+        "Conteúdo gerado automaticamente por inteligência artificial (IA) para fins educativos.",
+        tamanho=9,
+        cinza=0.47,
+    )
+    _subtitulo(p, "Resumo geral")
+    _paragrafo(p, plano.resumo_geral)
+    if plano.totais:
+        t = plano.totais
+        _paragrafo(
+            p,
+            f"Estimativa do dia: {t.kcal:.0f} kcal · proteína {t.proteina_g:.0f} g · "
+            f"carboidrato {t.carboidrato_g:.0f} g · gordura {t.gordura_g:.0f} g",
+            tamanho=10,
+        )
+
+    _subtitulo(p, "Refeições sugeridas")
+    for indice, refeicao in enumerate(plano.refeicoes, start=1):
+        titulo = f"{indice}. {refeicao.nome}"
+        if refeicao.horario_sugerido:
+            titulo += f" — {refeicao.horario_sugerido}"
+        p.garantir_espaco(24)
+        p.texto(titulo, "negrito", 12)
+        p.y += 18
+        _paragrafo(p, refeicao.descricao)
+        if refeicao.itens:
+            p.garantir_espaco(20)
+            p.texto("Itens e porções sugeridas:", "negrito", 11)
+            p.y += 16
+            for item in refeicao.itens:
+                linha = " ".join(v for v in (f"• {item.nome}", item.quantidade, item.unidade) if v)
+                for parte in _quebrar(linha, "normal", 10, LARGURA_UTIL):
+                    p.garantir_espaco(ESPACO_LINHA)
+                    p.texto(parte, "normal", 10)
+                    p.y += ESPACO_LINHA
+                p.y += 2
+        if refeicao.observacoes:
+            _paragrafo(p, f"Observações: {refeicao.observacoes}", fonte="italico")
+        p.y += 6
+        yield from p.prontas
+        p.prontas.clear()
+
+    _subtitulo(p, "Avisos importantes")
+    _lista(
+        p,
+        [
+            *plano.avisos_importantes,
+            "Este conteúdo foi gerado por inteligência artificial (IA) com base nas informações fornecidas por você.",
+            "Este material tem caráter exclusivamente educativo e não substitui avaliação, prescrição ou "
+            "acompanhamento individualizado por nutricionista ou médico.",
+        ],
+    )
+    yield from p.finalizar()
+
+
+class _EscritorPDF:
+    """Serializa objetos PDF em sequência, guardando os offsets para a tabela xref.
+
+    Objetos fixos: 1 catálogo, 2 árvore de páginas (escrita no fim, quando os filhos são
+    conhecidos), 3–5 fontes. Cada página ocupa dois objetos: conteúdo e página.
+    """
+
+    def __init__(self) -> None:
+        self._posicao = 0
+        self._offsets: dict[int, int] = {}
+        self._paginas: List[int] = []
+        self._proximo = 6
+
+    def _objeto(self, numero: int, corpo: bytes) -> bytes:
+        self._offsets[numero] = self._posicao
+        dados = b"%d 0 obj\n" % numero + corpo + b"\nendobj\n"
+        self._posicao += len(dados)
+        return dados
+
+    def inicio(self) -> bytes:
+        cabecalho = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        self._posicao = len(cabecalho)
+        partes = [cabecalho, self._objeto(1, b"<< /Type /Catalog /Pages 2 0 R >>")]
+        for numero, (_, base, _larguras) in enumerate(_FONTES.values(), start=3):
+            partes.append(
+                self._objeto(
+                    numero,
+                    b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % base.encode(),
+                )
+            )
+        return b"".join(partes)
+
+    def pagina(self, conteudo: bytes) -> bytes:
+        comprimido = zlib.compress(conteudo, 6)
+        numero_conteudo, numero_pagina = self._proximo, self._proximo + 1
+        self._proximo += 2
+        self._paginas.append(numero_pagina)
+        fontes = b" ".join(b"/%s %d 0 R" % (nome.encode(), n) for n, (nome, _, _) in enumerate(_FONTES.values(), start=3))
+        return self._objeto(
+            numero_conteudo,
+            b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(comprimido) + comprimido + b"\nendstream",
+        ) + self._objeto(
+            numero_pagina,
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] /Resources << /Font << %s >> >> /Contents %d 0 R >>"
+            % (LARGURA_PAGINA, ALTURA_PAGINA, fontes, numero_conteudo),
+        )
+
+    def fim(self) -> bytes:
+        filhos = b" ".join(b"%d 0 R" % n for n in self._paginas)
+        arvore = self._objeto(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (filhos, len(self._paginas)))
+        inicio_xref = self._posicao
+        total = self._proximo
+        linhas = [b"xref\n0 %d\n" % total, b"0000000000 65535 f \n"]
+        linhas.extend(b"%010d 00000 n \n" % self._offsets[n] for n in range(1, total))
+        linhas.append(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (total, inicio_xref))
+        return arvore + b"".join(linhas)
+
+
+def gerar_pdf(plano: PlanoAlimentar) -> Iterator[bytes]:
+    """PDF do plano em pedaços: cabeçalho, uma página por vez e a tabela xref no fim."""
+    escritor = _EscritorPDF()
+    yield escritor.inicio()
+    for conteudo in _paginas(plano):
+        yield escritor.pagina(conteudo)
+    yield escritor.fim()
+
+
+def renderizar_pdf(plano_json: str) -> bytes:
+    """PDF inteiro a partir do JSON do plano (função de módulo: roda no pool de processos)."""
+    return b"".join(gerar_pdf(PlanoAlimentar.model_validate_json(plano_json)))
+
+
+# PDFs prontos por hash do plano (repetir o download não renderiza de novo)
+pdfs_renderizados: LRUCache[str, bytes] = LRUCache(get_settings().pdf_cache_max_entries)
+
+_pool_processos: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool_processos() -> ProcessPoolExecutor:
+    global _pool_processos
+    if _pool_processos is None:
+        # spawn: o processo da API tem threads (bcrypt, to_thread) e um event loop; fork os copiaria
+        _pool_processos = ProcessPoolExecutor(
+            max_workers=max(1, get_settings().pdf_process_workers), mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool_processos
+
+
+def shutdown_pdf_pool() -> None:
+    global _pool_processos
+    if _pool_processos is not None:
+        _pool_processos.shutdown(wait=False, cancel_futures=True)
+        _pool_processos = None
+
+
+def chave_pdf(plano: PlanoAlimentar) -> Tuple[str, str]:
+    """(chave do cache, JSON do plano): SHA-256 do JSON do plano + versão do layout."""
+    plano_json = plano.model_dump_json()
+    return hashlib.sha256(f"{VERSAO_LAYOUT}:{plano_json}".encode("utf-8")).hexdigest(), plano_json
+
+
+def _etag(chave: str) -> str:
+    return f'"{chave[:32]}"'
+
+
+def resposta_pdf(request: Request, plano: PlanoAlimentar) -> Response:
+    """PDF do plano com ETag forte: em GET/HEAD, 304 se o cliente já tem esta versão; bytes do
+    cache se já renderizado, senão renderiza em streaming e guarda no cache ao terminar."""
+    chave, _ = chave_pdf(plano)
+    etag = _etag(chave)
+    cabecalhos = {
+        "ETag": etag,
+        "Cache-Control": "private, max-age=0, must-revalidate",
+        "Content-Disposition": f'attachment; filename="{NOME_ARQUIVO}"',
+    }
+    if request.method in ("GET", "HEAD") and corresponde_etag(request, etag):
+        return Response(status_code=304, headers=cabecalhos)
+    pronto = pdfs_renderizados.get(chave)
+    if pronto is not None:
+        return Response(content=pronto, media_type="application/pdf", headers=cabecalhos)
+
+    def pedacos() -> Iterator[bytes]:
+        # Iterador síncrono: o Starlette o consome numa thread, fora do event loop
+        # Só a geração de cada pedaço conta como renderização: o tempo em que o `yield` espera o
+        # cliente receber os bytes fica fora da etapa
+        produzidos: List[bytes] = []
+        pendentes = gerar_pdf(plano)
+        renderizacao = 0.0
+        try:
+            while True:
+                inicio = time.perf_counter()
+                pedaco = next(pendentes, None)
+                renderizacao += time.perf_counter() - inicio
+                if pedaco is None:
+                    break
+                produzidos.append(pedaco)
+                yield pedaco
+        finally:
+            observar_etapa("pdf", "renderizacao", renderizacao)
+        pdfs_renderizados.set(chave, b"".join(produzidos))
+
+    return StreamingResponse(pedacos(), media_type="application/pdf", headers=cabecalhos)
+
+
+async def renderizar_lote(planos: Sequence[PlanoAlimentar]) -> List[bytes]:
+    """PDFs de vários planos; os que não estão em cache são renderizados no pool de processos."""
+    loop = asyncio.get_running_loop()
+    chaves = [chave_pdf(plano) for plano in planos]
+    prontos: List[Optional[bytes]] = [pdfs_renderizados.get(chave) for chave, _ in chaves]
+    pendentes = {chave: plano_json for (chave, plano_json), pdf in zip(chaves, prontos) if pdf is None}
+    with medir("pdf_lote", "renderizacao"):
+        resultados = await asyncio.gather(
+            *(loop.run_in_executor(_get_pool_processos(), renderizar_pdf, j) for j in pendentes.values())
+        )
+    novos = dict(zip(pendentes, resultados))
+    for chave, pdf in novos.items():
+        pdfs_renderizados.set(chave, pdf)
+    return [pdf if pdf is not None else novos[chave] for (chave, _), pdf in zip(chaves, prontos)]
@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Optional
+
+from .config import get_settings
+from .lru import LRUCache
+from .schemas import Anamnese
+
+
+def _normalizar(valor: Any) -> Any:
+    """Forma canônica: espaços colapsados, minúsculas e listas ordenadas (a ordem não muda o plano)."""
+    if isinstance(valor, str):
+        return " ".join(valor.split()).casefold()
+    if isinstance(valor, dict):
+        return {k: _normalizar(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        itens = [_normalizar(v) for v in valor]
+        return sorted(itens, key=lambda v: json.dumps(v, sort_keys=True, ensure_ascii=False))
+    return valor
+
+
+def hash_anamnese(anamnese: Anamnese) -> str:
+    """Hash SHA-256 só da anamnese normalizada (identifica a mesma anamnese entre modelos)."""
+    texto = json.dumps(_normalizar(anamnese.model_dump()), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def chave_anamnese(anamnese: Anamnese, modelo: str, versao_prompt: str) -> str:
+    """Hash SHA-256 da anamnese normalizada + modelo + versão do prompt."""
+    canonico = {
+        "anamnese": _normalizar(anamnese.model_dump()),
+        "modelo": modelo,
+        "prompt": versao_prompt,
+    }
+    texto = json.dumps(canonico, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+class _SQLiteTier:
+    """Camada em disco compartilhada entre workers do uvicorn (mesmo arquivo, modo WAL)."""
+
+    def __init__(self, path: str, ttl_seconds: float) -> None:
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._escritas = 0
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS plan_cache ("
+                "chave TEXT PRIMARY KEY, valor BLOB NOT NULL, expira_em REAL NOT NULL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, chave: str) -> Optional[bytes]:
+        row = self._conn().execute(
+            "SELECT valor FROM plan_cache WHERE chave = ? AND expira_em > ?", (chave, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, chave: str, valor: bytes) -> None:
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO plan_cache (chave, valor, expira_em) VALUES (?, ?, ?)",
+                (chave, valor, time.time() + self.ttl_seconds),
+            )
+            self._escritas += 1
+            if self._escritas % 100 == 0:
+                conn.execute("DELETE FROM plan_cache WHERE expira_em <= ?", (time.time(),))
+
+
+class PlanCache:
+    """Cache de respostas de plano (bytes JSON de PlanoResponse) em duas camadas: memória e SQLite."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, sqlite_path: str = "") -> None:
+        self.memoria: LRUCache[str, bytes] = LRUCache(max_entries, ttl_seconds)
+        self.disco = _SQLiteTier(sqlite_path, ttl_seconds) if sqlite_path else None
+        self.hits_disco = 0
+        self.misses = 0
+
+    async def get(self, chave: str) -> Optional[bytes]:
+        valor = self.memoria.get(chave)
+        if valor is not None:
+            return valor
+        if self.disco is not None:
+            valor = await asyncio.to_thread(self.disco.get, chave)
+            if valor is not None:
+                self.hits_disco += 1
+                self.memoria.set(chave, valor)
+                return valor
+        self.misses += 1
+        return None
+
+    async def set(self, chave: str, valor: bytes) -> None:
+        self.memoria.set(chave, valor)
+        if self.disco is not None:
+            await asyncio.to_thread(self.disco.set, chave, valor)
+
+    def stats(self) -> dict:
+        hits = self.memoria.hits + self.hits_disco
+        total = hits + self.misses
+        return {
+            "memoria": self.memoria.stats(),
+            "disco_habilitado": self.disco is not None,
+            "hits_disco": self.hits_disco,
+            "hits": hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+        }
+
+
+@lru_cache
+def get_plan_cache() -> PlanCache:
+    settings = get_settings()
+    return PlanCache(
+        max_entries=settings.plan_cache_max_entries,
+        ttl_seconds=settings.plan_cache_ttl_s,
+        sqlite_path=settings.plan_cache_sqlite_path,
+    )
@@ -0,0 +1,212 @@
+import asyncio
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import TypeAdapter
+
+from .calculos import ResultadoCalculos, calcular
+from .config import get_settings
+from .lru import LRUCache
+from .nutricao import anotar_totais
+from .openai_client import (
+    explicacao_demonstracao,
+    gerar_plano,
+    gerar_refeicao,
+    modelo_configurado,
+    plano_demonstracao,
+)
+from .plan_cache import chave_anamnese, get_plan_cache
+from .prompts import contexto_semana, get_prompt_template
+from .schemas import (
+    Anamnese,
+    CalculoNutricional,
+    DiaPlano,
+    ExplicacaoGeracao,
+    PlanoAlimentar,
+    PlanoResponse,
+    PlanoSemanalResponse,
+    RegenerarRefeicaoRequest,
+)
+from .singleflight import SingleFlight
+from .usage import UsoTokens
+
+
+class _Geracao:
+    """Resultado de uma geração compartilhada pelo SingleFlight.
+
+    Os tokens são de uma única chamada ao modelo: só o primeiro chamador a receber o
+    resultado fica com eles (`reivindicar_uso`); os demais recebem zero, para que o uso
+    salvo no histórico não seja contado uma vez por requisição coalescida.
+    """
+
+    def __init__(self, resposta: PlanoResponse, uso: UsoTokens) -> None:
+        self.resposta = resposta
+        self._uso: Optional[UsoTokens] = uso
+
+    def reivindicar_uso(self) -> UsoTokens:
+        uso, self._uso = self._uso, None
+        return uso or UsoTokens()
+
+
+# Requisições idênticas simultâneas (duplo clique, retry do frontend) compartilham uma geração
+geracoes_em_voo: SingleFlight[_Geracao] = SingleFlight()
+
+# Modo demonstração: JSON pronto por objetivo, dividido onde entram os cálculos da anamnese
+respostas_demonstracao: LRUCache[str, Tuple[bytes, bytes]] = LRUCache(get_settings().demo_cache_max_entries)
+_MARCADOR_CALCULOS = b'"calculos":[]'
+_calculos_adapter = TypeAdapter(List[CalculoNutricional])
+
+
+@lru_cache(maxsize=1024)
+def _calculos_json(resultado: ResultadoCalculos, idioma: str) -> bytes:
+    return _calculos_adapter.dump_json(resultado.como_calculos(idioma))
+
+
+def resposta_demonstracao(anamnese: Anamnese) -> bytes:
+    """PlanoResponse do modo demonstração já serializado, sem validar nem montar modelos.
+
+    Só o objetivo (texto) e os cálculos (IMC/TMB/calorias) variam entre respostas: o restante
+    fica em cache como bytes e os cálculos são encaixados no lugar de `"calculos":[]`.
+    """
+    objetivo = anamnese.objetivos.objetivo_principal
+    partes = respostas_demonstracao.get(objetivo)
+    if partes is None:
+        resposta = PlanoResponse(
+            plano=plano_demonstracao(anamnese),
+            modelo_utilizado="demonstracao",
+            explicacao_geracao=explicacao_demonstracao(anamnese).model_copy(update={"calculos": []}),
+        )
+        antes, _, depois = resposta.model_dump_json().encode("utf-8").partition(_MARCADOR_CALCULOS)
+        partes = (antes, depois)
+        respostas_demonstracao.set(objetivo, partes)
+    antes, depois = partes
+    return b"".join((antes, b'"calculos":', _calculos_json(calcular(anamnese), anamnese.idioma_plano), depois))
+
+
+async def obter_plano(anamnese: Anamnese, *, usar_cache: bool = True) -> PlanoResponse:
+    """Retorna o plano da anamnese, usando o cache quando possível.
+
+    `usar_cache=False` força uma nova geração (o resultado ainda atualiza o cache).
+    O modo demonstração não passa pelo cache: a resposta já é local e barata.
+    """
+    resposta, _ = await obter_plano_com_uso(anamnese, usar_cache=usar_cache)
+    return resposta
+
+
+async def obter_plano_com_uso(anamnese: Anamnese, *, usar_cache: bool = True) -> Tuple[PlanoResponse, UsoTokens]:
+    """Como obter_plano, junto com os tokens gastos (zero quando veio do cache ou de uma
+    geração já atribuída a outra requisição idêntica simultânea)."""
+    settings = get_settings()
+    modelo = modelo_configurado()
+    cache_ativo = settings.plan_cache_enabled and modelo != "demonstracao"
+    cache = get_plan_cache()
+    chave = chave_anamnese(anamnese, modelo, get_prompt_template().versao)
+
+    if cache_ativo and usar_cache:
+        em_cache = await cache.get(chave)
+        if em_cache is not None:
+            return PlanoResponse.model_validate_json(em_cache).model_copy(update={"do_cache": True}), UsoTokens()
+
+    async def gerar_e_armazenar() -> _Geracao:
+        resultado = await gerar_plano(anamnese)
+        resposta = PlanoResponse(
+            plano=resultado.plano, modelo_utilizado=resultado.modelo, explicacao_geracao=resultado.explicacao
+        )
+        # A chave é do modelo principal: a resposta do fallback (hedge ou falha do principal)
+        # não é guardada, senão ficaria servida no lugar do principal até expirar
+        if cache_ativo and resultado.modelo == modelo:
+            await cache.set(chave, resposta.model_dump_json().encode("utf-8"))
+        return _Geracao(resposta, resultado.uso)
+
+    geracao = await geracoes_em_voo.do(chave, gerar_e_armazenar)
+    return geracao.resposta, geracao.reivindicar_uso()
+
+
+def _pratos(plano: PlanoAlimentar) -> List[str]:
+    """Pratos de um dia para o resumo "já usados" (itens; sem itens, a descrição da refeição)."""
+    pratos: List[str] = []
+    for refeicao in plano.refeicoes:
+        if refeicao.itens:
+            pratos.extend(item.nome for item in refeicao.itens)
+        else:
+            pratos.append(refeicao.descricao[:80])
+    return pratos
+
+
+async def gerar_plano_semanal(anamnese: Anamnese, dias: int = 7) -> PlanoSemanalResponse:
+    """Gera `dias` planos diários em paralelo (fan-out limitado por WEEKLY_PLAN_CONCURRENCY).
+
+    A variedade vem do tema próprio de cada dia (prompts.TEMAS_DIA), fixado antes do fan-out:
+    com o padrão (concorrência >= dias) todos os dias começam juntos e nenhum vê os pratos dos
+    outros. Só quando a concorrência é menor que `dias` os que começam depois recebem também os
+    pratos dos dias já concluídos. Dias que falharem voltam com `erro`; só é erro da requisição
+    se nenhum dia for gerado.
+    """
+    limite = asyncio.Semaphore(max(1, get_settings().weekly_plan_concurrency))
+    pratos_usados: List[str] = []
+    vistos: set[str] = set()
+
+    async def gerar_dia(dia: int):
+        async with limite:
+            resultado = await gerar_plano(anamnese, contexto_semana(dia, dias, pratos_usados))
+        for prato in _pratos(resultado.plano):
+            chave = prato.strip().lower()
+            if chave not in vistos:
+                vistos.add(chave)
+                pratos_usados.append(prato)
+        return resultado
+
+    resultados = await asyncio.gather(*(gerar_dia(dia) for dia in range(1, dias + 1)), return_exceptions=True)
+
+    dias_plano: List[DiaPlano] = []
+    primeiro_ok = None
+    primeira_falha: BaseException | None = None
+    for dia, resultado in enumerate(resultados, start=1):
+        if isinstance(resultado, BaseException):
+            if not isinstance(resultado, Exception):
+                raise resultado  # CancelledError e afins não são falhas de um dia
+            primeira_falha = primeira_falha or resultado
+            detalhe = resultado.detail if isinstance(resultado, HTTPException) else f"Erro ao gerar o plano: {resultado}"
+            dias_plano.append(DiaPlano(dia=dia, erro=str(detalhe)))
+        else:
+            primeiro_ok = primeiro_ok or resultado
+            dias_plano.append(DiaPlano(dia=dia, plano=resultado.plano))
+
+    if primeiro_ok is None:
+        raise primeira_falha
+
+    return PlanoSemanalResponse(
+        dias=dias_plano,
+        modelo_utilizado=primeiro_ok.modelo,
+        explicacao_geracao=primeiro_ok.explicacao,
+        completo=primeira_falha is None,
+    )
+
+
+async def substituir_refeicao(pedido: RegenerarRefeicaoRequest) -> PlanoResponse:
+    """Regenera só a refeição pedida e devolve o plano completo com ela trocada.
+
+    As outras refeições são mantidas; os totais do dia são recalculados e a explicação
+    original ganha uma linha sobre a troca.
+    """
+    plano = pedido.plano
+    indice = pedido.indice_refeicao
+    if indice >= len(plano.refeicoes):
+        raise HTTPException(
+            status_code=422,
+            detail=f"indice_refeicao fora do plano (o plano tem {len(plano.refeicoes)} refeições).",
+        )
+
+    resultado = await gerar_refeicao(pedido.anamnese, plano, indice, pedido.pedidos)
+
+    refeicoes = list(plano.refeicoes)
+    refeicoes[indice] = resultado.refeicao
+    novo_plano = anotar_totais(plano.model_copy(update={"refeicoes": refeicoes}))
+
+    explicacao = (pedido.explicacao_geracao or ExplicacaoGeracao()).model_copy(deep=True)
+    explicacao.calculos = calcular(pedido.anamnese).como_calculos(pedido.anamnese.idioma_plano)
+    if resultado.justificativa:
+        explicacao.adaptacoes_ao_perfil.append(f"{resultado.refeicao.nome}: {resultado.justificativa}")
+
+    return PlanoResponse(plano=novo_plano, modelo_utilizado=resultado.modelo, explicacao_geracao=explicacao)
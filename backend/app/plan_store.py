@@ -0,0 +1,121 @@
+"""Histórico de planos por usuário (tabela planos_salvos).
+
+O JSON do PlanoResponse é gravado comprimido (gzip), exatamente como foi enviado na resposta,
+e devolvido sem nova validação: com `Accept-Encoding: gzip` nem a descompressão acontece.
+A listagem usa paginação por cursor (created_at, id), que não degrada com o tamanho da tabela
+como OFFSET degradaria.
+"""
+import base64
+import gzip
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .metrics import medir
+from .models import PlanoSalvo
+from .plan_cache import hash_anamnese
+from .schemas import Anamnese, HistoricoPlanos, PlanoSalvoResumo
+from .usage import UsoTokens
+
+COMPRESSAO = "gzip"
+
+
+def comprimir(corpo: bytes) -> bytes:
+    # mtime=0: o mesmo plano gera sempre os mesmos bytes
+    return gzip.compress(corpo, compresslevel=6, mtime=0)
+
+
+def descomprimir(dados: bytes, compressao: str) -> bytes:
+    if compressao != COMPRESSAO:
+        raise ValueError(f"Compressão desconhecida: {compressao}")
+    return gzip.decompress(dados)
+
+
+def codificar_cursor(criado_em: datetime, plano_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{criado_em.isoformat()}|{plano_id}".encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Levanta ValueError se o cursor não veio de `codificar_cursor`."""
+    try:
+        texto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        criado_em, plano_id = texto.rsplit("|", 1)
+        return datetime.fromisoformat(criado_em), int(plano_id)
+    except (UnicodeDecodeError, ValueError) as exc:
+        raise ValueError("Cursor inválido") from exc
+
+
+async def salvar_plano(
+    db: AsyncSession, user_id: int, anamnese: Anamnese, modelo: str, corpo: bytes, uso: UsoTokens = UsoTokens()
+) -> int:
+    """Grava o plano (`corpo` = JSON do PlanoResponse já serializado) e retorna o id."""
+    with medir("historico", "compressao"):
+        dados = comprimir(corpo)
+    plano = PlanoSalvo(
+        user_id=user_id,
+        anamnese_hash=hash_anamnese(anamnese),
+        modelo=modelo,
+        compressao=COMPRESSAO,
+        plano=dados,
+        tamanho_json=len(corpo),
+        prompt_tokens=uso.prompt_tokens,
+        cached_tokens=uso.cached_tokens,
+        completion_tokens=uso.completion_tokens,
+    )
+    db.add(plano)
+    with medir("historico", "db"):
+        await db.commit()
+    return plano.id
+
+
+async def listar_planos(db: AsyncSession, user_id: int, limite: int, cursor: Optional[str] = None) -> HistoricoPlanos:
+    """Página do histórico, do mais recente para o mais antigo (sem ler os planos em si)."""
+    consulta = select(
+        PlanoSalvo.id,
+        PlanoSalvo.created_at,
+        PlanoSalvo.modelo,
+        PlanoSalvo.anamnese_hash,
+        PlanoSalvo.tamanho_json,
+        PlanoSalvo.prompt_tokens,
+        PlanoSalvo.cached_tokens,
+        PlanoSalvo.completion_tokens,
+    ).where(PlanoSalvo.user_id == user_id)
+    if cursor:
+        criado_em, plano_id = decodificar_cursor(cursor)
+        consulta = consulta.where(
+            or_(
+                PlanoSalvo.created_at < criado_em,
+                and_(PlanoSalvo.created_at == criado_em, PlanoSalvo.id < plano_id),
+            )
+        )
+    consulta = consulta.order_by(PlanoSalvo.created_at.desc(), PlanoSalvo.id.desc()).limit(limite + 1)
+
+    with medir("historico", "db"):
+        linhas = (await db.execute(consulta)).all()
+    itens = [
+        PlanoSalvoResumo(
+            id=linha.id,
+            criado_em=linha.created_at,
+            modelo_utilizado=linha.modelo,
+            anamnese_hash=linha.anamnese_hash,
+            tamanho_bytes=linha.tamanho_json,
+            prompt_tokens=linha.prompt_tokens,
+            cached_tokens=linha.cached_tokens,
+            completion_tokens=linha.completion_tokens,
+        )
+        for linha in linhas[:limite]
+    ]
+    proximo = codificar_cursor(linhas[limite - 1].created_at, linhas[limite - 1].id) if len(linhas) > limite else None
+    return HistoricoPlanos(itens=itens, proximo_cursor=proximo)
+
+
+async def obter_plano_salvo(db: AsyncSession, user_id: int, plano_id: int) -> Optional[Tuple[bytes, str]]:
+    """(bytes comprimidos, compressão) do plano, ou None se não existir ou for de outro usuário."""
+    consulta = select(PlanoSalvo.plano, PlanoSalvo.compressao).where(
+        PlanoSalvo.id == plano_id, PlanoSalvo.user_id == user_id
+    )
+    with medir("historico", "db"):
+        linha = (await db.execute(consulta)).first()
+    return (linha.plano, linha.compressao) if linha is not None else None
@@ -0,0 +1,299 @@
+"""Templates de prompt versionados para a geração de planos.
+
+A mensagem de sistema e o início da mensagem do usuário são constantes byte a byte entre
+requisições: o provedor consegue reaproveitar o prefixo em cache (prompt caching) e só a
+anamnese compacta e os cálculos fixos variam no fim.
+"""
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from .calculos import calcular
+from .config import get_settings
+from .schemas import Anamnese, ExplicacaoGeracao, PlanoAlimentar, Refeicao
+
+SYSTEM_PROMPT = """
+Você é um assistente de nutrição que gera planos alimentares apenas para fins EDUCATIVOS.
+Você NÃO substitui um nutricionista ou médico e deve sempre recomendar acompanhamento profissional,
+especialmente em casos de doenças crônicas (diabetes, hipertensão, dislipidemias, doenças renais etc.).
+
+Regras importantes:
+- Não faça prescrição clínica (não fale em doses de medicamentos, não ajuste insulina, não defina restrições rígidas para doenças).
+- Use linguagem simples e acessível.
+- Use porções em medidas caseiras sempre que possível (colher de sopa, xícara, fatia, unidade média etc.).
+- Respeite as preferências, restrições alimentares e contexto cultural sempre que informado.
+- Se as informações forem insuficientes, assuma um contexto geral saudável e destaque que o plano é apenas um exemplo.
+
+FORMATO DA RESPOSTA:
+Você DEVE responder estritamente em um ÚNICO JSON válido com o plano E a explicação da geração ("explicacao_geracao"). Cada refeição pode incluir opcionalmente "itens" com alimentos e quantidades (gramatura ou porção caseira).
+
+Estrutura obrigatória:
+{
+  "resumo_geral": "texto",
+  "refeicoes": [
+    {
+      "nome": "Café da manhã",
+      "horario_sugerido": "07:00",
+      "descricao": "texto resumido",
+      "observacoes": "texto opcional",
+      "itens": [
+        { "nome": "Pão integral", "quantidade": "2", "unidade": "fatia" },
+        { "nome": "Queijo branco", "quantidade": "30", "unidade": "g" },
+        { "nome": "Banana", "quantidade": "1", "unidade": "unidade média" }
+      ]
+    }
+  ],
+  "avisos_importantes": ["texto 1", "texto 2"],
+  "explicacao_geracao": {
+    "resumo_raciocinio": "Um parágrafo explicando em linguagem simples como você montou o plano: que dados da anamnese usou, qual a lógica geral (ex.: déficit calórico leve para objetivo X, distribuição em 5 refeições para melhor adesão).",
+    "criterios_escolhidos": [
+      "Número de refeições escolhido e por quê (ex.: 5 refeições para evitar fome prolongada).",
+      "Horários sugeridos com base na rotina informada.",
+      "Distribuição de macros (proteína/carboidrato/gordura) conforme objetivo."
+    ],
+    "adaptacoes_ao_perfil": [
+      "Como as preferências alimentares foram consideradas (gostos, desgostos).",
+      "Como restrições ou condições de saúde foram respeitadas (sem prescrição clínica).",
+      "Ajustes ao objetivo principal (emagrecimento, ganho de massa, etc.)."
+    ]
+  }
+}
+
+Regras para explicacao_geracao:
+- IMC, TMB, gasto total e meta de calorias já vêm calculados em "calculos_fixos": use esses valores para dimensionar as porções e cite-os no raciocínio; não recalcule nem inclua um campo "calculos".
+- Se "calculos_fixos" não tiver a meta de calorias, use porções moderadas e diga que faltaram dados.
+- resumo_raciocinio, criterios_escolhidos e adaptacoes_ao_perfil devem ser no mesmo idioma que o plano (idioma_plano).
+- O campo "itens" das refeições é opcional. Use "quantidade" como número ou texto (ex.: "1/2") e "unidade" como "g", "ml", "xícara", "colher de sopa", "fatia", "unidade", etc.
+"""
+
+INSTRUCAO_USUARIO = (
+    "Gere um plano alimentar educativo a partir da seguinte anamnese. "
+    "Responda no idioma indicado em 'idioma_plano'. "
+    "Lembre-se de retornar ESTRITAMENTE no formato JSON especificado.\n\n"
+)
+
+SYSTEM_PROMPT_REFEICAO = """
+Você é um assistente de nutrição que ajusta planos alimentares apenas para fins EDUCATIVOS.
+Você NÃO substitui um nutricionista ou médico e não faz prescrição clínica.
+
+Tarefa: substituir UMA refeição de um plano já existente. As demais refeições continuam iguais.
+- Mantenha o mesmo nome e horário da refeição substituída, com energia parecida (use "calculos_fixos" como referência).
+- Não repita os alimentos principais da refeição antiga nem os das outras refeições do dia.
+- Respeite a anamnese (preferências, restrições, objetivo) e os pedidos extras, quando houver.
+- Use porções em medidas caseiras e linguagem simples, no idioma do plano (idioma_plano).
+
+FORMATO DA RESPOSTA: um ÚNICO JSON válido:
+{
+  "refeicao": {
+    "nome": "Almoço",
+    "horario_sugerido": "12:30",
+    "descricao": "texto resumido",
+    "observacoes": "texto opcional",
+    "itens": [{ "nome": "Arroz integral", "quantidade": "3", "unidade": "colher de sopa" }]
+  },
+  "justificativa": "Uma frase explicando a troca e como ela mantém o plano coerente."
+}
+"""
+
+INSTRUCAO_REFEICAO = (
+    "Substitua a refeição indicada em 'substituir' no plano abaixo. "
+    "Responda no idioma indicado em 'idioma_plano', ESTRITAMENTE no formato JSON especificado.\n\n"
+)
+
+# Limite de pratos citados no contexto semanal (mantém o prompt de cada dia pequeno)
+MAX_PRATOS_USADOS = 40
+
+# Tema de cada dia do cardápio semanal. Os dias são gerados em paralelo, sem ver os pratos uns
+# dos outros: a variedade vem de cada dia ter uma base diferente, definida de antemão.
+TEMAS_DIA = (
+    "frango e preparações grelhadas",
+    "peixe ou frutos do mar",
+    "leguminosas (feijão, lentilha, grão-de-bico) como proteína principal",
+    "carne vermelha magra com legumes refogados",
+    "ovos e preparações assadas no forno",
+    "culinária regional brasileira",
+    "pratos práticos de uma panela só",
+)
+
+
+def contexto_semana(dia: int, total_dias: int, pratos_usados: List[str]) -> str:
+    """Trecho extra do prompt de cada dia do cardápio semanal: o tema do dia e, se houver, os
+    pratos dos dias que já terminaram."""
+    tema = TEMAS_DIA[(dia - 1) % len(TEMAS_DIA)]
+    texto = (
+        f"Este é o plano do dia {dia} de {total_dias} de um cardápio semanal. Tema do dia: {tema} "
+        "(adapte ou troque o tema se ele conflitar com as restrições e preferências da anamnese)."
+    )
+    if pratos_usados:
+        recentes = pratos_usados[-MAX_PRATOS_USADOS:]
+        texto += f"\npratos_ja_usados (evite repetir): {json.dumps(recentes, ensure_ascii=False)}"
+    return texto
+
+
+def _sem_vazios(valor: Any) -> Any:
+    """Remove recursivamente None, strings vazias, listas e objetos vazios."""
+    if isinstance(valor, dict):
+        limpo = {k: _sem_vazios(v) for k, v in valor.items()}
+        return {k: v for k, v in limpo.items() if v not in (None, "", [], {})}
+    if isinstance(valor, list):
+        return [v for v in (_sem_vazios(v) for v in valor) if v not in (None, "", [], {})]
+    return valor
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    versao: str
+    system: str
+    instrucao: str
+    compacto: bool = True
+
+    def _json(self, dados: Any) -> str:
+        if self.compacto:
+            return json.dumps(_sem_vazios(dados), ensure_ascii=False, separators=(",", ":"))
+        return json.dumps(dados, ensure_ascii=False, indent=2)
+
+    def anamnese_json(self, anamnese: Anamnese) -> str:
+        return self._json(anamnese.model_dump())
+
+    def mensagens(self, anamnese: Anamnese, extras: Optional[str] = None) -> List[Dict[str, str]]:
+        """Mensagens do chat: prefixo estático primeiro, partes variáveis no fim.
+
+        `extras` (ex.: contexto do cardápio semanal) vai depois da anamnese para não quebrar o prefixo.
+        """
+        calculos_fixos = json.dumps(calcular(anamnese).para_prompt(), ensure_ascii=False, separators=(",", ":"))
+        conteudo = f"{self.instrucao}{self.anamnese_json(anamnese)}\n\ncalculos_fixos: {calculos_fixos}"
+        if extras:
+            conteudo += f"\n\n{extras}"
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": conteudo},
+        ]
+
+    def mensagens_refeicao(
+        self, anamnese: Anamnese, plano: PlanoAlimentar, indice: int, pedidos: List[str]
+    ) -> List[Dict[str, str]]:
+        """Mensagens para regenerar só a refeição `indice`; o plano vai sem os totais estimados."""
+        calculos_fixos = json.dumps(calcular(anamnese).para_prompt(), ensure_ascii=False, separators=(",", ":"))
+        refeicoes = plano.model_dump(include={"refeicoes": {"__all__": {"nome", "horario_sugerido", "descricao", "itens"}}})
+        substituir: Dict[str, Any] = {"indice": indice, "nome": plano.refeicoes[indice].nome}
+        if pedidos:
+            substituir["pedidos"] = pedidos
+        conteudo = (
+            f"{INSTRUCAO_REFEICAO}{self.anamnese_json(anamnese)}\n\n"
+            f"calculos_fixos: {calculos_fixos}\n\n"
+            f"plano: {self._json(refeicoes)}\n\n"
+            f"substituir: {json.dumps(substituir, ensure_ascii=False)}"
+        )
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT_REFEICAO.strip()},
+            {"role": "user", "content": conteudo},
+        ]
+
+
+# Nova versão sempre que o texto ou o formato mudar: a versão entra na chave do cache de planos
+TEMPLATES: Dict[str, PromptTemplate] = {
+    "2": PromptTemplate(versao="2", system=SYSTEM_PROMPT, instrucao=INSTRUCAO_USUARIO, compacto=False),
+    "3": PromptTemplate(versao="3", system=SYSTEM_PROMPT.strip(), instrucao=INSTRUCAO_USUARIO),
+}
+
+
+def get_prompt_template(versao: Optional[str] = None) -> PromptTemplate:
+    versao = versao or get_settings().prompt_version
+    try:
+        return TEMPLATES[versao]
+    except KeyError as exc:
+        raise ValueError(f"Versão de prompt desconhecida: {versao} (disponíveis: {', '.join(TEMPLATES)})") from exc
+
+
+def build_user_prompt(anamnese: Anamnese) -> str:
+    return get_prompt_template().anamnese_json(anamnese)
+
+
+# Saída estruturada: JSON Schema (modo estrito da OpenAI) derivado dos modelos Pydantic.
+# Campos preenchidos pelo backend (totais estimados, cálculos) ficam fora do que a IA gera.
+_CAMPOS_DO_BACKEND = frozenset({"totais", "calculos"})
+
+
+def _schema_estrito(no: Any, excluir: FrozenSet[str]) -> Any:
+    """Adapta um schema do Pydantic ao modo estrito: todo campo obrigatório (opcionais
+    aceitam null), sem campos extras e sem `default`/`title`."""
+    if isinstance(no, list):
+        return [_schema_estrito(v, excluir) for v in no]
+    if not isinstance(no, dict):
+        return no
+    resultado = {
+        k: _schema_estrito(v, excluir)
+        for k, v in no.items()
+        if k not in ("default", "title", "properties", "required", "$defs")
+    }
+    if "$defs" in no:
+        resultado["$defs"] = {nome: _schema_estrito(d, excluir) for nome, d in no["$defs"].items()}
+    if "properties" in no:
+        propriedades = {k: _schema_estrito(v, excluir) for k, v in no["properties"].items() if k not in excluir}
+        resultado["properties"] = propriedades
+        resultado["required"] = list(propriedades)
+        resultado["additionalProperties"] = False
+    return resultado
+
+
+def _sem_defs_orfas(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Remove definições que deixaram de ser referenciadas (ex.: TotaisNutricionais)."""
+    defs = schema.get("$defs", {})
+    usadas: set[str] = set()
+    pendentes = [json.dumps({k: v for k, v in schema.items() if k != "$defs"})]
+    while pendentes:
+        texto = pendentes.pop()
+        for nome, definicao in defs.items():
+            if nome not in usadas and f'"#/$defs/{nome}"' in texto:
+                usadas.add(nome)
+                pendentes.append(json.dumps(definicao))
+    schema["$defs"] = {nome: d for nome, d in defs.items() if nome in usadas}
+    return schema
+
+
+def _schema_resposta(propriedades: Dict[str, Any], *modelos: type) -> Dict[str, Any]:
+    defs: Dict[str, Any] = {}
+    for modelo in modelos:
+        schema = modelo.model_json_schema()
+        defs.update(schema.pop("$defs", {}))
+        defs[modelo.__name__] = schema
+    schema = {"type": "object", "properties": propriedades, "$defs": defs}
+    return _sem_defs_orfas(_schema_estrito(schema, _CAMPOS_DO_BACKEND))
+
+
+@lru_cache
+def response_format(tipo: str) -> Optional[Dict[str, Any]]:
+    """`response_format` da chamada ao modelo para "plano" ou "refeicao" (OPENAI_RESPONSE_FORMAT)."""
+    modo = get_settings().openai_response_format
+    if modo == "json_object":
+        return {"type": "json_object"}
+    if modo != "json_schema":
+        return None
+    if tipo == "plano":
+        propriedades = {
+            **PlanoAlimentar.model_json_schema()["properties"],
+            "explicacao_geracao": {"$ref": "#/$defs/ExplicacaoGeracao"},
+        }
+        schema = _schema_resposta(propriedades, ExplicacaoGeracao, PlanoAlimentar)
+    else:
+        propriedades = {
+            "refeicao": {"$ref": "#/$defs/Refeicao"},
+            "justificativa": {"anyOf": [{"type": "string"}, {"type": "null"}]},
+        }
+        schema = _schema_resposta(propriedades, Refeicao)
+    return {"type": "json_schema", "json_schema": {"name": tipo, "strict": True, "schema": schema}}
+
+
+SYSTEM_PROMPT_REPARO = (
+    "Você corrige respostas JSON malformadas. Devolva apenas o JSON corrigido, no formato "
+    "esperado, mantendo o conteúdo original; complete campos faltantes de forma mínima."
+)
+
+
+def mensagens_reparo(texto: str, erro: str) -> List[Dict[str, str]]:
+    """Chamada curta de "corrija este JSON" (sem anamnese: só o texto e o erro)."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT_REPARO},
+        {"role": "user", "content": f"erro: {erro}\n\njson:\n{texto}"},
+    ]
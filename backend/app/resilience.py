@@ -0,0 +1,144 @@
+"""Resiliência das chamadas ao modelo: timeout por tentativa, retentativas com backoff e hedge.
+
+- `com_retentativas`: repete erros transitórios (timeout, conexão, 429, 5xx) com backoff
+  exponencial e jitter completo, respeitando o Retry-After do provedor quando houver.
+- `com_hedge`: se o modelo principal passar do limite de latência (ou falhar), dispara a
+  mesma geração no modelo de fallback; a primeira resposta válida vence e a outra é cancelada.
+"""
+import asyncio
+import logging
+import random
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Limite superior para um Retry-After informado pelo provedor
+MAX_RETRY_AFTER_S = 30.0
+
+
+class _Contadores:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._valores: Dict[str, int] = {}
+
+    def incrementar(self, nome: str) -> None:
+        with self._lock:
+            self._valores[nome] = self._valores.get(nome, 0) + 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._valores)
+
+
+contadores = _Contadores()
+
+
+def erro_retentavel(exc: BaseException) -> bool:
+    import openai  # já carregado: só há erro do SDK depois de o cliente existir
+
+    if isinstance(exc, (asyncio.TimeoutError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(exc, openai.RateLimitError):
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code >= 500
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    resposta = getattr(exc, "response", None)
+    valor = resposta.headers.get("retry-after") if resposta is not None else None
+    try:
+        return min(float(valor), MAX_RETRY_AFTER_S) if valor else None
+    except ValueError:
+        return None
+
+
+def atraso_backoff(tentativa: int, base_s: float, maximo_s: float) -> float:
+    """Jitter completo: uniforme entre 0 e base * 2^tentativa (limitado a `maximo_s`)."""
+    return random.uniform(0, min(maximo_s, base_s * (2 ** tentativa)))
+
+
+async def com_retentativas(fabrica: Callable[[], Awaitable[T]], operacao: str = "llm") -> T:
+    """Executa `fabrica()` com timeout por tentativa, repetindo erros transitórios."""
+    settings = get_settings()
+    tentativas = max(1, settings.openai_max_retries + 1)
+    for tentativa in range(tentativas):
+        try:
+            return await asyncio.wait_for(fabrica(), settings.openai_attempt_timeout_s)
+        except Exception as exc:  # noqa: BLE001
+            if not erro_retentavel(exc) or tentativa == tentativas - 1:
+                raise
+            espera = _retry_after(exc)
+            if espera is None:
+                espera = atraso_backoff(tentativa, settings.openai_retry_base_delay_s, settings.openai_retry_max_delay_s)
+            contadores.incrementar("retentativas")
+            logger.warning(
+                "%s: tentativa %d falhou (%s); nova tentativa em %.2fs",
+                operacao, tentativa + 1, type(exc).__name__, espera,
+            )
+            await asyncio.sleep(espera)
+    raise AssertionError("inalcançável")
+
+
+async def com_hedge(candidatos: Sequence[Tuple[str, Callable[[], Awaitable[T]]]], atraso_s: float) -> Tuple[str, T]:
+    """Executa o primeiro candidato; o próximo entra após `atraso_s` sem resposta ou se o atual falhar.
+
+    Retorna (nome do candidato vencedor, resultado). Se todos falharem, propaga o erro do primeiro.
+    """
+    fila = list(candidatos)
+    pendentes: Dict["asyncio.Future[T]", str] = {}
+    erros: List[BaseException] = []
+
+    def lancar() -> None:
+        nome, fabrica = fila.pop(0)
+        if pendentes:
+            contadores.incrementar("hedges_disparados")
+        elif erros:
+            contadores.incrementar("fallbacks_apos_erro")
+        pendentes[asyncio.ensure_future(fabrica())] = nome
+
+    lancar()
+    try:
+        while pendentes:
+            feitos, _ = await asyncio.wait(
+                pendentes, timeout=atraso_s if fila else None, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not feitos:
+                lancar()
+                continue
+            for tarefa in feitos:
+                nome = pendentes.pop(tarefa)
+                if tarefa.exception() is None:
+                    if nome != candidatos[0][0]:
+                        contadores.incrementar("vitorias_fallback")
+                    return nome, tarefa.result()
+                erros.append(tarefa.exception())
+            if fila:
+                lancar()
+        raise erros[0]
+    finally:
+        for tarefa in pendentes:
+            tarefa.cancel()
+        if pendentes:
+            await asyncio.gather(*pendentes, return_exceptions=True)
+
+
+def modelos_candidatos(modelo: str) -> List[str]:
+    """Modelo principal seguido do fallback (se configurado e diferente)."""
+    fallback = get_settings().openai_fallback_model.strip()
+    return [modelo, fallback] if fallback and fallback != modelo else [modelo]
+
+
+async def executar_com_fallback(modelo: str, tentar: Callable[[str], Awaitable[T]]) -> T:
+    """Roda `tentar(modelo)` com hedge para o modelo de fallback; `tentar` deve validar a resposta."""
+    candidatos = [(m, lambda m=m: tentar(m)) for m in modelos_candidatos(modelo)]
+    _, resultado = await com_hedge(candidatos, get_settings().openai_hedge_after_s)
+    return resultado
+
+
+def resiliencia_stats() -> Dict[str, int]:
+    return contadores.stats()
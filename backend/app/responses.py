@@ -0,0 +1,86 @@
+"""Respostas JSON dos planos: serialização única, compressão e ETag forte.
+
+O modelo já validado vira bytes uma vez com `model_dump_json` (serializador do pydantic-core,
+sem passar de novo por `response_model` e pelo jsonable_encoder). Corpos a partir de
+COMPRESS_MIN_BYTES saem em brotli (se o pacote opcional `brotli` estiver instalado) ou gzip,
+conforme o Accept-Encoding. O ETag é o hash do JSON, com a codificação como sufixo: um ETag
+forte identifica os bytes exatos de cada representação.
+"""
+import gzip
+import hashlib
+from typing import Dict, Optional, Union
+
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from .config import get_settings
+from .metrics import medir_cpu
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele, só gzip
+    brotli = None
+
+# Preferência quando o cliente aceita mais de uma
+CODIFICACOES = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def aceita_codificacao(request: Request, codificacao: str) -> bool:
+    """Se o Accept-Encoding da requisição aceita `codificacao` (q=0 conta como recusa)."""
+    for parte in request.headers.get("accept-encoding", "").split(","):
+        nome, _, parametros = parte.strip().partition(";")
+        if nome.strip().lower() == codificacao:
+            return parametros.replace(" ", "").lower() not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def corresponde_etag(request: Request, etag: str) -> bool:
+    valor = request.headers.get("if-none-match", "")
+    return valor.strip() == "*" or etag in (v.strip().removeprefix("W/") for v in valor.split(","))
+
+
+def comprimir(corpo: bytes, codificacao: str) -> bytes:
+    settings = get_settings()
+    if codificacao == "br":
+        return brotli.compress(corpo, quality=settings.brotli_quality)
+    # mtime=0: mesmos bytes para o mesmo JSON (o ETag da variante gzip continua forte)
+    return gzip.compress(corpo, compresslevel=settings.gzip_level, mtime=0)
+
+
+def _codificacao(request: Request, tamanho: int) -> Optional[str]:
+    if tamanho < get_settings().compress_min_bytes:
+        return None
+    return next((c for c in CODIFICACOES if aceita_codificacao(request, c)), None)
+
+
+def resposta_json(
+    request: Request,
+    conteudo: Union[BaseModel, bytes],
+    operacao: str = "plano",
+    cabecalhos: Optional[Dict[str, str]] = None,
+) -> Response:
+    """Response com o JSON de `conteudo` (modelo ou bytes já serializados), comprimido e com ETag.
+
+    Em GET/HEAD com If-None-Match igual ao ETag, responde 304 sem corpo nem compressão.
+    """
+    if isinstance(conteudo, bytes):
+        corpo = conteudo
+    else:
+        with medir_cpu(operacao, "serializacao"):
+            corpo = conteudo.model_dump_json().encode("utf-8")
+    with medir_cpu(operacao, "etag"):
+        base = hashlib.sha256(corpo).hexdigest()[:32]
+    codificacao = _codificacao(request, len(corpo))
+    cabecalhos = {
+        **(cabecalhos or {}),
+        "ETag": f'"{base}-{codificacao}"' if codificacao else f'"{base}"',
+        "Vary": "Accept-Encoding",
+    }
+    if request.method in ("GET", "HEAD") and corresponde_etag(request, cabecalhos["ETag"]):
+        return Response(status_code=304, headers=cabecalhos)
+    if codificacao:
+        with medir_cpu(operacao, "compressao"):
+            corpo = comprimir(corpo, codificacao)
+        cabecalhos["Content-Encoding"] = codificacao
+    return Response(content=corpo, media_type="application/json", headers=cabecalhos)
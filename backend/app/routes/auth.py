@@ -1,57 +1,63 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
+from ..database import get_async_db
+from ..metrics import medir
 from ..models import User
 from ..schemas import UserRegister, UserResponse, Token
 from ..auth import (
-    get_password_hash,
-    authenticate_user,
+    get_password_hash_async,
+    authenticate_user_async,
     create_access_token,
     get_current_user,
     ACCESS_TOKEN_EXPIRE_MINUTES,
-    get_user_by_username,
 )
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserRegister, db: Session = Depends(get_db)):
+async def register(user_data: UserRegister, db: AsyncSession = Depends(get_async_db)):
     """Registra um novo usuário"""
     try:
         # Verifica se username já existe
-        if db.query(User).filter(User.username == user_data.username).first():
+        with medir("registro", "db"):
+            username_em_uso = (await db.execute(select(User.id).where(User.username == user_data.username))).first()
+        if username_em_uso:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Nome de usuário já está em uso"
             )
         
         # Verifica se email já existe
-        if db.query(User).filter(User.email == user_data.email).first():
+        with medir("registro", "db"):
+            email_em_uso = (await db.execute(select(User.id).where(User.email == user_data.email))).first()
+        if email_em_uso:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email já está em uso"
             )
         
         # Cria novo usuário
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await get_password_hash_async(user_data.password)
         db_user = User(
             email=user_data.email,
             username=user_data.username,
             hashed_password=hashed_password
         )
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        with medir("registro", "db"):
+            await db.commit()
+            await db.refresh(db_user)
         
         return db_user
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro ao registrar usuário: {str(e)}"
@@ -61,10 +67,10 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Autentica usuário e retorna token JWT"""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,76 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from ..admission import limitar_geracao
+from ..jobs import STATUS_FINAIS, FilaCheia, get_job_queue
+from ..responses import resposta_json
+from ..schemas import Anamnese, FilaStats, JobStatus
+from ..streaming import sse
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+# Intervalo entre eventos de status na assinatura SSE (também serve de keep-alive)
+INTERVALO_EVENTOS_S = 15.0
+
+
+@router.post(
+    "/gerar-plano",
+    response_model=JobStatus,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(limitar_geracao)],
+)
+async def enfileirar_plano(
+    anamnese: Anamnese,
+    forcar_nova_geracao: bool = Query(False, description="Ignora o cache e gera um plano novo"),
+):
+    """Enfileira a geração e retorna o id do job imediatamente."""
+    try:
+        return await get_job_queue().submit(anamnese, usar_cache=not forcar_nova_geracao)
+    except FilaCheia as exc:
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content={"detail": "Fila de gerações cheia. Tente novamente em instantes."},
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+
+
+@router.get("/stats", response_model=FilaStats)
+async def stats_fila():
+    """Profundidade da fila e espera estimada para um novo job."""
+    return await get_job_queue().stats()
+
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def status_job(job_id: str, request: Request):
+    """Consulta (polling) o estado do job; inclui o plano quando concluído.
+
+    Com If-None-Match do último ETag recebido, responde 304 enquanto nada mudou.
+    """
+    job = await get_job_queue().status(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job não encontrado")
+    return resposta_json(request, job, "job")
+
+
+@router.get("/{job_id}/eventos")
+async def eventos_job(job_id: str) -> StreamingResponse:
+    """Assinatura via Server-Sent Events: envia "status" periodicamente e "concluido"/"erro" no fim."""
+    fila = get_job_queue()
+    job = await fila.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job não encontrado")
+
+    async def eventos():
+        atual = job
+        while atual is not None and atual.status not in STATUS_FINAIS:
+            yield sse("status", atual.model_dump(exclude={"resultado"}))
+            await fila.aguardar(job_id, INTERVALO_EVENTOS_S)
+            atual = await fila.status(job_id)
+        if atual is not None:
+            yield sse(atual.status, atual.model_dump())
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,74 @@
+import hashlib
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..auth import get_current_user
+from ..database import get_async_db
+from ..models import User
+from ..pdf import resposta_pdf
+from ..plan_store import COMPRESSAO, descomprimir, listar_planos, obter_plano_salvo
+from ..responses import aceita_codificacao, corresponde_etag
+from ..schemas import HistoricoPlanos, PlanoResponse
+
+router = APIRouter(prefix="/api/planos", tags=["planos"])
+
+
+@router.get("", response_model=HistoricoPlanos)
+async def historico(
+    limite: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="proximo_cursor da página anterior"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Planos salvos do usuário, do mais recente para o mais antigo."""
+    try:
+        return await listar_planos(db, current_user.id, limite, cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc))
+
+
+@router.get("/{plano_id}", response_model=PlanoResponse)
+async def plano_salvo(
+    plano_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+) -> Response:
+    """Plano salvo como foi gerado (bytes gravados, sem revalidar)."""
+    salvo = await obter_plano_salvo(db, current_user.id, plano_id)
+    if salvo is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Plano não encontrado")
+    dados, compressao = salvo
+    repassar = compressao == COMPRESSAO and aceita_codificacao(request, COMPRESSAO)
+    # Bytes gravados são imutáveis: o hash deles identifica as duas representações
+    base = hashlib.sha256(dados).hexdigest()[:32]
+    cabecalhos = {
+        "ETag": f'"{base}-{COMPRESSAO}"' if repassar else f'"{base}"',
+        "Vary": "Accept-Encoding",
+        "Cache-Control": "private, max-age=86400, immutable",
+    }
+    if corresponde_etag(request, cabecalhos["ETag"]):
+        return Response(status_code=304, headers=cabecalhos)
+    if repassar:
+        cabecalhos["Content-Encoding"] = COMPRESSAO
+    else:
+        dados = descomprimir(dados, compressao)
+    return Response(content=dados, media_type="application/json", headers=cabecalhos)
+
+
+@router.get("/{plano_id}/pdf", response_class=Response)
+async def plano_salvo_pdf(
+    plano_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+) -> Response:
+    """PDF do plano salvo (ETag forte: downloads repetidos recebem 304)."""
+    salvo = await obter_plano_salvo(db, current_user.id, plano_id)
+    if salvo is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Plano não encontrado")
+    resposta = PlanoResponse.model_validate_json(descomprimir(*salvo))
+    return resposta_pdf(request, resposta.plano)
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import List, Optional
 from pydantic import BaseModel, Field
 
@@ -61,6 +62,14 @@ class ItemRefeicao(BaseModel):
     unidade: Optional[str] = None  # "g", "ml", "xícara", "fatia", "unidade", "colher de sopa"
 
 
+class TotaisNutricionais(BaseModel):
+    """Estimativa educativa de calorias e macronutrientes (calculada no backend, não pela IA)."""
+    kcal: float
+    proteina_g: float
+    carboidrato_g: float
+    gordura_g: float
+
+
 class Refeicao(BaseModel):
     nome: str = Field(description="Ex.: Café da manhã, Almoço, Lanche da tarde")
     horario_sugerido: Optional[str] = None
@@ -72,12 +81,14 @@ class Refeicao(BaseModel):
         default_factory=list,
         description="Lista opcional de itens com quantidade e unidade (gramatura, porções).",
     )
+    totais: Optional[TotaisNutricionais] = None
 
 
 class PlanoAlimentar(BaseModel):
     resumo_geral: str
     refeicoes: List[Refeicao]
     avisos_importantes: List[str]
+    totais: Optional[TotaisNutricionais] = None
 
 
 class CalculoNutricional(BaseModel):
@@ -112,6 +123,70 @@ class PlanoResponse(BaseModel):
     plano: PlanoAlimentar
     modelo_utilizado: str
     explicacao_geracao: Optional[ExplicacaoGeracao] = None
+    do_cache: bool = Field(default=False, description="True se a resposta veio do cache de planos")
+
+
+class PlanoSalvoResumo(BaseModel):
+    """Item do histórico de planos (sem o plano em si; ele vem de GET /api/planos/{id})."""
+    id: int
+    criado_em: datetime
+    modelo_utilizado: str
+    anamnese_hash: str
+    tamanho_bytes: int = Field(description="Tamanho do JSON do plano sem compressão")
+    prompt_tokens: int
+    cached_tokens: int
+    completion_tokens: int
+
+
+class HistoricoPlanos(BaseModel):
+    itens: List[PlanoSalvoResumo]
+    proximo_cursor: Optional[str] = Field(
+        default=None, description="Passe em ?cursor= para a próxima página; ausente na última"
+    )
+
+
+class DiaPlano(BaseModel):
+    dia: int = Field(description="1 = primeiro dia do cardápio")
+    plano: Optional[PlanoAlimentar] = None
+    erro: Optional[str] = Field(default=None, description="Motivo da falha, se o dia não pôde ser gerado")
+
+
+class PlanoSemanalResponse(BaseModel):
+    dias: List[DiaPlano]
+    modelo_utilizado: str
+    explicacao_geracao: Optional[ExplicacaoGeracao] = None
+    completo: bool = Field(description="False se algum dia falhou (os demais vêm mesmo assim)")
+
+
+class RegenerarRefeicaoRequest(BaseModel):
+    """Troca uma única refeição de um plano já gerado, mantendo as demais."""
+    anamnese: Anamnese
+    plano: PlanoAlimentar
+    explicacao_geracao: Optional[ExplicacaoGeracao] = None
+    indice_refeicao: int = Field(ge=0, description="Posição da refeição a substituir em plano.refeicoes")
+    pedidos: List[str] = Field(
+        default_factory=list,
+        description="Restrições extras para a nova refeição (ex.: sem ovo, preparo rápido)",
+    )
+
+
+# Schemas da fila de gerações (/api/jobs)
+class JobStatus(BaseModel):
+    job_id: str
+    status: str = Field(description="pendente, processando, concluido ou erro")
+    posicao_na_fila: Optional[int] = Field(default=None, description="Jobs à frente (só para pendentes)")
+    espera_estimada_s: Optional[float] = None
+    resultado: Optional[PlanoResponse] = None
+    erro: Optional[str] = None
+
+
+class FilaStats(BaseModel):
+    na_fila: int
+    em_processamento: int
+    workers: int
+    capacidade: int
+    duracao_media_s: float
+    espera_estimada_s: float
 
 
 # Schemas de autenticação
@@ -0,0 +1,58 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class _Voo(Generic[T]):
+    def __init__(self, tarefa: "asyncio.Task[T]") -> None:
+        self.tarefa = tarefa
+        self.aguardando = 0
+
+
+class SingleFlight(Generic[T]):
+    """Coalesce chamadas concorrentes com a mesma chave em uma única execução.
+
+    A execução roda em uma tarefa própria, desacoplada de quem a iniciou: se o primeiro
+    cliente desconectar, os demais continuam esperando o mesmo resultado. A tarefa só é
+    cancelada quando não resta ninguém aguardando. Erros chegam a todos os chamadores.
+    """
+
+    def __init__(self) -> None:
+        self._em_voo: Dict[str, _Voo[T]] = {}
+        self.execucoes = 0
+        self.coalescidas = 0
+
+    def _encerrar(self, chave: str, voo: _Voo[T]) -> None:
+        if self._em_voo.get(chave) is voo:
+            del self._em_voo[chave]
+
+    async def do(self, chave: str, fabrica: Callable[[], Awaitable[T]]) -> T:
+        voo = self._em_voo.get(chave)
+        if voo is None:
+            voo = _Voo(asyncio.ensure_future(fabrica()))
+            self._em_voo[chave] = voo
+            self.execucoes += 1
+            voo.tarefa.add_done_callback(lambda _t, c=chave, v=voo: self._encerrar(c, v))
+            # Marca a exceção como consumida mesmo se todos os chamadores já tiverem saído
+            voo.tarefa.add_done_callback(lambda t: t.cancelled() or t.exception())
+        else:
+            self.coalescidas += 1
+
+        voo.aguardando += 1
+        try:
+            return await asyncio.shield(voo.tarefa)
+        finally:
+            voo.aguardando -= 1
+            if voo.aguardando == 0 and not voo.tarefa.done():
+                # Último interessado desistiu: libera a chave já, para que uma nova
+                # requisição não se junte a uma execução que está sendo cancelada
+                self._encerrar(chave, voo)
+                voo.tarefa.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "em_voo": len(self._em_voo),
+            "execucoes": self.execucoes,
+            "coalescidas": self.coalescidas,
+        }
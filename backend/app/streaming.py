@@ -0,0 +1,91 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+
+def sse(evento: str, dados: Any) -> str:
+    """Formata um evento Server-Sent Events com payload JSON."""
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
+class IncrementalPlanParser:
+    """Parser incremental do JSON do plano retornado em streaming pelo modelo.
+
+    Recebe pedaços de texto (`feed`) e devolve os campos de nível superior assim que
+    cada um fica completo, como pares (chave, valor). Os elementos de "refeicoes" são
+    devolvidos um a um como ("refeicao", valor), sem esperar o array fechar.
+    Texto antes do primeiro "{" (ex.: cercas ```json) é ignorado.
+    """
+
+    def __init__(self) -> None:
+        self.texto = ""
+        self._pos = 0
+        self._profundidade = 0
+        self._em_string = False
+        self._escape = False
+        self._inicio_string = -1
+        self._esperando_chave = True
+        self._chave: Optional[str] = None
+        self._inicio_valor = -1
+        self._valor_emitido = False
+        self._inicio_item = -1
+        self.concluido = False
+
+    def feed(self, pedaco: str) -> List[Tuple[str, Any]]:
+        self.texto += pedaco
+        eventos: List[Tuple[str, Any]] = []
+        texto = self.texto
+        i = self._pos
+        while i < len(texto) and not self.concluido:
+            c = texto[i]
+            if self._em_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._em_string = False
+                    if self._profundidade == 1:
+                        if self._esperando_chave:
+                            self._chave = json.loads(texto[self._inicio_string : i + 1])
+                        else:
+                            self._emitir(eventos, i + 1)
+            elif self._profundidade == 0:
+                if c == "{":
+                    self._profundidade = 1
+            elif c == '"':
+                self._em_string = True
+                self._inicio_string = i
+            elif c in "{[":
+                self._profundidade += 1
+                if self._profundidade == 3 and c == "{" and self._chave == "refeicoes":
+                    self._inicio_item = i
+            elif c in "}]":
+                self._profundidade -= 1
+                if self._profundidade == 2 and c == "}" and self._chave == "refeicoes":
+                    eventos.append(("refeicao", json.loads(texto[self._inicio_item : i + 1])))
+                elif self._profundidade == 1:
+                    self._emitir(eventos, i + 1)
+                elif self._profundidade == 0:
+                    self._emitir(eventos, i)
+                    self.concluido = True
+            elif self._profundidade == 1:
+                if c == ":":
+                    self._esperando_chave = False
+                    self._inicio_valor = i + 1
+                    self._valor_emitido = False
+                elif c == ",":
+                    self._emitir(eventos, i)
+                    self._esperando_chave = True
+            i += 1
+        self._pos = i
+        return eventos
+
+    def _emitir(self, eventos: List[Tuple[str, Any]], fim: int) -> None:
+        """Emite o valor da chave atual (uma única vez), se houver um valor pendente."""
+        if self._esperando_chave or self._valor_emitido or self._chave is None:
+            return
+        self._valor_emitido = True
+        bruto = self.texto[self._inicio_valor : fim].strip()
+        if not bruto:
+            return
+        eventos.append((self._chave, json.loads(bruto)))
@@ -0,0 +1,68 @@
+import logging
+import threading
+from typing import Any, Dict, NamedTuple
+
+from .metrics import tokens
+
+logger = logging.getLogger(__name__)
+
+
+class UsoTokens(NamedTuple):
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    completion_tokens: int = 0
+
+
+def extrair_uso(usage: Any) -> UsoTokens:
+    """Lê `completion.usage` da OpenAI (campos ausentes contam como zero)."""
+    if usage is None:
+        return UsoTokens()
+    detalhes = getattr(usage, "prompt_tokens_details", None)
+    return UsoTokens(
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        cached_tokens=getattr(detalhes, "cached_tokens", 0) or 0,
+        completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+    )
+
+
+class UsageTracker:
+    """Contabilidade de tokens por requisição, agregada por modelo."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._por_modelo: Dict[str, Dict[str, int]] = {}
+
+    def registrar(self, modelo: str, uso: UsoTokens, operacao: str = "plano") -> None:
+        logger.info(
+            "tokens operacao=%s modelo=%s prompt=%d cached=%d completion=%d",
+            operacao, modelo, uso.prompt_tokens, uso.cached_tokens, uso.completion_tokens,
+        )
+        tokens.inc(modelo, "prompt", valor=uso.prompt_tokens)
+        tokens.inc(modelo, "prompt_em_cache", valor=uso.cached_tokens)
+        tokens.inc(modelo, "completion", valor=uso.completion_tokens)
+        with self._lock:
+            agregado = self._por_modelo.setdefault(
+                modelo, {"requisicoes": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+            )
+            agregado["requisicoes"] += 1
+            agregado["prompt_tokens"] += uso.prompt_tokens
+            agregado["cached_tokens"] += uso.cached_tokens
+            agregado["completion_tokens"] += uso.completion_tokens
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            resultado: Dict[str, Dict[str, float]] = {}
+            for modelo, agregado in self._por_modelo.items():
+                n = agregado["requisicoes"] or 1
+                resultado[modelo] = {
+                    **agregado,
+                    "media_prompt_tokens": round(agregado["prompt_tokens"] / n, 1),
+                    "media_completion_tokens": round(agregado["completion_tokens"] / n, 1),
+                    "taxa_prompt_em_cache": round(agregado["cached_tokens"] / agregado["prompt_tokens"], 4)
+                    if agregado["prompt_tokens"]
+                    else 0.0,
+                }
+            return resultado
+
+
+usage_tracker = UsageTracker()
@@ -0,0 +1,214 @@
+"""Servidor local compatível com a API de chat da OpenAI, para benchmark e testes de carga.
+
+Responde `POST /v1/chat/completions` (com e sem `stream`) com um plano JSON fixo, após uma
+latência configurável, e injeta erros 500/429 numa taxa configurável. Uso isolado:
+
+    python -m bench.fake_openai --porta 8765 --latencia-ms 800 --jitter-ms 200 --taxa-erro 0.02
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+PLANO = {
+    "resumo_geral": "Plano de benchmark com refeições equilibradas e porções caseiras.",
+    "refeicoes": [
+        {
+            "nome": "Café da manhã",
+            "horario_sugerido": "07:00",
+            "descricao": "Pão integral com queijo branco e uma fruta.",
+            "observacoes": None,
+            "itens": [
+                {"nome": "Pão integral", "quantidade": "2", "unidade": "fatia"},
+                {"nome": "Queijo branco", "quantidade": "30", "unidade": "g"},
+                {"nome": "Banana", "quantidade": "1", "unidade": "unidade média"},
+            ],
+        },
+        {
+            "nome": "Almoço",
+            "horario_sugerido": "12:30",
+            "descricao": "Arroz, feijão, frango grelhado e salada.",
+            "observacoes": None,
+            "itens": [
+                {"nome": "Arroz integral", "quantidade": "3", "unidade": "colher de sopa"},
+                {"nome": "Feijão", "quantidade": "1", "unidade": "concha"},
+                {"nome": "Frango grelhado", "quantidade": "120", "unidade": "g"},
+                {"nome": "Salada verde", "quantidade": "1", "unidade": "prato"},
+            ],
+        },
+        {
+            "nome": "Lanche da tarde",
+            "horario_sugerido": "16:00",
+            "descricao": "Iogurte natural com castanhas.",
+            "observacoes": None,
+            "itens": [
+                {"nome": "Iogurte natural", "quantidade": "1", "unidade": "pote 170g"},
+                {"nome": "Castanhas", "quantidade": "20", "unidade": "g"},
+            ],
+        },
+        {
+            "nome": "Jantar",
+            "horario_sugerido": "19:30",
+            "descricao": "Omelete de legumes com batata cozida.",
+            "observacoes": None,
+            "itens": [
+                {"nome": "Ovos", "quantidade": "2", "unidade": "unidade"},
+                {"nome": "Legumes", "quantidade": "2", "unidade": "colher de servir"},
+                {"nome": "Batata cozida", "quantidade": "100", "unidade": "g"},
+            ],
+        },
+    ],
+    "avisos_importantes": [
+        "Plano educativo; não substitui acompanhamento profissional.",
+    ],
+    "explicacao_geracao": {
+        "resumo_raciocinio": "Distribuição em 4 refeições com proteína em todas elas.",
+        "criterios_escolhidos": ["4 refeições ao dia."],
+        "adaptacoes_ao_perfil": ["Preferências respeitadas."],
+    },
+}
+
+REFEICAO = {"refeicao": PLANO["refeicoes"][1], "justificativa": "Troca equivalente para o benchmark."}
+
+
+@dataclass
+class ConfigFake:
+    latencia_ms: float = 800.0
+    jitter_ms: float = 200.0
+    taxa_erro: float = 0.0
+    taxa_429: float = 0.0
+    pedacos_stream: int = 40
+
+
+def _tokens(texto: str) -> int:
+    return max(1, len(texto) // 4)
+
+
+def _conteudo(corpo: Dict[str, Any]) -> str:
+    formato = corpo.get("response_format") or {}
+    nome = (formato.get("json_schema") or {}).get("name")
+    sistema = next((m.get("content", "") for m in corpo.get("messages", []) if m.get("role") == "system"), "")
+    if nome == "refeicao" or "substituir UMA refeição" in sistema:
+        return json.dumps(REFEICAO, ensure_ascii=False)
+    return json.dumps(PLANO, ensure_ascii=False)
+
+
+def _uso(corpo: Dict[str, Any], conteudo: str) -> Dict[str, Any]:
+    prompt = _tokens("".join(m.get("content", "") for m in corpo.get("messages", [])))
+    completion = _tokens(conteudo)
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "total_tokens": prompt + completion,
+        "prompt_tokens_details": {"cached_tokens": 0},
+    }
+
+
+def criar_app(config: ConfigFake) -> FastAPI:
+    app = FastAPI(title="OpenAI falso (benchmark)")
+    app.state.chamadas = 0
+
+    def latencia() -> float:
+        return max(0.0, random.gauss(config.latencia_ms, config.jitter_ms)) / 1000
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        app.state.chamadas += 1
+        corpo = await request.json()
+        sorteio = random.random()
+        if sorteio < config.taxa_429:
+            return JSONResponse(
+                {"error": {"message": "rate limited (fake)", "type": "rate_limit"}},
+                status_code=429,
+                headers={"Retry-After": "0.2"},
+            )
+        if sorteio < config.taxa_429 + config.taxa_erro:
+            await asyncio.sleep(latencia() / 4)
+            return JSONResponse({"error": {"message": "erro injetado (fake)", "type": "server_error"}}, status_code=500)
+
+        conteudo = _conteudo(corpo)
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "created": int(time.time()), "model": corpo.get("model", "fake")}
+
+        if not corpo.get("stream"):
+            await asyncio.sleep(latencia())
+            return {
+                **base,
+                "object": "chat.completion",
+                "choices": [
+                    {"index": 0, "message": {"role": "assistant", "content": conteudo}, "finish_reason": "stop"}
+                ],
+                "usage": _uso(corpo, conteudo),
+            }
+
+        async def eventos() -> AsyncIterator[str]:
+            n = max(1, config.pedacos_stream)
+            tamanho = -(-len(conteudo) // n)
+            intervalo = latencia() / n
+            for inicio in range(0, len(conteudo), tamanho):
+                await asyncio.sleep(intervalo)
+                delta = {"content": conteudo[inicio : inicio + tamanho]}
+                chunk = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            if (corpo.get("stream_options") or {}).get("include_usage"):
+                chunk = {**base, "object": "chat.completion.chunk", "choices": [], "usage": _uso(corpo, conteudo)}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(eventos(), media_type="text/event-stream")
+
+    return app
+
+
+class ServidorFake:
+    """Executa o servidor falso numa thread própria (com seu próprio event loop), para não
+    competir com o event loop da API medida."""
+
+    def __init__(self, config: ConfigFake, porta: int = 8765) -> None:
+        self.app = criar_app(config)
+        self.porta = porta
+        self._servidor = uvicorn.Server(
+            uvicorn.Config(self.app, host="127.0.0.1", port=porta, log_level="warning", access_log=False)
+        )
+        self._thread = threading.Thread(target=self._servidor.run, name="fake-openai", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.porta}/v1"
+
+    def __enter__(self) -> "ServidorFake":
+        self._thread.start()
+        limite = time.monotonic() + 10
+        while not self._servidor.started:
+            if time.monotonic() > limite or not self._thread.is_alive():
+                raise RuntimeError(f"O servidor falso não subiu na porta {self.porta}")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self._servidor.should_exit = True
+        self._thread.join(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--latencia-ms", type=float, default=800.0)
+    parser.add_argument("--jitter-ms", type=float, default=200.0)
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de respostas 500")
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="Fração de respostas 429")
+    args = parser.parse_args()
+    config = ConfigFake(args.latencia_ms, args.jitter_ms, args.taxa_erro, args.taxa_429)
+    uvicorn.run(criar_app(config), host="127.0.0.1", port=args.porta, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""Benchmark da API: carga em concorrência fixa contra o app de `create_app`, com a OpenAI falsa.
+
+Sobe o servidor falso (bench/fake_openai.py) numa thread, aponta OPENAI_BASE_URL para ele, usa
+um banco SQLite temporário e dispara requisições em processo (httpx + ASGITransport, sem rede
+até a API). Para cada cenário e nível de concorrência mede vazão, latências p50/p95/p99 e o
+atraso do event loop, e grava tudo em JSON. Rodar a partir de backend/:
+
+    python -m bench.run --concorrencia 1,10,50 --requisicoes 200 --saida bench/resultado.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List
+
+import httpx
+
+from .fake_openai import ConfigFake, ServidorFake
+
+CENARIOS = ("gerar-plano", "gerar-plano-stream", "register", "login", "me")
+
+ANAMNESE = {
+    "dados_basicos": {"idade": 30, "peso_kg": 70.0, "altura_cm": 175.0, "sexo": "Masculino"},
+    "rotina": {"refeicoes_por_dia": 4, "pratica_atividade_fisica": True},
+    "preferencias": {"gosta_de": ["banana", "arroz"], "nao_gosta_de": ["fígado"]},
+    "objetivos": {"objetivo_principal": "Emagrecimento"},
+}
+SENHA = "senha-benchmark"
+INTERVALO_LAG_S = 0.01
+
+
+@dataclass
+class Amostras:
+    latencias: List[float] = field(default_factory=list)
+    bytes_resposta: List[int] = field(default_factory=list)
+    erros: Dict[str, int] = field(default_factory=dict)
+
+    def erro(self, tipo: str) -> None:
+        self.erros[tipo] = self.erros.get(tipo, 0) + 1
+
+
+def _percentil(ordenados: List[float], p: float) -> float:
+    """Nearest-rank; `ordenados` precisa estar em ordem crescente e não vazio."""
+    indice = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados))) - 1))
+    return ordenados[indice]
+
+
+def _resumo_ms(valores: List[float]) -> Dict[str, float]:
+    if not valores:
+        return {}
+    ordenados = sorted(valores)
+    return {
+        "p50": round(_percentil(ordenados, 50) * 1000, 3),
+        "p95": round(_percentil(ordenados, 95) * 1000, 3),
+        "p99": round(_percentil(ordenados, 99) * 1000, 3),
+        "max": round(ordenados[-1] * 1000, 3),
+        "media": round(statistics.fmean(ordenados) * 1000, 3),
+    }
+
+
+async def _monitorar_lag(atrasos: List[float], parar: asyncio.Event) -> None:
+    """Quanto cada `sleep` curto acorda além do previsto: trabalho síncrono bloqueando o loop."""
+    while not parar.is_set():
+        inicio = time.perf_counter()
+        await asyncio.sleep(INTERVALO_LAG_S)
+        atrasos.append(max(0.0, time.perf_counter() - inicio - INTERVALO_LAG_S))
+
+
+async def _preparar_usuarios(cliente: httpx.AsyncClient, quantidade: int) -> List[Dict[str, str]]:
+    """Cria `quantidade` usuários (com token) para os cenários de login e /me."""
+
+    async def criar() -> Dict[str, str]:
+        nome = f"bench_{uuid.uuid4().hex[:12]}"
+        r = await cliente.post(
+            "/api/auth/register", json={"email": f"{nome}@bench.local", "username": nome, "password": SENHA}
+        )
+        r.raise_for_status()
+        r = await cliente.post("/api/auth/login", data={"username": nome, "password": SENHA})
+        r.raise_for_status()
+        return {"username": nome, "token": r.json()["access_token"]}
+
+    return list(await asyncio.gather(*(criar() for _ in range(quantidade))))
+
+
+def _requisicao(cenario: str, usuarios: List[Dict[str, str]]) -> Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]:
+    async def gerar_plano(cliente: httpx.AsyncClient, i: int) -> httpx.Response:
+        # Peso diferente a cada requisição: sem cache e sem coalescência de gerações idênticas
+        anamnese = {**ANAMNESE, "dados_basicos": {**ANAMNESE["dados_basicos"], "peso_kg": 60 + i * 0.001}}
+        return await cliente.post("/api/gerar-plano", params={"forcar_nova_geracao": "true"}, json=anamnese)
+
+    async def gerar_plano_stream(cliente: httpx.AsyncClient, i: int) -> httpx.Response:
+        anamnese = {**ANAMNESE, "dados_basicos": {**ANAMNESE["dados_basicos"], "peso_kg": 60 + i * 0.001}}
+        r = await cliente.post("/api/gerar-plano/stream", json=anamnese)
+        if "event: erro" in r.text:
+            r.status_code = 599  # o SSE sempre responde 200; o erro vem como evento
+        return r
+
+    async def register(cliente: httpx.AsyncClient, _i: int) -> httpx.Response:
+        nome = f"bench_{uuid.uuid4().hex[:12]}"
+        return await cliente.post(
+            "/api/auth/register", json={"email": f"{nome}@bench.local", "username": nome, "password": SENHA}
+        )
+
+    async def login(cliente: httpx.AsyncClient, i: int) -> httpx.Response:
+        usuario = usuarios[i % len(usuarios)]
+        return await cliente.post("/api/auth/login", data={"username": usuario["username"], "password": SENHA})
+
+    async def me(cliente: httpx.AsyncClient, i: int) -> httpx.Response:
+        token = usuarios[i % len(usuarios)]["token"]
+        return await cliente.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+
+    return {
+        "gerar-plano": gerar_plano,
+        "gerar-plano-stream": gerar_plano_stream,
+        "register": register,
+        "login": login,
+        "me": me,
+    }[cenario]
+
+
+async def _executar(
+    cliente: httpx.AsyncClient,
+    cenario: str,
+    concorrencia: int,
+    total: int,
+    usuarios: List[Dict[str, str]],
+) -> Dict[str, Any]:
+    """Laço fechado: `concorrencia` workers, cada um dispara a próxima requisição ao receber a anterior."""
+    requisicao = _requisicao(cenario, usuarios)
+    amostras = Amostras()
+    proxima = iter(range(total))
+    atrasos: List[float] = []
+    parar = asyncio.Event()
+
+    async def worker() -> None:
+        for i in proxima:
+            inicio = time.perf_counter()
+            try:
+                r = await requisicao(cliente, i)
+            except Exception as exc:  # noqa: BLE001
+                amostras.erro(type(exc).__name__)
+                continue
+            amostras.latencias.append(time.perf_counter() - inicio)
+            amostras.bytes_resposta.append(r.num_bytes_downloaded)
+            if r.status_code >= 400:
+                amostras.erro(str(r.status_code))
+
+    monitor = asyncio.create_task(_monitorar_lag(atrasos, parar))
+    inicio = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concorrencia)))
+    duracao = time.perf_counter() - inicio
+    parar.set()
+    await monitor
+
+    return {
+        "cenario": cenario,
+        "concorrencia": concorrencia,
+        "requisicoes": total,
+        "erros": sum(amostras.erros.values()),
+        "erros_por_tipo": amostras.erros,
+        "duracao_s": round(duracao, 3),
+        "throughput_rps": round(total / duracao, 2) if duracao else None,
+        "latencia_ms": _resumo_ms(amostras.latencias),
+        "lag_event_loop_ms": _resumo_ms(atrasos),
+        # Corpo como veio da API (comprimido, se foi); o httpx pede gzip por padrão
+        "bytes_resposta_media": round(statistics.fmean(amostras.bytes_resposta)) if amostras.bytes_resposta else None,
+    }
+
+
+def _commit_git() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def _benchmark(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    # Importa só depois de configurar o ambiente: settings e engines são lidos no import
+    from app.main import create_app
+
+    app = create_app()
+    resultados: List[Dict[str, Any]] = []
+    transporte = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=None) as cliente:
+            usuarios: List[Dict[str, str]] = []
+            if {"login", "me"} & set(args.cenarios):
+                usuarios = await _preparar_usuarios(cliente, max(args.concorrencia))
+            for cenario in args.cenarios:
+                for concorrencia in args.concorrencia:
+                    resultado = await _executar(cliente, cenario, concorrencia, args.requisicoes, usuarios)
+                    resultados.append(resultado)
+                    lat = resultado["latencia_ms"]
+                    print(
+                        f"{cenario:<20} c={concorrencia:<4} {resultado['throughput_rps']:>9} req/s  "
+                        f"p50={lat.get('p50')}ms p95={lat.get('p95')}ms p99={lat.get('p99')}ms  "
+                        f"lag p99={resultado['lag_event_loop_ms'].get('p99')}ms  erros={resultado['erros']}",
+                        file=sys.stderr,
+                    )
+    return resultados
+
+
+def _lista(tipo: Callable[[str], Any]) -> Callable[[str], List[Any]]:
+    return lambda texto: [tipo(v.strip()) for v in texto.split(",") if v.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cenarios", type=_lista(str), default=list(CENARIOS), help=f"Subconjunto de {','.join(CENARIOS)}")
+    parser.add_argument("--concorrencia", type=_lista(int), default=[1, 10, 50])
+    parser.add_argument("--requisicoes", type=int, default=200, help="Requisições por cenário e nível de concorrência")
+    parser.add_argument("--porta-fake", type=int, default=8765)
+    parser.add_argument("--latencia-ms", type=float, default=800.0, help="Latência média da OpenAI falsa")
+    parser.add_argument("--jitter-ms", type=float, default=200.0)
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de respostas 500 da OpenAI falsa")
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="Fração de respostas 429 da OpenAI falsa")
+    parser.add_argument("--saida", default="-", help="Arquivo JSON de resultado ('-' para stdout)")
+    args = parser.parse_args()
+
+    invalidos = set(args.cenarios) - set(CENARIOS)
+    if invalidos:
+        parser.error(f"cenários desconhecidos: {', '.join(sorted(invalidos))}")
+
+    config_fake = ConfigFake(args.latencia_ms, args.jitter_ms, args.taxa_erro, args.taxa_429)
+    with tempfile.TemporaryDirectory(prefix="mynutri-bench-") as diretorio, ServidorFake(config_fake, args.porta_fake) as fake:
+        os.environ.update(
+            {
+                "OPENAI_API_KEY": "bench",
+                "OPENAI_BASE_URL": fake.base_url,
+                "DATABASE_URL": f"sqlite:///{os.path.join(diretorio, 'bench.db')}",
+                "DATABASE_ASYNC_URL": "",
+                # Todas as requisições saem do mesmo IP: o rate limit por cliente recusaria a carga
+                "RATE_LIMIT_ENABLED": "false",
+            }
+        )
+        resultados = asyncio.run(_benchmark(args))
+        chamadas_fake = fake.app.state.chamadas
+
+    relatorio = {
+        "meta": {
+            "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _commit_git(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "fake_openai": {**vars(config_fake), "chamadas": chamadas_fake},
+            "requisicoes_por_execucao": args.requisicoes,
+        },
+        "resultados": resultados,
+    }
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida == "-":
+        print(texto)
+    else:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto + "\n")
+
+
+if __name__ == "__main__":
+    main()
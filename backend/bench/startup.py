@@ -0,0 +1,152 @@
+"""Perfil de cold start: import da aplicação por módulo e tempo até o /ready responder 200.
+
+Cada repetição roda num processo Python novo, com banco SQLite temporário (o mesmo em todas:
+a primeira cria o schema, as seguintes encontram a versão atual e pulam o `create_all`). Mede
+o import de `app.main`, o lifespan até o `yield` e o aquecimento até o /ready; à parte, um
+`python -X importtime` lista os pacotes e módulos mais caros. Rodar a partir de backend/:
+
+    python -m bench.startup --repeticoes 5 --saida bench/startup.json
+    python -m bench.startup --orcamento-ms 2500   # sai com código 1 acima do orçamento (CI)
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from .run import _commit_git
+
+# Executado em cada processo filho: imprime os tempos em JSON na última linha
+_FILHO = r"""
+import asyncio, json, time
+import httpx  # do próprio medidor: fora da contagem (a aplicação não o importa no startup)
+inicio = time.perf_counter()
+import app.main
+importado = time.perf_counter()
+
+async def medir():
+    aplicacao = app.main.app
+    transporte = httpx.ASGITransport(app=aplicacao)
+    async with aplicacao.router.lifespan_context(aplicacao):
+        iniciado = time.perf_counter()
+        async with httpx.AsyncClient(transport=transporte, base_url="http://startup") as cliente:
+            while True:
+                r = await cliente.get("/ready")
+                if r.status_code == 200:
+                    break
+                await asyncio.sleep(0.005)
+        pronto = time.perf_counter()
+    return {
+        "import_ms": round((importado - inicio) * 1000, 1),
+        "lifespan_ms": round((iniciado - importado) * 1000, 1),
+        "ready_ms": round((pronto - inicio) * 1000, 1),
+        "etapas_ms": r.json()["inicializacao_ms"],
+    }
+
+print(json.dumps(asyncio.run(medir())))
+"""
+
+
+def _rodar_filho(ambiente: Dict[str, str]) -> Dict[str, Any]:
+    saida = subprocess.run(
+        [sys.executable, "-c", _FILHO], env=ambiente, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def _perfil_imports(ambiente: Dict[str, str], top: int) -> Dict[str, Any]:
+    """`python -X importtime`: tempo próprio somado por pacote e os módulos de maior tempo acumulado."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=ambiente, capture_output=True, text=True, check=True,
+    ).stderr
+    modulos = []
+    for linha in stderr.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        proprio, acumulado, nome = (parte.strip() for parte in linha[len("import time:"):].split("|"))
+        modulos.append((nome, int(proprio), int(acumulado)))
+    por_pacote: Dict[str, int] = {}
+    for nome, proprio, _ in modulos:
+        pacote = nome.split(".")[0]
+        por_pacote[pacote] = por_pacote.get(pacote, 0) + proprio
+    mais_caros = sorted(modulos, key=lambda m: m[2], reverse=True)[:top]
+    return {
+        "total_ms": round(sum(proprio for _, proprio, _ in modulos) / 1000, 1),
+        "pacotes_ms": {
+            pacote: round(us / 1000, 1)
+            for pacote, us in sorted(por_pacote.items(), key=lambda p: p[1], reverse=True)[:top]
+        },
+        "modulos_acumulado_ms": {nome: round(acumulado / 1000, 1) for nome, _, acumulado in mais_caros},
+    }
+
+
+def _resumo(execucoes: List[Dict[str, Any]], campo: str) -> Dict[str, float]:
+    valores = [e[campo] for e in execucoes]
+    return {
+        "mediana": round(statistics.median(valores), 1),
+        "min": round(min(valores), 1),
+        "max": round(max(valores), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticoes", type=int, default=5, help="Processos com o schema já criado")
+    parser.add_argument("--top", type=int, default=15, help="Pacotes/módulos listados no perfil de imports")
+    parser.add_argument("--orcamento-ms", type=float, default=0.0, help="Limite para a mediana de ready_ms (0 = sem)")
+    parser.add_argument("--saida", default="-", help="Arquivo JSON de resultado ('-' para stdout)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="mynutri-startup-") as diretorio:
+        ambiente = {
+            **os.environ,
+            # Chave falsa: o aquecimento importa o SDK e cria o cliente como em produção (sem rede)
+            "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY") or "startup",
+            "DATABASE_URL": f"sqlite:///{os.path.join(diretorio, 'startup.db')}",
+            "DATABASE_ASYNC_URL": "",
+        }
+        banco_novo = _rodar_filho(ambiente)
+        execucoes = [_rodar_filho(ambiente) for _ in range(max(1, args.repeticoes))]
+        imports = _perfil_imports(ambiente, args.top)
+
+    resumo = {campo: _resumo(execucoes, campo) for campo in ("import_ms", "lifespan_ms", "ready_ms")}
+    relatorio = {
+        "meta": {
+            "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _commit_git(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "repeticoes": len(execucoes),
+            "orcamento_ms": args.orcamento_ms or None,
+        },
+        "banco_novo": banco_novo,
+        "schema_existente": resumo,
+        "execucoes": execucoes,
+        "imports": imports,
+    }
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida == "-":
+        print(texto)
+    else:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto + "\n")
+
+    mediana = resumo["ready_ms"]["mediana"]
+    print(
+        f"import={resumo['import_ms']['mediana']}ms lifespan={resumo['lifespan_ms']['mediana']}ms "
+        f"ready={mediana}ms (banco novo: {banco_novo['ready_ms']}ms)",
+        file=sys.stderr,
+    )
+    if args.orcamento_ms and mediana > args.orcamento_ms:
+        print(f"Cold start acima do orçamento: {mediana}ms > {args.orcamento_ms}ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Ambiente dos testes: banco SQLite em memória, modo demonstração e nada gravado em disco.
+
+As variáveis são definidas antes do primeiro import de `app` (a configuração é lida no import).
+"""
+import os
+
+os.environ.update(
+    DATABASE_URL="sqlite://",
+    DATABASE_ASYNC_URL="",
+    OPENAI_API_KEY="",
+    PLAN_CACHE_SQLITE_PATH="",
+    RATE_LIMIT_SQLITE_PATH=":memory:",
+    STARTUP_WARMUP="false",
+)
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def anamnese_dados() -> dict:
+    return {
+        "dados_basicos": {"idade": 30, "peso_kg": 70.0, "altura_cm": 175.0, "sexo": "Masculino"},
+        "rotina": {"refeicoes_por_dia": 4, "pratica_atividade_fisica": True},
+        "preferencias": {"gosta_de": ["banana", "arroz"], "nao_gosta_de": ["fígado"]},
+        "objetivos": {"objetivo_principal": "Emagrecimento"},
+    }
+
+
+@pytest.fixture
+def anamnese(anamnese_dados):
+    from app.schemas import Anamnese
+
+    return Anamnese.model_validate(anamnese_dados)
+
+
+@pytest.fixture
+def banco():
+    from app.database import init_db
+
+    init_db()
+
+
+@pytest.fixture
+async def cliente():
+    """Cliente HTTP da aplicação, com o lifespan (banco, fila de jobs) rodando."""
+    from app.jobs import get_job_queue
+    from app.main import app
+
+    # Cada teste tem o próprio event loop; a fila (asyncio.Queue) fica presa ao loop em que foi usada
+    get_job_queue.cache_clear()
+
+    async with app.router.lifespan_context(app):
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://teste") as cliente:
+            yield cliente
+
+
+@pytest.fixture
+def login(cliente):
+    """Registra e autentica um usuário; devolve o cabeçalho Authorization."""
+
+    async def registrar_e_entrar(usuario: str) -> dict:
+        senha = "senha-teste"
+        resposta = await cliente.post(
+            "/api/auth/register", json={"email": f"{usuario}@teste.com", "username": usuario, "password": senha}
+        )
+        assert resposta.status_code == 201
+        resposta = await cliente.post("/api/auth/login", data={"username": usuario, "password": senha})
+        return {"Authorization": f"Bearer {resposta.json()['access_token']}"}
+
+    return registrar_e_entrar
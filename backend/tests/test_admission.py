@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app import admission, main, openai_client
+from app.admission import LimitadorTaxa, VagasLLM, caminho_limitador, limitador_ativo
+from app.config import get_settings
+
+
+@pytest.mark.anyio
+async def test_token_bucket_recusa_sem_saldo_e_informa_a_espera():
+    limitador = LimitadorTaxa(capacidade=2, por_minuto=60)
+    assert await limitador.consumir("ana") == 0
+    assert await limitador.consumir("ana") == 0
+    espera = await limitador.consumir("ana")
+    assert 0 < espera <= 1
+    assert await limitador.consumir("bia") == 0  # baldes independentes por chave
+
+    with pytest.raises(HTTPException) as exc:
+        await limitador.exigir("ana")
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == "1"
+
+
+@pytest.mark.anyio
+async def test_balde_compartilhado_pelo_arquivo(tmp_path):
+    caminho = str(tmp_path / "rate_limit.db")
+    worker_a = LimitadorTaxa(capacidade=1, por_minuto=1, sqlite_path=caminho)
+    worker_b = LimitadorTaxa(capacidade=1, por_minuto=1, sqlite_path=caminho)
+    assert await worker_a.consumir("ana") == 0
+    assert await worker_b.consumir("ana") > 0
+
+
+def test_arquivo_do_limitador_fica_ao_lado_do_banco(monkeypatch, tmp_path):
+    monkeypatch.setattr(get_settings(), "rate_limit_sqlite_path", "")
+    monkeypatch.setattr(admission, "SQLALCHEMY_DATABASE_URL", f"sqlite:///{tmp_path / 'mynutri.db'}")
+    assert caminho_limitador() == str(tmp_path / "mynutri_rate_limit.db")
+
+    monkeypatch.setattr(admission, "SQLALCHEMY_DATABASE_URL", "postgresql://u@db/mynutri")
+    assert caminho_limitador() == ""
+
+
+def test_modo_demonstracao_nao_limita():
+    assert limitador_ativo() is None
+
+
+@pytest.mark.anyio
+async def test_sem_vaga_no_modelo_responde_429():
+    vagas = VagasLLM(limite=1, espera_max_s=0.01)
+    await vagas.adquirir("teste")
+    with pytest.raises(HTTPException) as exc:
+        await vagas.adquirir("teste")
+    assert exc.value.status_code == 429
+    assert vagas.stats() == {"limite": 1, "em_uso": 1, "na_espera": 0}
+    vagas.liberar()
+    async with vagas.vaga("teste"):
+        assert vagas.em_uso == 1
+    assert vagas.em_uso == 0
+
+
+@pytest.mark.anyio
+async def test_stream_sem_vaga_responde_429_antes_de_abrir(cliente, anamnese_dados, monkeypatch):
+    vagas = VagasLLM(limite=1, espera_max_s=0.01)
+    monkeypatch.setattr(admission, "vagas_llm", vagas)
+    monkeypatch.setattr(main, "vagas_llm", vagas)
+    monkeypatch.setattr(main, "modelo_configurado", lambda: "modelo-teste")
+
+    async def gerar_plano_stream(_anamnese):
+        yield "resumo_geral", f"vagas em uso: {vagas.em_uso}"
+
+    monkeypatch.setattr(main, "gerar_plano_stream", gerar_plano_stream)
+
+    resposta = await cliente.post("/api/gerar-plano/stream", json=anamnese_dados)
+    assert resposta.status_code == 200
+    assert "vagas em uso: 1" in resposta.text
+    assert vagas.em_uso == 0
+
+    await vagas.adquirir("ocupada")
+    resposta = await cliente.post("/api/gerar-plano/stream", json=anamnese_dados)
+    assert resposta.status_code == 429
+    assert "Retry-After" in resposta.headers
+
+
+@pytest.mark.anyio
+async def test_reparo_do_stream_reutiliza_a_vaga_do_chamador(monkeypatch):
+    async def create(**_kwargs):
+        mensagem = SimpleNamespace(content='{"ok": true}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=mensagem)], usage=None)
+
+    cliente_falso = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    vagas = VagasLLM(limite=1, espera_max_s=0.01)
+    monkeypatch.setattr(openai_client, "vagas_llm", vagas)
+
+    await vagas.adquirir("plano_stream")  # a vaga do stream
+    with pytest.raises(HTTPException):
+        await openai_client._interpretar(cliente_falso, "m", "truncado", "plano", lambda d: d["ok"])
+    dados, ok = await openai_client._interpretar(
+        cliente_falso, "m", "truncado", "plano", lambda d: d["ok"], ocupar_vaga=False
+    )
+    assert ok is True
+    assert vagas.em_uso == 1
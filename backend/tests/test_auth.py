@@ -0,0 +1,39 @@
+import pytest
+from sqlalchemy import update
+
+from app import auth
+from app.database import SessionLocal
+from app.models import User
+
+
+def _contador(metricas: str, cache: str, resultado: str) -> float:
+    prefixo = f'mynutri_auth_cache_total{{cache="{cache}",resultado="{resultado}"}} '
+    return float(next(linha for linha in metricas.splitlines() if linha.startswith(prefixo))[len(prefixo):])
+
+
+@pytest.mark.anyio
+async def test_usuario_atual_pelo_cache_com_acertos_em_metrics(cliente, login, monkeypatch):
+    cabecalhos = await login("cacheado")
+
+    def consulta_sincrona(*_args, **_kwargs):
+        raise AssertionError("consulta síncrona no event loop")
+
+    monkeypatch.setattr(auth, "get_user_by_username", consulta_sincrona)
+    antes = (await cliente.get("/metrics")).text
+
+    primeiro = await cliente.get("/api/auth/me", headers=cabecalhos)  # falta: busca pela sessão assíncrona
+    segundo = await cliente.get("/api/auth/me", headers=cabecalhos)  # acerto: sem banco
+    assert primeiro.json() == segundo.json()
+    assert segundo.json()["username"] == "cacheado"
+
+    depois = (await cliente.get("/metrics")).text
+    assert _contador(depois, "usuarios", "miss") - _contador(antes, "usuarios", "miss") == 1
+    assert _contador(depois, "usuarios", "hit") - _contador(antes, "usuarios", "hit") == 1
+
+
+def test_update_em_massa_esvazia_o_cache_de_usuarios(banco):
+    auth._user_cache.set("alguem", {"id": 1})
+    with SessionLocal() as db:
+        db.execute(update(User).where(User.username == "alguem").values(email="novo@teste.com"))
+        db.commit()
+    assert auth._user_cache.get("alguem") is None
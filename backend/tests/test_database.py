@@ -0,0 +1,41 @@
+import pytest
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import (
+    SQLALCHEMY_DATABASE_URL,
+    SessionLocal,
+    _configurar,
+    _url_compartilhada,
+    async_database_url,
+    get_async_engine,
+)
+from app.models import User
+
+
+def test_sqlite_em_memoria_vira_banco_compartilhado():
+    assert _url_compartilhada("sqlite://") == SQLALCHEMY_DATABASE_URL
+    assert "cache=shared" in SQLALCHEMY_DATABASE_URL
+    assert async_database_url().startswith("sqlite+aiosqlite:///file:mynutri?")
+    assert _url_compartilhada("sqlite:///./mynutri.db") == "sqlite:///./mynutri.db"
+    assert _url_compartilhada("postgresql://u@db/mynutri") == "postgresql://u@db/mynutri"
+
+
+@pytest.mark.anyio
+async def test_engine_assincrono_enxerga_o_banco_do_sincrono(banco):
+    with SessionLocal() as db:
+        db.add(User(email="sync@teste.com", username="sincrono", hashed_password="x"))
+        db.commit()
+
+    async with AsyncSession(get_async_engine()) as db:
+        usuario = (await db.execute(select(User).where(User.username == "sincrono"))).scalar_one()
+    assert usuario.email == "sync@teste.com"
+
+
+def test_arquivo_sqlite_em_wal(tmp_path):
+    url = f"sqlite:///{tmp_path / 'wal.db'}"
+    engine = _configurar(create_engine(url), url)
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() > 0
+    engine.dispose()
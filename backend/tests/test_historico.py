@@ -0,0 +1,65 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from app import plan_service
+from app.openai_client import explicacao_demonstracao, plano_demonstracao
+from app.plan_store import codificar_cursor, decodificar_cursor
+from app.usage import UsoTokens
+
+
+def test_cursor_ida_e_volta():
+    criado_em = datetime(2026, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    assert decodificar_cursor(codificar_cursor(criado_em, 42)) == (criado_em, 42)
+
+
+@pytest.mark.parametrize("cursor", ["lixo", "", "bm9wZQ"])
+def test_cursor_invalido(cursor):
+    with pytest.raises(ValueError):
+        decodificar_cursor(cursor)
+
+
+@pytest.mark.anyio
+async def test_historico_paginado(cliente, anamnese_dados, login):
+    cabecalhos = await login("historico")
+    ids = []
+    for _ in range(3):
+        resposta = await cliente.post("/api/gerar-plano", json=anamnese_dados, headers=cabecalhos)
+        ids.append(int(resposta.headers["Content-Location"].rsplit("/", 1)[1]))
+
+    pagina = (await cliente.get("/api/planos", params={"limite": 2}, headers=cabecalhos)).json()
+    assert [item["id"] for item in pagina["itens"]] == ids[:0:-1]
+    seguinte = (
+        await cliente.get("/api/planos", params={"limite": 2, "cursor": pagina["proximo_cursor"]}, headers=cabecalhos)
+    ).json()
+    assert [item["id"] for item in seguinte["itens"]] == ids[:1]
+    assert seguinte["proximo_cursor"] is None
+
+    plano = await cliente.get(f"/api/planos/{ids[0]}", headers=cabecalhos)
+    assert plano.json()["modelo_utilizado"] == "demonstracao"
+
+    invalido = await cliente.get("/api/planos", params={"cursor": "lixo"}, headers=cabecalhos)
+    assert invalido.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_geracao_coalescida_conta_o_uso_uma_vez(anamnese, monkeypatch):
+    class Resultado:
+        plano = plano_demonstracao(anamnese)
+        explicacao = explicacao_demonstracao(anamnese)
+        modelo = "modelo-teste"
+        uso = UsoTokens(prompt_tokens=100, completion_tokens=50)
+
+    async def gerar_plano(_anamnese):
+        await asyncio.sleep(0.05)
+        return Resultado()
+
+    monkeypatch.setattr(plan_service, "gerar_plano", gerar_plano)
+    monkeypatch.setattr(plan_service, "modelo_configurado", lambda: "modelo-teste")
+
+    resultados = await asyncio.gather(
+        *(plan_service.obter_plano_com_uso(anamnese, usar_cache=False) for _ in range(3))
+    )
+    usos = [uso for _, uso in resultados]
+    assert sorted(usos, reverse=True) == [Resultado.uso, UsoTokens(), UsoTokens()]
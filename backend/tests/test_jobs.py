@@ -0,0 +1,131 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from app import jobs
+from app.database import SessionLocal
+from app.jobs import FilaCheia, JobQueue, _adotar_orfaos, _agora
+from app.models import JobWorker, PlanJob
+
+
+@pytest.fixture
+def fila_vazia(banco):
+    with SessionLocal() as db:
+        db.query(PlanJob).delete()
+        db.query(JobWorker).delete()
+        db.commit()
+
+
+@pytest.fixture
+def geracao_travada(monkeypatch):
+    """obter_plano só termina depois de `liberar.set()`."""
+    liberar = asyncio.Event()
+    real = jobs.obter_plano
+
+    async def obter_plano_lento(anamnese, usar_cache=True):
+        await liberar.wait()
+        return await real(anamnese, usar_cache=usar_cache)
+
+    monkeypatch.setattr(jobs, "obter_plano", obter_plano_lento)
+    return liberar
+
+
+async def _ate_concluir(fila: JobQueue, job_ids, tentativas: int = 200) -> None:
+    for _ in range(tentativas):
+        status = [(await fila.status(job_id)).status for job_id in job_ids]
+        if all(s == "concluido" for s in status):
+            return
+        await asyncio.sleep(0.02)
+    raise AssertionError(status)
+
+
+def test_so_jobs_de_processos_parados_sao_adotados(fila_vazia):
+    with SessionLocal() as db:
+        db.add_all(
+            [
+                JobWorker(id="vivo", workers=1, duracao_media_s=1.0, heartbeat_at=_agora() - timedelta(seconds=5)),
+                JobWorker(id="morto", workers=1, duracao_media_s=1.0, heartbeat_at=_agora() - timedelta(seconds=120)),
+            ]
+        )
+        db.add_all(
+            [
+                PlanJob(id=f"{status}-{dono}", status=status, anamnese_json="{}", worker_id=dono)
+                for status in ("pendente", "processando", "concluido")
+                for dono in ("vivo", "morto", "sumido", None)
+            ]
+        )
+        db.commit()
+
+    adotados = _adotar_orfaos("novo", lease_s=60)
+
+    assert set(adotados) == {f"{status}-{dono}" for status in ("pendente", "processando") for dono in ("morto", "sumido", None)}
+    with SessionLocal() as db:
+        assert (db.get(PlanJob, "processando-morto").status, db.get(PlanJob, "processando-morto").worker_id) == (
+            "pendente",
+            "novo",
+        )
+        assert db.get(PlanJob, "processando-vivo").status == "processando"
+        assert db.get(PlanJob, "pendente-vivo").worker_id == "vivo"
+        assert db.get(PlanJob, "concluido-morto").worker_id == "morto"
+
+
+@pytest.mark.anyio
+async def test_segundo_processo_compartilha_a_fila_e_adota_os_jobs_do_primeiro(
+    fila_vazia, anamnese, geracao_travada
+):
+    primeira = JobQueue(workers=1, max_size=3, lease_s=0.3)
+    segunda = JobQueue(workers=2, max_size=2, lease_s=0.3)
+    await primeira.start()
+    try:
+        job_ids = [(await primeira.submit(anamnese)).job_id for _ in range(3)]
+        await asyncio.sleep(0.05)  # o primeiro job sai da fila e trava na geração
+
+        await segunda.start()
+        # Os pendentes da primeira continuam dela: a segunda não os enfileira de novo
+        assert segunda._fila.qsize() == 0
+        stats = await segunda.stats()
+        assert (stats.na_fila, stats.em_processamento, stats.workers) == (2, 1, 3)
+        assert (await segunda.status(job_ids[2])).posicao_na_fila == 1
+        # A capacidade vale para o deployment: os 2 pendentes da primeira já enchem a fila de 2
+        with pytest.raises(FilaCheia):
+            await segunda.submit(anamnese)
+    finally:
+        await primeira.stop()
+
+    # A primeira parou (registro removido): a segunda adota os jobs dela, inclusive o interrompido
+    geracao_travada.set()
+    await _ate_concluir(segunda, job_ids)
+    await segunda.stop()
+
+
+@pytest.mark.anyio
+async def test_timeout_de_um_assinante_nao_tira_o_aviso_do_outro(fila_vazia, anamnese, geracao_travada):
+    fila = JobQueue(workers=1, max_size=10)
+    await fila.start()
+    try:
+        job_id = (await fila.submit(anamnese)).job_id
+        paciente = asyncio.create_task(fila.aguardar(job_id, timeout=5))
+        await fila.aguardar(job_id, timeout=0.01)  # desiste antes do fim
+
+        geracao_travada.set()
+        await asyncio.wait_for(paciente, timeout=2)
+        assert (await fila.status(job_id)).status == "concluido"
+        assert job_id not in fila._eventos
+    finally:
+        await fila.stop()
+
+
+@pytest.mark.anyio
+async def test_job_pela_api(cliente, anamnese_dados):
+    resposta = await cliente.post("/api/jobs/gerar-plano", json=anamnese_dados)
+    assert resposta.status_code == 202
+    job_id = resposta.json()["job_id"]
+
+    for _ in range(100):
+        status = (await cliente.get(f"/api/jobs/{job_id}")).json()
+        if status["status"] == "concluido":
+            break
+        await asyncio.sleep(0.02)
+    assert status["status"] == "concluido", status
+    assert status["resultado"]["modelo_utilizado"] == "demonstracao"
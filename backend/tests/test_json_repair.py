@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from app.json_repair import RespostaInvalida, carregar_validado
+
+
+def _tem_refeicoes(dados):
+    if not isinstance(dados, dict) or not isinstance(dados.get("refeicoes"), list):
+        raise ValueError("sem refeicoes")
+    return len(dados["refeicoes"])
+
+
+def test_json_valido_sem_reparo():
+    texto = json.dumps({"refeicoes": [{"nome": "Café"}]})
+    dados, total, reparado = carregar_validado(texto, _tem_refeicoes)
+    assert (total, reparado) == (1, False)
+    assert dados["refeicoes"][0]["nome"] == "Café"
+
+
+@pytest.mark.parametrize(
+    "texto",
+    [
+        'Aqui está:\n```json\n{"refeicoes": [{"nome": "Café"}]}\n```',
+        '{"refeicoes": [{"nome": "Café"},],}',
+        '{"refeicoes": [{"nome": "Café"}]} Espero que ajude!',
+    ],
+    ids=["cerca", "virgula_final", "texto_depois"],
+)
+def test_reparos_locais(texto):
+    dados, total, reparado = carregar_validado(texto, _tem_refeicoes)
+    assert (total, reparado) == (1, True)
+
+
+def test_truncado_fecha_string_listas_e_objetos():
+    texto = '{"refeicoes": [{"nome": "Café"}, {"nome": "Jan'
+    dados, _, reparado = carregar_validado(texto, _tem_refeicoes)
+    assert reparado
+    assert dados["refeicoes"] == [{"nome": "Café"}, {"nome": "Jan"}]
+
+
+def test_truncado_recua_ate_a_ultima_virgula():
+    texto = '{"refeicoes": [{"nome": "Café"}, {"nome": "Almoço", "itens":'
+    dados, _, reparado = carregar_validado(texto, _tem_refeicoes)
+    assert reparado
+    assert dados["refeicoes"] == [{"nome": "Café"}, {"nome": "Almoço"}]
+
+
+def test_sem_reparo_possivel_levanta_o_erro_original():
+    with pytest.raises(RespostaInvalida) as exc:
+        carregar_validado("não sei montar o plano", _tem_refeicoes)
+    assert exc.value.erro.startswith("JSON inválido")
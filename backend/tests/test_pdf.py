@@ -0,0 +1,19 @@
+import pytest
+
+
+@pytest.mark.anyio
+async def test_so_get_do_plano_salvo_revalida_com_304(cliente, anamnese_dados, login):
+    cabecalhos = await login("pdf")
+    gerado = await cliente.post("/api/gerar-plano", json=anamnese_dados, headers=cabecalhos)
+    url = f"{gerado.headers['Content-Location']}/pdf"
+
+    pdf = await cliente.get(url, headers=cabecalhos)
+    assert pdf.status_code == 200
+    assert pdf.content.startswith(b"%PDF")
+    etag = pdf.headers["ETag"]
+    revalidado = await cliente.get(url, headers={**cabecalhos, "If-None-Match": etag})
+    assert revalidado.status_code == 304
+
+    exportado = await cliente.post("/api/gerar-plano/pdf", json=gerado.json(), headers={"If-None-Match": etag})
+    assert exportado.status_code == 200
+    assert exportado.content == pdf.content
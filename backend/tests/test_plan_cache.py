@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from app.plan_cache import PlanCache, chave_anamnese, hash_anamnese
+from app.schemas import Anamnese
+
+
+def test_hash_ignora_caixa_espacos_e_ordem_das_listas(anamnese_dados):
+    variante = {
+        **anamnese_dados,
+        "preferencias": {"gosta_de": ["  Arroz", "BANANA "], "nao_gosta_de": ["Fígado"]},
+    }
+    assert hash_anamnese(Anamnese.model_validate(variante)) == hash_anamnese(Anamnese.model_validate(anamnese_dados))
+
+
+def test_chave_muda_com_modelo_e_versao_do_prompt(anamnese):
+    base = chave_anamnese(anamnese, "gpt-4o-mini", "3")
+    assert chave_anamnese(anamnese, "gpt-4o", "3") != base
+    assert chave_anamnese(anamnese, "gpt-4o-mini", "4") != base
+    assert chave_anamnese(anamnese, "gpt-4o-mini", "3") == base
+
+
+@pytest.mark.anyio
+async def test_camada_sqlite_compartilhada_entre_instancias(tmp_path):
+    caminho = str(tmp_path / "cache.db")
+    await PlanCache(10, 60, caminho).set("chave", b"{}")
+
+    outro_worker = PlanCache(10, 60, caminho)
+    assert await outro_worker.get("chave") == b"{}"
+    assert await outro_worker.get("outra") is None
+    assert outro_worker.stats()["hits_disco"] == 1
+
+
+@pytest.mark.anyio
+async def test_entrada_expirada_nao_e_devolvida():
+    cache = PlanCache(10, ttl_seconds=0.01)
+    await cache.set("chave", b"{}")
+    await asyncio.sleep(0.02)
+    assert await cache.get("chave") is None
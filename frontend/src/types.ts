@@ -43,18 +43,27 @@ export type ItemRefeicao = {
   unidade?: string;
 };
 
+export type TotaisNutricionais = {
+  kcal: number;
+  proteina_g: number;
+  carboidrato_g: number;
+  gordura_g: number;
+};
+
 export type Refeicao = {
   nome: string;
   horario_sugerido?: string;
   descricao: string;
   observacoes?: string;
   itens?: ItemRefeicao[];
+  totais?: TotaisNutricionais | null;
 };
 
 export type PlanoAlimentar = {
   resumo_geral: string;
   refeicoes: Refeicao[];
   avisos_importantes: string[];
+  totais?: TotaisNutricionais | null;
 };
 
 export type CalculoNutricional = {
@@ -75,5 +84,6 @@ export type PlanoResponse = {
   plano: PlanoAlimentar;
   modelo_utilizado: string;
   explicacao_geracao?: ExplicacaoGeracao | null;
+  do_cache?: boolean;
 };
 